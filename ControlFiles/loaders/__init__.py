@@ -0,0 +1,179 @@
+"""
+Configuration loaders
+
+A loader reads one source of configuration data and returns it as a mapping of
+configuration keys to values. A streaming loader instead returns an iterator of
+(key, value) pairs, which lets the configuration use the early entries of a
+very large source while the rest is still being read. Loaders are named in a
+registry so that a configuration source only has to name the loader it needs.
+A loader can be registered as a callable or as the path of the module that
+supplies it, in the same way that the `logsys` and `argsys` configuration
+entries name modules. A module path has the form ``package.module`` or
+``package.module:function``; the function defaults to ``handler``. Names that
+are not registered are looked up in the ``gvConfig.loaders`` entry point group
+and are finally treated as module paths themselves.
+
+Independent sources can be slow to read, for example when they live on network
+file systems, so `loadSources` reads them concurrently. The results are always
+returned in the order in which the sources were given so that the merge that
+follows remains deterministic.
+
+.. only:: development_administrator
+
+    Created on Oct. 17, 2026
+
+    @author: Jonathan Gossage
+"""
+
+from importlib import import_module
+import sys
+from typing import (Any, Callable, Dict, List, Mapping, Optional, Sequence,
+                    Union, TYPE_CHECKING)
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+LOADER = Callable[..., Mapping[str, Any]]
+ENTRY_POINT_GROUP = 'gvConfig.loaders'
+
+_registry: Dict[str, Union[str, LOADER]] = {
+    'fileJSON': 'ControlFiles.loaders.fileJSON',
+    'fileIndex': 'ControlFiles.loaders.fileIndex',
+    'fileMsgpack': 'ControlFiles.loaders.fileMsgpack',
+    'fileEnv': 'ControlFiles.loaders.fileEnv',
+    'httpJSON': 'ControlFiles.loaders.httpJSON',
+    'fileJSONStream': 'ControlFiles.loaders.fileJSON:streamHandler'}
+
+
+def register(name: str,
+             loader: Union[str, LOADER]) -> None:
+    """
+    Registers a loader under a name, replacing any loader already registered
+    under that name.
+
+    :param str name:              The name used by sources to refer to the
+                                  loader
+    :param str, function loader:  The loader or the module path of the loader
+    """
+    _registry[name] = loader
+
+
+def _importLoader(path: str) -> LOADER:
+    module, _, attr = path.partition(':')
+    return getattr(import_module(module), attr or 'handler')
+
+
+def resolve(name: str) -> LOADER:
+    """
+    Gives the loader registered under a name. Module paths are imported the
+    first time they are resolved.
+    """
+    loader = _registry.get(name)
+    if loader is None:
+        from importlib.metadata import entry_points
+        if sys.version_info >= (3, 10):
+            eps = entry_points(group=ENTRY_POINT_GROUP, name=name)
+        else:
+            # Before Python 3.10 entry_points takes no arguments and gives
+            # the entry points by group
+            eps = [ep for ep in entry_points().get(ENTRY_POINT_GROUP, ())
+                   if ep.name == name]
+        if eps:
+            loader = next(iter(eps)).load()
+        elif '.' in name:
+            loader = name
+        else:
+            raise KeyError(f'No configuration loader is registered as {name}')
+    if isinstance(loader, str):
+        loader = _importLoader(loader)
+    _registry[name] = loader
+    return loader
+
+
+class Source():
+    """
+    Describes a source of configuration data.
+
+    :param str name:   Identifies the source
+    :param str layer:  The configuration layer that the source supplies
+    :param str loader: The name of the loader that reads the source
+    :param kwargs:     The arguments passed to the loader. The ``path`` and
+                       ``file`` arguments, or a ``watch`` argument giving a
+                       sequence of paths, identify the files that the source
+                       is read from. The ``watch`` argument is not passed to
+                       the loader.
+    """
+    __slots__ = ('name', 'layer', 'loader', 'kwargs')
+
+    def __init__(self: 'Source',
+                 name: str,
+                 layer: str,
+                 loader: str='fileJSON',
+                 **kwargs: Any) -> None:
+        self.name = name
+        self.layer = layer
+        self.loader = loader
+        self.kwargs = kwargs
+
+    def load(self: 'Source') -> Mapping[str, Any]:
+        """Reads the source"""
+        kwargs = self.kwargs
+        if 'watch' in kwargs:
+            kwargs = {k: v for k, v in kwargs.items() if k != 'watch'}
+        return resolve(self.loader)(**kwargs)
+
+    def paths(self: 'Source') -> List['Path']:
+        """Gives the files that the source is read from"""
+        from pathlib import Path
+        if 'watch' in self.kwargs:
+            return [Path(p) for p in self.kwargs['watch']]
+        if self.kwargs.get('path') and self.kwargs.get('file'):
+            return [Path(self.kwargs['path']) / self.kwargs['file']]
+        return []
+
+    def __repr__(self: 'Source') -> str:
+        return (f'Source({self.name!r}, {self.layer!r}, {self.loader!r},'
+                f' **{self.kwargs!r})')
+
+
+def loadSources(sources: Sequence[Source],
+                maxWorkers: Optional[int]=None,
+                profiles: Optional[Sequence[Any]]=None
+                ) -> List[Mapping[str, Any]]:
+    """
+    Reads a set of sources, concurrently when there is more than one.
+
+    :param Sequence[Source] sources: The sources to read
+    :param int maxWorkers:           The maximum number of sources read at the
+                                     same time. The default is the number of
+                                     sources.
+    :param Sequence profiles:        A `lib.cfgProfile.SourceProfile` for each
+                                     source, in which the time taken to read
+                                     the source is recorded
+    :return: The data from each source in the order the sources were given.
+             If any source fails, the exception raised by the first failing
+             source is raised once all the sources have been read.
+    """
+    if profiles is None:
+        profiles = [None] * len(sources)
+    else:
+        from lib.cfgProfile import recording
+
+    def load(s: Source,
+             p: Any) -> Mapping[str, Any]:
+        if p is None:
+            return s.load()
+        with recording(p):
+            return s.load()
+
+    if len(sources) <= 1 or maxWorkers == 1:
+        return [load(s, p) for s, p in zip(sources, profiles)]
+    from concurrent.futures import ThreadPoolExecutor
+    # Resolve the loaders first so that module imports are not done
+    # concurrently.
+    for s in sources:
+        resolve(s.loader)
+    with ThreadPoolExecutor(max_workers=maxWorkers or len(sources),
+                            thread_name_prefix='gvConfig') as pool:
+        futures = [pool.submit(load, s, p) for s, p in zip(sources, profiles)]
+    return [f.result() for f in futures]
@@ -0,0 +1,195 @@
+"""
+Persistent cache of parsed configuration files
+
+Most starts of a program see configuration files that have not changed since
+the last start, so parsing them again is wasted work. The parse cache keeps the
+parsed contents of each file in a private cache directory, pickled so that they
+can be restored much faster than they can be parsed. Unlike a snapshot (see
+`ControlFiles.loaders.snapshot`) nothing is written beside the configuration
+files, so the cache also works for files in directories that the program
+cannot write to.
+
+Each cache entry records the size, modification time and content hash of the
+file it was parsed from. An entry is used directly while the size and
+modification time still match. When they no longer match, the file is read and
+hashed and the entry is still used if the content has not changed, so a file
+that was only touched or copied is not parsed again.
+
+The total size of the cache is bounded. Every use of an entry updates its
+modification time and the least recently used entries are removed when a new
+entry takes the cache over its limit.
+
+.. only:: development_administrator
+
+    Created on Oct. 17, 2026
+
+    @author: Jonathan Gossage
+"""
+
+from hashlib import blake2b
+import os
+from pathlib import Path
+import pickle
+import struct
+import tempfile
+from typing import Any, Callable, Optional, Union
+
+from ControlFiles.loaders.snapshot import digest
+
+MAGIC = b'GVPC'
+FORMAT = 1
+SUFFIX = '.pickle'
+DEFAULT_MAX_BYTES = 64 << 20
+
+_HEADER = struct.Struct('<4sHxxQQ32s')
+
+
+def defaultDirectory() -> Path:
+    """
+    Gives the cache directory, ``gvConfig`` beneath ``$XDG_CACHE_HOME`` or
+    ``~/.cache``
+    """
+    base = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(base) / 'gvConfig'
+
+
+class ParseCache():
+    """
+    A directory of parsed configuration files.
+
+    :param Path directory: The cache directory, created when it is first
+                           written. The default is given by `defaultDirectory`.
+    :param int maxBytes:   The total size that the cache entries may occupy
+    """
+
+    def __init__(self: 'ParseCache',
+                 directory: Optional[Union[Path, str]]=None,
+                 maxBytes: int=DEFAULT_MAX_BYTES) -> None:
+        self._directory = Path(directory) if directory is not None else\
+            defaultDirectory()
+        self._maxBytes = maxBytes
+
+    @property
+    def directory(self: 'ParseCache') -> Path:
+        return self._directory
+
+    def entryPath(self: 'ParseCache',
+                  source: Union[Path, str]) -> Path:
+        """Gives the path of the cache entry for a source file"""
+        name = blake2b(os.fsencode(Path(source).absolute()),
+                       digest_size=16).hexdigest()
+        return self._directory / (name + SUFFIX)
+
+    def load(self: 'ParseCache',
+             source: Union[Path, str],
+             parse: Callable[[bytes], Any],
+             verify: bool=False) -> Any:
+        """
+        Gives the parsed contents of a file, from the cache when possible.
+
+        :param Path source:    The file
+        :param function parse: Parses the contents of the file when the cache
+                               does not hold them
+        :param bool verify:    Compare the content hash of the file even when
+                               its size and modification time match
+        """
+        source = Path(source)
+        st = source.stat()
+        entry = self.entryPath(source)
+        try:
+            blob = entry.read_bytes()
+            magic, fmt, size, mtime, dig = _HEADER.unpack_from(blob)
+        except (OSError, struct.error):
+            blob = None
+        else:
+            if magic != MAGIC or fmt != FORMAT:
+                blob = None
+        if blob is not None and not verify and\
+           size == st.st_size and mtime == st.st_mtime_ns:
+            self._touch(entry)
+            return pickle.loads(memoryview(blob)[_HEADER.size:])
+        raw = source.read_bytes()
+        newDig = digest(raw)
+        if blob is not None and newDig == dig:
+            payload = memoryview(blob)[_HEADER.size:]
+            data = pickle.loads(payload)
+            if size == st.st_size and mtime == st.st_mtime_ns:
+                self._touch(entry)  # The entry is still current
+                return data
+        else:
+            data = parse(raw)
+            payload = pickle.dumps(data, protocol=5)
+        self._store(entry, st, newDig, payload)
+        return data
+
+    def clear(self: 'ParseCache') -> None:
+        """Removes every entry"""
+        for p in self._directory.glob('*' + SUFFIX):
+            p.unlink(missing_ok=True)
+
+    def _touch(self: 'ParseCache',
+               entry: Path) -> None:
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+
+    def _store(self: 'ParseCache',
+               entry: Path,
+               st: os.stat_result,
+               dig: bytes,
+               payload: Union[bytes, memoryview]) -> None:
+        """
+        Writes an entry atomically. The cache is only an optimization, so a
+        failure to write it is ignored.
+        """
+        try:
+            self._directory.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self._directory,
+                                       prefix=entry.name)
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(_HEADER.pack(MAGIC, FORMAT, st.st_size,
+                                     st.st_mtime_ns, dig))
+                f.write(payload)
+            os.replace(tmp, entry)
+        except OSError:
+            os.unlink(tmp)
+            return
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self._evict()
+
+    def _evict(self: 'ParseCache') -> None:
+        """Removes the least recently used entries while over the limit"""
+        entries = []
+        total = 0
+        for p in self._directory.glob('*' + SUFFIX):
+            try:
+                st = p.stat()
+            except OSError:  # Removed by another process
+                continue
+            entries.append((st.st_mtime_ns, st.st_size, p))
+            total += st.st_size
+        if total <= self._maxBytes:
+            return
+        entries.sort()
+        for _, size, p in entries:
+            p.unlink(missing_ok=True)
+            total -= size
+            if total <= self._maxBytes:
+                break
+
+
+_default: Optional[ParseCache] = None
+
+
+def default() -> ParseCache:
+    """Gives the cache used by the loaders unless they are given another"""
+    global _default
+    if _default is None:
+        _default = ParseCache()
+    return _default
@@ -0,0 +1,101 @@
+"""
+File system data loader for environment files
+
+An environment file holds one ``key=value`` assignment per line, in the style
+of the files read by shells, ``systemd`` and container runtimes. Blank lines,
+lines starting with ``#`` and white space around the key and the value are
+ignored.
+
+A value is read as JSON when it is a JSON string, number, array or object or
+one of ``true``, ``false`` and ``null``; any other value is a plain string.
+When a configuration is written, strings that would otherwise be misread, for
+example ``"123"`` or a string with leading spaces or a line break, are written
+as JSON strings so that every value reads back as it was written.
+
+.. only:: development_administrator
+
+    Created on Oct. 17, 2026
+
+    @author: Jonathan Gossage
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Dict, Mapping, Optional
+
+from lib import cfgProfile as _p
+
+# The characters that can start a value that is read as JSON
+_JSON_START = frozenset('"[{-0123456789tfn')
+_JSON_OPTIONS = {'separators': (',', ':'), 'ensure_ascii': False}
+
+
+def _plain(v: str) -> bool:
+    """Whether a string can be written without quoting"""
+    return bool(v) and v[0] not in _JSON_START and v[0] != '#' and\
+        v == v.strip() and '\n' not in v and '\r' not in v
+
+
+def dumps(data: Mapping[str, Any]) -> str:
+    """
+    Writes a mapping as an environment file.
+
+    :raises ValueError: A key is empty or contains ``=``, ``#`` at its start or
+                        a line break
+    """
+    lines = []
+    for k, v in data.items():
+        if not k or '=' in k or k[0] == '#' or '\n' in k or '\r' in k or\
+           k != k.strip():
+            raise ValueError(f'{k!r} cannot be written to an environment file')
+        if type(v) is str and _plain(v):
+            lines.append(f'{k}={v}\n')
+        else:
+            lines.append(f'{k}={json.dumps(v, **_JSON_OPTIONS)}\n')
+    return ''.join(lines)
+
+
+def loads(text: str) -> Dict[str, Any]:
+    """
+    Reads an environment file.
+
+    :raises ValueError: A line is not an assignment or holds invalid JSON
+    """
+    data = {}
+    decode = json.loads
+    # Only line feeds end lines; str.splitlines would also split values at
+    # characters such as U+2028.
+    for n, line in enumerate(text.split('\n'), 1):
+        line = line.strip()
+        if not line or line[0] == '#':
+            continue
+        k, sep, v = line.partition('=')
+        if not sep:
+            raise ValueError(f'Line {n} is not an assignment: {line!r}')
+        k = k.strip()
+        v = v.lstrip()
+        if v and v[0] in _JSON_START:
+            try:
+                v = decode(v)
+            except json.JSONDecodeError as e:
+                # A plain string such as "none" or "-x" that is not JSON
+                if v[0] in '"[{':
+                    raise ValueError(f'Line {n}: {e}') from None
+        data[k] = v
+    return data
+
+
+def handler(path: Optional[str] = '/etc/gvConfig',
+            file: Optional[str] = 'pre.env') -> Mapping[str, Any]:
+    """
+    :param str path: Directory containing the environment file
+    :param str file: Name of the environment file
+    """
+    _path: Optional[Path] = Path(Path(path) / file) if path and file else None
+    if not (_path and _path.is_file()):
+        return {}
+    with _p.phase('read'):
+        text = _path.read_text(encoding='utf-8')
+    _p.count(len(text))
+    with _p.phase('parse'):
+        return loads(text)
@@ -0,0 +1,185 @@
+"""
+Configuration index loader
+
+A host that runs many applications keeps a large site configuration of which
+each application only needs a small part. The configuration index records,
+for every top level key of a set of JSON configuration files, the file that
+supplies it and the byte offset and length of its value in that file. It also
+records the key prefixes used by each application. An application can then
+read just the values of the keys that concern it instead of parsing every
+configuration file.
+
+The index is itself a JSON file of the form::
+
+    {"format": 2,
+     "files": {"/etc/gvConfig/site.json": [size, mtime_ns]},
+     "keys": {"key": [["/etc/gvConfig/site.json", offset, length], ...]},
+     "applications": {"app": ["prefix", ...]}}
+
+Files are listed in priority order and a key supplied by several files is
+indexed in each of them, in the same order. A key matches a prefix when it
+starts with it, so that the prefix ``log.`` selects every key of the ``log``
+group. A file whose size or modification time no longer matches the index is
+parsed in full, so a stale index costs time but never gives stale values: a
+key added to a stale file is found, and a key removed from it still gets its
+value from the files of lower priority.
+
+.. only:: development_administrator
+
+    Created on Oct. 17, 2026
+
+    @author: Jonathan Gossage
+"""
+
+import json
+import os
+from pathlib import Path
+import tempfile
+from typing import (Any, Dict, Iterable, List, Mapping, Optional, Sequence,
+                    Tuple, Union)
+
+from ControlFiles.loaders.fileJSON import spans
+
+FORMAT = 2
+DEFAULT_INDEX = '/etc/gvConfig/index.json'
+
+
+def build(files: Iterable[Union[Path, str]],
+          applications: Optional[Mapping[str, Sequence[str]]]=None
+          ) -> Dict[str, Any]:
+    """
+    Builds the index of a set of configuration files.
+
+    :param Iterable[Path] files:   The JSON files in priority order
+    :param Mapping applications:   The key prefixes used by each application
+    :return: The index
+    """
+    index: Dict[str, Any] = {'format': FORMAT,
+                             'files': {},
+                             'keys': {},
+                             'applications': {a: list(p) for a, p in
+                                              (applications or {}).items()}}
+    for f in files:
+        f = Path(f).absolute()
+        st = f.stat()
+        index['files'][str(f)] = [st.st_size, st.st_mtime_ns]
+        for key, _, offset, length in spans(f):
+            index['keys'].setdefault(key, []).append([str(f), offset,
+                                                      length])
+    return index
+
+
+def files(index: Optional[str]=DEFAULT_INDEX) -> List[Path]:
+    """
+    Gives the configuration files listed in an index, in priority order.
+
+    :param str index: The index file. No files are given if it does not exist
+                      or cannot be read.
+    """
+    try:
+        with open(index, mode='rt') as f:
+            return [Path(p) for p in json.load(f)['files']]
+    except (OSError, TypeError, ValueError, KeyError):
+        return []
+
+
+def write(target: Union[Path, str],
+          files: Iterable[Union[Path, str]],
+          applications: Optional[Mapping[str, Sequence[str]]]=None) -> None:
+    """
+    Builds the index of a set of configuration files and replaces the index
+    file atomically.
+    """
+    target = Path(target)
+    data = json.dumps(build(files, applications))
+    fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=target.name)
+    try:
+        with os.fdopen(fd, 'wt') as f:
+            f.write(data)
+        # Every application reads the index, but mkstemp makes the file
+        # private to its owner
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, target)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _selected(key: str,
+              prefixes: Optional[Sequence[str]]) -> bool:
+    return prefixes is None or key.startswith(tuple(prefixes))
+
+
+def handler(index: Optional[str]=DEFAULT_INDEX,
+            application: Optional[str]=None,
+            prefixes: Optional[Sequence[str]]=None) -> Mapping[str, Any]:
+    """
+    Reads the values of the keys used by an application.
+
+    :param str index:        The index file. Nothing is read if it does not
+                             exist.
+    :param str application:  The application whose prefixes select the keys.
+                             An application missing from the index selects no
+                             keys.
+    :param Sequence prefixes: Selects keys in addition to those of the
+                              application. Every key is selected when neither
+                              is given.
+    :return: The selected keys and their values
+    """
+    _path = Path(index) if index else None
+    if not (_path and _path.is_file()):
+        return {}
+    with _path.open(mode='rt') as f:
+        idx = json.load(f)
+    if idx.get('format') != FORMAT:
+        raise ValueError(f'{index} is not a configuration index of format'
+                         f' {FORMAT}')
+    selected: Optional[List[str]] = None
+    if application is not None or prefixes is not None:
+        selected = list(idx['applications'].get(application, ()))
+        selected.extend(prefixes or ())
+
+    # Find the files for which the index is stale before choosing what to
+    # read, since any of them may have gained or lost a selected key.
+    stale = set()
+    missing = set()
+    for f, (size, mtime) in idx['files'].items():
+        try:
+            st = os.stat(f)
+        except FileNotFoundError:
+            missing.add(f)
+            continue
+        if st.st_size != size or st.st_mtime_ns != mtime:
+            stale.add(f)
+
+    # A selected key is read from the last current file that supplies it.
+    # The stale files are parsed in full and applied in priority order with
+    # the others, so one of them overrides that value only when it still
+    # supplies the key. The ranges to read are grouped by file so that each
+    # file is opened once and read in order.
+    ranges: Dict[str, List[Tuple[int, int, str]]] = \
+        {f: [] for f in idx['files']}
+    for key, locations in idx['keys'].items():
+        if not _selected(key, selected):
+            continue
+        for f, offset, length in reversed(locations):
+            if f not in stale and f not in missing:
+                ranges[f].append((offset, length, key))
+                break
+    data: Dict[str, Any] = {}
+    for f in idx['files']:
+        if f in stale:
+            with open(f, mode='rt', encoding='utf-8') as fp:
+                full = json.load(fp)
+            data.update((k, v) for k, v in full.items()
+                        if _selected(k, selected))
+            continue
+        wanted = ranges[f]
+        if not wanted:
+            continue
+        wanted.sort()
+        with open(f, mode='rb') as fp:
+            for offset, length, key in wanted:
+                fp.seek(offset)
+                data[key] = json.loads(fp.read(length))
+    return data
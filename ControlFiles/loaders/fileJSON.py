@@ -4,6 +4,10 @@ File system data loader for JSON objects
 This handler reads JSON data from any file system location.
 This handler works on both Linux and Windows.
 
+Very large files can be read with `streamHandler`, which yields the top level
+groups of the file one at a time as they are parsed instead of building the
+whole file in memory first.
+
 .. only:: development_administrator
     
     Created on Jul. 6, 2020
@@ -14,17 +18,229 @@ This handler works on both Linux and Windows.
 
 import json
 from pathlib import Path
-from typing import MutableMapping, Any, Optional
+import re
+from typing import (Iterator, Mapping, MutableMapping, Any, Optional, Tuple,
+                    Union, TYPE_CHECKING)
+
+from lib import cfgProfile as _p
+
+if TYPE_CHECKING:
+    from ControlFiles.loaders.cache import ParseCache
+
+_WS = re.compile(r'[ \t\n\r]*')
+
+
+def _parse(raw: bytes) -> Any:
+    with _p.phase('parse'):
+        return json.loads(raw)
+
+
+def _read(path: Path) -> bytes:
+    with _p.phase('open'):
+        f = path.open(mode='rb')
+    with f, _p.phase('read'):
+        raw = f.read()
+    _p.count(len(raw))
+    return raw
+
 
 def handler(path: Optional[str] = '/etc/gvConfig',
-            file: Optional[str] = 'pre.json') -> MutableMapping[str, Any]:
+            file: Optional[str] = 'pre.json',
+            snapshot: bool = False,
+            verify: bool = False,
+            cache: Union[bool, 'ParseCache'] = False) -> Mapping[str, Any]:
     """
+    :param str path:      Directory containing the JSON file
+    :param str file:      Name of the JSON file
+    :param bool snapshot: Use the compiled snapshot of the file, compiling it
+                          if it is missing or out of date. The result is then
+                          a read-only mapping whose values are decoded when
+                          they are first requested. See
+                          `ControlFiles.loaders.snapshot`.
+    :param bool verify:   Check the content hash of the file as well as its
+                          size and modification time before using a snapshot
+                          or a cached result
+    :param cache:         Use the parse cache, either the default cache when
+                          True or the given `ParseCache`. See
+                          `ControlFiles.loaders.cache`. Ignored when
+                          `snapshot` is used.
     """
     _data: MutableMapping[str, Any] = {}
     _path: Optional[Path] = Path(Path(path) / file) if path and file else None
     
     if _path and _path.is_file():
-        with _path as p:
-            with p.open(mode='rt') as f:
-                _data = json.load(f)
+        if cache and not snapshot:
+            from ControlFiles.loaders import cache as _pc
+            _cache = _pc.default() if cache is True else cache
+            with _p.phase('read'):
+                return _cache.load(_path, _parse, verify)
+        if not snapshot:
+            return _parse(_read(_path))
+
+        from ControlFiles.loaders import snapshot as _s
+        with _p.phase('open'):
+            _snap = _s.load(_path, verify)
+        if _snap is not None:
+            return _snap
+        _st = _path.stat()
+        _raw = _read(_path)
+        _data = _parse(_raw)
+        if isinstance(_data, dict):
+            try:
+                _s.write(_path, _data, _raw, _st)
+            except OSError:  # The directory may not be writable by this user
+                pass
     return _data
+
+
+def streamHandler(path: Optional[str] = '/etc/gvConfig',
+                  file: Optional[str] = 'pre.json',
+                  chunkSize: int = 1 << 16) -> Iterator[Tuple[str, Any]]:
+    """
+    Reads the top level groups of a JSON object one at a time. The file is
+    read in chunks and each group is yielded as soon as it has been parsed, so
+    the memory needed is bounded by the largest group rather than by the whole
+    file. Nothing is yielded if the file does not exist.
+
+    :param str path:      Directory containing the JSON file
+    :param str file:      Name of the JSON file
+    :param int chunkSize: The amount of text read at a time
+    :return: An iterator of (key, value) pairs in file order
+    :raises json.JSONDecodeError: The file is not a valid JSON object. The
+                                  groups before the error have already been
+                                  yielded.
+    """
+    _path: Optional[Path] = Path(Path(path) / file) if path and file else None
+    if not (_path and _path.is_file()):
+        return
+    with _path.open(mode='rt') as f:
+        yield from _Groups(f, chunkSize)
+
+
+def spans(path: Path,
+          chunkSize: int = 1 << 16) -> Iterator[Tuple[str, Any, int, int]]:
+    """
+    Reads the top level groups of a JSON object one at a time along with the
+    location of each value in the file.
+
+    :param Path path:     The JSON file, which must be encoded in UTF-8
+    :param int chunkSize: The amount of text read at a time
+    :return: An iterator of (key, value, offset, length) tuples in file order,
+             where the offset and length of the value are in bytes
+    """
+    with Path(path).open(mode='rt', encoding='utf-8', newline='') as f:
+        for key, value, start, end in _Groups(f, chunkSize, True).members():
+            yield key, value, start, end - start
+
+
+class _Groups():
+    """
+    Parses the members of a JSON object from a text stream, optionally
+    tracking the byte offsets of the values in the UTF-8 encoded stream.
+    """
+
+    def __init__(self: '_Groups',
+                 f: Any,
+                 chunkSize: int,
+                 offsets: bool = False) -> None:
+        self._f = f
+        self._chunkSize = chunkSize
+        self._offsets = offsets
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+        self._start = 0
+        # The byte offset of the character at _mark in the buffer
+        self._mark = 0
+        self._markByte = 0
+
+    def _byte(self: '_Groups',
+              pos: int) -> int:
+        """Gives the byte offset of a position in the buffer"""
+        self._markByte += len(self._buf[self._mark:pos].encode('utf-8'))
+        self._mark = pos
+        return self._markByte
+
+    def _fill(self: '_Groups',
+              size: int) -> None:
+        """Discards the parsed text and reads more"""
+        if self._offsets:
+            self._byte(self._pos)
+            self._mark = 0
+        with _p.phase('read'):
+            chunk = self._f.read(size)
+        _p.count(len(chunk))  # Characters, the same as bytes for ASCII
+        self._eof = not chunk
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+
+    def _skip(self: '_Groups') -> str:
+        """Skips white space and gives the next character, '' at the end"""
+        while True:
+            self._pos = _WS.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf) or self._eof:
+                return self._buf[self._pos:self._pos + 1]
+            self._fill(self._chunkSize)
+
+    def _expect(self: '_Groups',
+                chars: str) -> str:
+        c = self._skip()
+        if not c or c not in chars:
+            raise json.JSONDecodeError(f'Expecting one of {chars!r}',
+                                       self._buf, self._pos)
+        self._pos += 1
+        return c
+
+    def _value(self: '_Groups',
+               ends: str) -> Any:
+        # A value is only complete when the delimiter that follows it has
+        # been read, otherwise a number such as 1.5e3 could have been cut in
+        # two and still be parsed. The read size doubles on each retry so
+        # that a large value is parsed a bounded number of times.
+        size = self._chunkSize
+        while True:
+            self._skip()
+            self._start = self._pos
+            try:
+                with _p.phase('parse'):
+                    v, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            else:
+                j = _WS.match(self._buf, end).end()
+                if self._eof or (j < len(self._buf) and self._buf[j] in ends):
+                    self._pos = end
+                    return v
+            self._fill(size)
+            size *= 2
+
+    def __iter__(self: '_Groups') -> Iterator[Tuple[str, Any]]:
+        for key, value, _, _ in self.members():
+            yield key, value
+
+    def members(self: '_Groups') -> Iterator[Tuple[str, Any, int, int]]:
+        """
+        Gives each key and value with the byte offsets of the start and end of
+        the value, which are only set when offsets are tracked.
+        """
+        self._expect('{')
+        more = self._skip() != '}'
+        if not more:
+            self._pos += 1
+        while more:
+            if self._skip() != '"':
+                raise json.JSONDecodeError('Expecting property name',
+                                           self._buf, self._pos)
+            key = self._value(':')
+            self._expect(':')
+            value = self._value(',}')
+            if self._offsets:
+                yield (key, value, self._byte(self._start),
+                       self._byte(self._pos))
+            else:
+                yield key, value, 0, 0
+            more = self._expect(',}') == ','
+        if self._skip():
+            raise json.JSONDecodeError('Extra data', self._buf, self._pos)
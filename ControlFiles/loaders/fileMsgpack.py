@@ -0,0 +1,251 @@
+"""
+File system data loader for MessagePack data
+
+`MessagePack <https://github.com/msgpack/msgpack/blob/master/spec.md>`_ is a
+compact binary equivalent of JSON. A configuration exported in this format is
+smaller than the same configuration in JSON and needs no text decoding or
+number parsing when it is read.
+
+This module implements the part of the format that can hold JSON compatible
+data: nil, booleans, integers of up to 64 bits, 64 bit floats, strings,
+binary data, arrays and maps. Extension types are not supported. It has no
+dependency on the ``msgpack`` package.
+
+.. only:: development_administrator
+
+    Created on Oct. 17, 2026
+
+    @author: Jonathan Gossage
+"""
+
+from pathlib import Path
+import struct
+from typing import Any, Callable, Dict, List, Mapping, Optional
+
+from lib import cfgProfile as _p
+
+_B = struct.Struct('>B')
+_H = struct.Struct('>H')
+_I = struct.Struct('>I')
+_Q = struct.Struct('>Q')
+_b = struct.Struct('>b')
+_h = struct.Struct('>h')
+_i = struct.Struct('>i')
+_q = struct.Struct('>q')
+_d = struct.Struct('>d')
+_f = struct.Struct('>f')
+
+
+def _packInt(out: bytearray,
+             v: int) -> None:
+    if 0 <= v < 0x80:
+        out.append(v)
+    elif -32 <= v < 0:
+        out.append(v & 0xff)
+    elif 0 <= v:
+        if v <= 0xff:
+            out += b'\xcc' + _B.pack(v)
+        elif v <= 0xffff:
+            out += b'\xcd' + _H.pack(v)
+        elif v <= 0xffffffff:
+            out += b'\xce' + _I.pack(v)
+        elif v <= 0xffffffffffffffff:
+            out += b'\xcf' + _Q.pack(v)
+        else:
+            raise ValueError(f'{v} is too large for MessagePack')
+    elif v >= -0x80:
+        out += b'\xd0' + _b.pack(v)
+    elif v >= -0x8000:
+        out += b'\xd1' + _h.pack(v)
+    elif v >= -0x80000000:
+        out += b'\xd2' + _i.pack(v)
+    elif v >= -0x8000000000000000:
+        out += b'\xd3' + _q.pack(v)
+    else:
+        raise ValueError(f'{v} is too small for MessagePack')
+
+
+def _packLength(out: bytearray,
+                n: int,
+                fix: int,
+                fixMax: int,
+                codes: bytes) -> None:
+    """Writes the header of a string, binary, array or map"""
+    if n < fixMax:
+        out.append(fix | n)
+    elif n <= 0xff and codes[0]:
+        out += bytes((codes[0], n))
+    elif n <= 0xffff:
+        out += bytes((codes[1],)) + _H.pack(n)
+    else:
+        out += bytes((codes[2],)) + _I.pack(n)
+
+
+def _pack(out: bytearray,
+          v: Any) -> None:
+    t = type(v)
+    if t is str:
+        b = v.encode('utf-8')
+        _packLength(out, len(b), 0xa0, 32, b'\xd9\xda\xdb')
+        out += b
+    elif v is None:
+        out.append(0xc0)
+    elif t is bool:
+        out.append(0xc3 if v else 0xc2)
+    elif t is int:
+        _packInt(out, v)
+    elif t is float:
+        out += b'\xcb' + _d.pack(v)
+    elif t is dict or isinstance(v, Mapping):
+        _packLength(out, len(v), 0x80, 16, b'\x00\xde\xdf')
+        for k, e in v.items():
+            _pack(out, k)
+            _pack(out, e)
+    elif t is list or t is tuple:
+        _packLength(out, len(v), 0x90, 16, b'\x00\xdc\xdd')
+        for e in v:
+            _pack(out, e)
+    elif t is bytes or t is bytearray:
+        _packLength(out, len(v), 0, 0, b'\xc4\xc5\xc6')
+        out += v
+    elif isinstance(v, int):
+        _packInt(out, int(v))
+    elif isinstance(v, float):
+        out += b'\xcb' + _d.pack(v)
+    elif isinstance(v, str):
+        _pack(out, str(v))
+    else:
+        raise TypeError(f'{type(v).__name__} cannot be written as'
+                        ' MessagePack')
+
+
+def dumps(data: Any) -> bytes:
+    """Encodes JSON compatible data as MessagePack"""
+    out = bytearray()
+    _pack(out, data)
+    return bytes(out)
+
+
+class _Unpacker():
+    """Decodes MessagePack data from a buffer"""
+
+    def __init__(self: '_Unpacker',
+                 buf: bytes) -> None:
+        self._buf = memoryview(buf)
+        self._pos = 0
+
+    def _take(self: '_Unpacker',
+              n: int) -> memoryview:
+        p = self._pos
+        if p + n > len(self._buf):
+            raise ValueError('Truncated MessagePack data')
+        self._pos = p + n
+        return self._buf[p:p + n]
+
+    def _unpack(self: '_Unpacker',
+                s: struct.Struct) -> Any:
+        v = s.unpack_from(self._buf, self._pos)[0]
+        self._pos += s.size
+        return v
+
+    def _str(self: '_Unpacker',
+             n: int) -> str:
+        return str(self._take(n), 'utf-8')
+
+    def _array(self: '_Unpacker',
+               n: int) -> List[Any]:
+        return [self.value() for _ in range(n)]
+
+    def _map(self: '_Unpacker',
+             n: int) -> Dict[Any, Any]:
+        d = {}
+        for _ in range(n):
+            k = self.value()
+            d[k] = self.value()
+        return d
+
+    def value(self: '_Unpacker') -> Any:
+        try:
+            c = self._buf[self._pos]
+        except IndexError:
+            raise ValueError('Truncated MessagePack data') from None
+        self._pos += 1
+        if c < 0x80:
+            return c
+        if c >= 0xe0:
+            return c - 0x100
+        if c < 0x90:
+            return self._map(c & 0x0f)
+        if c < 0xa0:
+            return self._array(c & 0x0f)
+        if c < 0xc0:
+            return self._str(c & 0x1f)
+        try:
+            handler = _CODES[c]
+        except KeyError:
+            raise ValueError(f'Unsupported MessagePack type 0x{c:02x}'
+                             ) from None
+        return handler(self)
+
+
+_CODES: Dict[int, Callable[[_Unpacker], Any]] = {
+    0xc0: lambda u: None,
+    0xc2: lambda u: False,
+    0xc3: lambda u: True,
+    0xc4: lambda u: bytes(u._take(u._unpack(_B))),
+    0xc5: lambda u: bytes(u._take(u._unpack(_H))),
+    0xc6: lambda u: bytes(u._take(u._unpack(_I))),
+    0xca: lambda u: u._unpack(_f),
+    0xcb: lambda u: u._unpack(_d),
+    0xcc: lambda u: u._unpack(_B),
+    0xcd: lambda u: u._unpack(_H),
+    0xce: lambda u: u._unpack(_I),
+    0xcf: lambda u: u._unpack(_Q),
+    0xd0: lambda u: u._unpack(_b),
+    0xd1: lambda u: u._unpack(_h),
+    0xd2: lambda u: u._unpack(_i),
+    0xd3: lambda u: u._unpack(_q),
+    0xd9: lambda u: u._str(u._unpack(_B)),
+    0xda: lambda u: u._str(u._unpack(_H)),
+    0xdb: lambda u: u._str(u._unpack(_I)),
+    0xdc: lambda u: u._array(u._unpack(_H)),
+    0xdd: lambda u: u._array(u._unpack(_I)),
+    0xde: lambda u: u._map(u._unpack(_H)),
+    0xdf: lambda u: u._map(u._unpack(_I)),
+}
+
+
+def loads(raw: bytes) -> Any:
+    """
+    Decodes MessagePack data.
+
+    :raises ValueError: The data is truncated, uses an unsupported type or is
+                        followed by extra data
+    """
+    u = _Unpacker(raw)
+    try:
+        v = u.value()
+    except struct.error:
+        raise ValueError('Truncated MessagePack data') from None
+    if u._pos != len(raw):
+        raise ValueError('Extra data after MessagePack value')
+    return v
+
+
+def handler(path: Optional[str] = '/etc/gvConfig',
+            file: Optional[str] = 'pre.msgpack') -> Mapping[str, Any]:
+    """
+    :param str path: Directory containing the MessagePack file
+    :param str file: Name of the MessagePack file
+    """
+    _path: Optional[Path] = Path(Path(path) / file) if path and file else None
+    if not (_path and _path.is_file()):
+        return {}
+    with _p.phase('read'):
+        raw = _path.read_bytes()
+    _p.count(len(raw))
+    with _p.phase('parse'):
+        data = loads(raw)
+    if not isinstance(data, dict):
+        raise ValueError(f'{_path} does not contain a map')
+    return data
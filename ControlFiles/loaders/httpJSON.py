@@ -0,0 +1,312 @@
+"""
+Network data loader for a central configuration store
+
+A site can keep its configuration in a central store that serves it over
+HTTP as JSON documents. When a whole fleet restarts, every node asking for the
+full document at once can saturate the store, although most nodes already
+have a copy that is current or nearly so. This loader therefore keeps a local
+copy of each document and asks the store only for what has changed:
+
+* Each document is cached beneath the parse cache directory (see
+  `ControlFiles.loaders.cache.defaultDirectory`) together with the ``ETag``
+  and version the store gave it, so the copy survives restarts.
+* A fetch of a cached document is conditional. It sends ``If-None-Match`` and
+  asks for the changes since the cached version with the ``since`` query
+  parameter. The store answers ``304 Not Modified`` when nothing has changed,
+  or a delta, or the full document when it no longer knows the version.
+* Connections are kept open and reused by later fetches from the same store,
+  so that reloads do not pay for a new connection each time.
+
+The protocol expected of the store is:
+
+* ``GET /name`` gives the document as a JSON object, with an ``ETag`` header
+  and an ``X-Config-Version`` header giving its version.
+* ``GET /name?since=version`` may instead give a delta, marked by an
+  ``X-Config-Delta`` header holding the version it applies to. Its body is
+  ``{"set": {key: value, ...}, "delete": [key, ...]}``.
+
+`ControlFiles.runners.configServer` is a stand-in store that follows this
+protocol for use in tests.
+
+When the store cannot be reached, or answers that it is overloaded or
+unavailable (``429`` or a ``5xx`` status), the cached copy is used if there is
+one, so a node can still start while the store is down or saturated.
+
+.. only:: development_administrator
+
+    Created on Oct. 17, 2026
+
+    @author: Jonathan Gossage
+"""
+
+import copy
+from hashlib import blake2b
+import http.client
+import json
+import os
+from pathlib import Path
+import tempfile
+import threading
+from typing import Any, Dict, Mapping, Optional, Tuple, Union
+from urllib.parse import quote, urlsplit
+
+from ControlFiles.loaders.cache import defaultDirectory
+from lib import cfgProfile as _p
+
+DELTA_HEADER = 'X-Config-Delta'
+VERSION_HEADER = 'X-Config-Version'
+
+# The open connections, by (scheme, host, port). A connection is used by one
+# fetch at a time.
+_connections: Dict[Tuple[str, str, int], http.client.HTTPConnection] = {}
+_connectionsLock = threading.Lock()
+# The number of cached documents kept in memory. The copies on disk hold the
+# others.
+MAX_DOCUMENTS = 8
+# The cached documents read or written most recently by this process, by
+# cache file, least recently used first
+_documents: Dict[Path, Dict[str, Any]] = {}
+_documentsLock = threading.Lock()
+
+
+class StoreUnavailable(ConnectionError):
+    """
+    The store answered that it is overloaded or cannot serve the document now
+    """
+
+
+def cacheDirectory() -> Path:
+    """Gives the directory holding the cached documents"""
+    return defaultDirectory() / 'http'
+
+
+def _cachePath(url: str,
+               directory: Optional[Path]) -> Path:
+    name = blake2b(url.encode('utf-8'), digest_size=16).hexdigest()
+    return (directory or cacheDirectory()) / f'{name}.json'
+
+
+def _readCache(url: str,
+               directory: Optional[Path]) -> Optional[Dict[str, Any]]:
+    path = _cachePath(url, directory)
+    with _documentsLock:
+        doc = _documents.pop(path, None)
+        if doc is not None:
+            _documents[path] = doc
+            return doc
+    try:
+        with path.open('rb') as f:
+            doc = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(doc, dict) or doc.get('url') != url:
+        return None
+    _remember(path, doc)
+    return doc
+
+
+def _remember(path: Path,
+              doc: Dict[str, Any]) -> None:
+    """Keeps a document in memory, forgetting the least recently used"""
+    with _documentsLock:
+        _documents.pop(path, None)
+        _documents[path] = doc
+        while len(_documents) > MAX_DOCUMENTS:
+            del _documents[next(iter(_documents))]
+
+
+def _writeCache(doc: Dict[str, Any],
+                directory: Optional[Path]) -> None:
+    """Replaces the cached copy of a document atomically"""
+    target = _cachePath(doc['url'], directory)
+    _remember(target, doc)
+    try:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=target.name)
+        try:
+            with os.fdopen(fd, 'wt', encoding='utf-8') as f:
+                json.dump(doc, f, separators=(',', ':'))
+            os.replace(tmp, target)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    except OSError:
+        pass  # The cache only saves work
+
+
+# The errors given when the store has closed an idle connection
+_CLOSED = (http.client.RemoteDisconnected, ConnectionResetError,
+           BrokenPipeError)
+
+
+def _exchange(conn: http.client.HTTPConnection,
+              target: str,
+              headers: Mapping[str, str]
+              ) -> Tuple[http.client.HTTPResponse, bytes]:
+    with _p.phase('open'):
+        conn.request('GET', target, headers=dict(headers))
+        response = conn.getresponse()
+    with _p.phase('read'):
+        body = response.read()
+    _p.count(len(body))
+    return response, body
+
+
+def _request(url: str,
+             headers: Mapping[str, str],
+             timeout: float) -> Tuple[http.client.HTTPResponse, bytes]:
+    """Sends a request on the open connection to the store if there is one"""
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise ValueError(f'{url} is not an HTTP URL')
+    key = (parts.scheme, parts.hostname,
+           parts.port or (443 if parts.scheme == 'https' else 80))
+    target = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+    with _connectionsLock:
+        conn = _connections.pop(key, None)
+    if conn is None:
+        cls = (http.client.HTTPSConnection if parts.scheme == 'https' else
+               http.client.HTTPConnection)
+        conn = cls(key[1], key[2], timeout=timeout)
+    else:
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+    try:
+        reused = conn.sock is not None
+        try:
+            response, body = _exchange(conn, target, headers)
+        except _CLOSED:
+            if not reused:
+                raise
+            # The store closed the connection while it was idle; a closed
+            # connection opens again when it is next used.
+            conn.close()
+            response, body = _exchange(conn, target, headers)
+    except BaseException:
+        conn.close()
+        raise
+    if response.will_close:
+        conn.close()
+    with _connectionsLock:
+        old = _connections.setdefault(key, conn)
+    if old is not conn:
+        conn.close()
+    return response, body
+
+
+def _store(url: str,
+           response: http.client.HTTPResponse,
+           data: Dict[str, Any],
+           directory: Optional[Path]) -> Dict[str, Any]:
+    doc = {'url': url, 'etag': response.getheader('ETag'),
+           'version': response.getheader(VERSION_HEADER), 'data': data}
+    _writeCache(doc, directory)
+    return doc
+
+
+def _copy(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Copies a cached document so that changing the copy, or its data, leaves
+    the document kept in memory alone
+    """
+    return dict(doc, data=copy.deepcopy(doc['data']))
+
+
+def _decode(url: str,
+            response: http.client.HTTPResponse,
+            body: bytes) -> Any:
+    if response.status == 429 or 500 <= response.status < 600:
+        raise StoreUnavailable(f'{url} gave HTTP status {response.status}')
+    if response.status != 200:
+        raise ValueError(f'{url} gave HTTP status {response.status}')
+    with _p.phase('parse'):
+        try:
+            return json.loads(body)
+        except ValueError as e:
+            raise ValueError(f'{url} gave invalid JSON: {e}') from None
+
+
+def fetch(url: str,
+          timeout: float=10.0,
+          directory: Optional[Union[Path, str]]=None) -> Dict[str, Any]:
+    """
+    Fetches a document from the store, asking only for the changes to the
+    cached copy.
+
+    :param str url:         The URL of the document
+    :param float timeout:   The seconds allowed for each network operation
+    :param Path directory:  The cache directory. The default is given by
+                            `cacheDirectory`.
+    :return: A copy of the cache record of the document, a dict holding its
+             ``url``, ``etag``, ``version`` and ``data``
+    :raises OSError:    The store could not be reached. `StoreUnavailable`
+                        when it answered that it is overloaded or
+                        unavailable.
+    :raises http.client.HTTPException: The store broke off its answer
+    :raises ValueError: The store gave an error or an invalid document
+    """
+    directory = Path(directory) if directory is not None else None
+    cached = _readCache(url, directory)
+    headers = {'Accept': 'application/json'}
+    target = url
+    if cached is not None:
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('version') is not None:
+            target += ('&' if urlsplit(url).query else '?') + \
+                f'since={quote(str(cached["version"]))}'
+    response, body = _request(target, headers, timeout)
+    if response.status == 304 and cached is not None:
+        return _copy(cached)
+    payload = _decode(url, response, body)
+    base = response.getheader(DELTA_HEADER)
+    if base is not None and cached is not None and\
+       str(cached.get('version')) == base and isinstance(payload, dict):
+        data = dict(cached['data'])
+        data.update(payload.get('set', {}))
+        for k in payload.get('delete', ()):
+            data.pop(k, None)
+    elif base is not None:
+        # A delta against a copy that is not ours; fetch all of it.
+        response, body = _request(url, {'Accept': 'application/json'},
+                                  timeout)
+        data = _decode(url, response, body)
+    else:
+        data = payload
+    if not isinstance(data, dict):
+        raise ValueError(f'{url} does not contain a JSON object')
+    return _copy(_store(url, response, data, directory))
+
+
+def closeConnections() -> None:
+    """Closes the open connections to every store"""
+    with _connectionsLock:
+        conns = list(_connections.values())
+        _connections.clear()
+    for c in conns:
+        c.close()
+
+
+def handler(url: str,
+            timeout: float=10.0,
+            cache: Optional[Union[Path, str]]=None,
+            offline: bool=True) -> Mapping[str, Any]:
+    """
+    :param str url:       The URL of the configuration document
+    :param float timeout: The seconds allowed for each network operation
+    :param Path cache:    The cache directory. The default is given by
+                          `cacheDirectory`.
+    :param bool offline:  Use the cached copy when the store cannot be
+                          reached. Otherwise the error is raised.
+    """
+    try:
+        return fetch(url, timeout, cache)['data']
+    except (OSError, http.client.HTTPException) as e:
+        cached = _readCache(url, Path(cache) if cache is not None else None)
+        if not offline or cached is None:
+            raise
+        import logging
+        logging.getLogger(__name__).warning(
+            'Using the cached copy of %s: %s', url, e)
+        return copy.deepcopy(cached['data'])
@@ -0,0 +1,277 @@
+"""
+Compiled configuration snapshots
+
+A snapshot is a binary image of a parsed JSON configuration file that is
+written alongside the file. It is memory mapped when it is used and only the
+entries that are actually requested are decoded, so a process that reads five
+keys does not pay for parsing five thousand.
+
+A snapshot records the size, modification time and content hash of the file it
+was compiled from. It is ignored, and eventually rewritten, as soon as the file
+no longer matches.
+
+The layout, all integers being little-endian, is:
+
+* A header giving the magic number, the format version, the codec used for
+  the values, the size, modification time and hash of the source file and
+  the number of entries. Snapshots of files always use JSON. Other codecs,
+  such as the pickle used for the segments of `lib.cfgShared`, are only read
+  by the code that wrote them, which gives the means to decode them, so a
+  snapshot planted beside a configuration file cannot run code in the
+  programs that read it.
+* An index with one record per top level key giving the offset and length of
+  the key and of the encoded value. The records are sorted by the UTF-8
+  encoding of the key so that a key can be found with a binary search.
+* The encoded keys and values.
+
+.. only:: development_administrator
+
+    Created on Oct. 17, 2026
+
+    @author: Jonathan Gossage
+"""
+
+from hashlib import blake2b
+import json
+import mmap
+import os
+from pathlib import Path
+import struct
+import tempfile
+from typing import (Any, Callable, Dict, Iterator, Mapping, Optional, Tuple,
+                    Union)
+
+SUFFIX = '.gvcs'
+"""Suffix added to the name of a source file to give the snapshot name"""
+MAGIC = b'GVCS'
+FORMAT = 1
+CODEC_JSON = 0
+CODEC_PICKLE = 1
+
+_HEADER = struct.Struct('<4sHBxQQ32sI')
+_INDEX = struct.Struct('<QQQQ')
+_MISSING = object()
+
+
+def digest(raw: bytes) -> bytes:
+    """Gives the content hash recorded for a source file"""
+    return blake2b(raw, digest_size=32).digest()
+
+
+def snapshotPath(source: Union[Path, str]) -> Path:
+    """Gives the path of the snapshot compiled from a source file"""
+    source = Path(source)
+    return source.with_name(source.name + SUFFIX)
+
+
+def _encode(value: Any) -> bytes:
+    return json.dumps(value, separators=(',', ':')).encode('utf-8')
+
+
+def _decode(raw: bytes) -> Any:
+    return json.loads(raw)
+
+
+class Snapshot(Mapping[str, Any]):
+    """
+    Read-only mapping over the contents of a snapshot.
+
+    Values are decoded the first time they are requested and are kept for
+    later requests. The mapping can be built on any buffer, such as a memory
+    mapped file.
+
+    :param buffer: The snapshot image
+    :param owner:  An object that must be kept alive for as long as the buffer
+                   is in use, such as the shared memory segment holding it
+    :param function decode: Decodes a value of a snapshot whose codec is not
+                            JSON. Only JSON snapshots can be read without it.
+    :raises ValueError: The buffer is not a snapshot, or its codec is not JSON
+                        and no decoder is given
+    """
+
+    def __init__(self: 'Snapshot',
+                 buffer: Union[bytes, mmap.mmap, memoryview],
+                 owner: Optional[Any]=None,
+                 decode: Optional[Callable[[bytes], Any]]=None) -> None:
+        self._owner = owner
+        self._buf = memoryview(buffer)
+        magic, fmt, codec, size, mtime, dig, count = \
+            _HEADER.unpack_from(self._buf)
+        if magic != MAGIC or fmt != FORMAT:
+            raise ValueError('Not a configuration snapshot')
+        if codec != CODEC_JSON and decode is None:
+            raise ValueError(f'Snapshot codec {codec} is not accepted')
+        self._codec = codec
+        self._decode = decode
+        self._source = (size, mtime, dig)
+        self._count = count
+        self._decoded: Dict[str, Any] = {}
+
+    @property
+    def source(self: 'Snapshot'):
+        """The size, modification time and hash of the source file"""
+        return self._source
+
+    @property
+    def codec(self: 'Snapshot') -> int:
+        """How the values are encoded"""
+        return self._codec
+
+    def encoded(self: 'Snapshot',
+                key: str) -> Optional[memoryview]:
+        """
+        Gives the encoded value of a key without decoding it, or None if the
+        key is not in the snapshot
+        """
+        record = self._find(key)
+        if record is None:
+            return None
+        _, _, vo, vl = record
+        return self._buf[vo:vo + vl]
+
+    def _record(self: 'Snapshot',
+                i: int):
+        return _INDEX.unpack_from(self._buf, _HEADER.size + i * _INDEX.size)
+
+    def _key(self: 'Snapshot',
+             i: int) -> bytes:
+        ko, kl, _, _ = self._record(i)
+        return self._buf[ko:ko + kl].tobytes()
+
+    def _find(self: 'Snapshot',
+              key: str) -> Optional[Tuple[int, int, int, int]]:
+        """Gives the index record of a key, or None"""
+        target = key.encode('utf-8')
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._count:
+            record = self._record(lo)
+            ko, kl, _, _ = record
+            if self._buf[ko:ko + kl] == target:
+                return record
+        return None
+
+    def __getitem__(self: 'Snapshot',
+                    key: str) -> Any:
+        value = self._decoded.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        record = self._find(key)
+        if record is None:
+            raise KeyError(key)
+        _, _, vo, vl = record
+        raw = self._buf[vo:vo + vl].tobytes()
+        value = _decode(raw) if self._decode is None else self._decode(raw)
+        self._decoded[key] = value
+        return value
+
+    def __contains__(self: 'Snapshot',
+                     key: object) -> bool:
+        # Without decoding the value, as Mapping would
+        return isinstance(key, str) and (key in self._decoded or
+                                         self._find(key) is not None)
+
+    def __iter__(self: 'Snapshot') -> Iterator[str]:
+        buf = self._buf
+        index = buf[_HEADER.size:_HEADER.size + self._count * _INDEX.size]
+        for ko, kl, _, _ in _INDEX.iter_unpack(index):
+            yield str(buf[ko:ko + kl], 'utf-8')
+
+    def __len__(self: 'Snapshot') -> int:
+        return self._count
+
+
+def build(data: Mapping[str, Any],
+          size: int=0,
+          mtime: int=0,
+          dig: bytes=bytes(32),
+          codec: int=CODEC_JSON,
+          encode: Optional[Callable[[Any], bytes]]=None) -> bytes:
+    """
+    Encodes a mapping as a snapshot image.
+
+    :param Mapping data: The top level keys and values to be encoded
+    :param int size:     The size of the source file
+    :param int mtime:    The modification time of the source file in
+                         nanoseconds
+    :param bytes dig:    The hash of the source file as given by `digest`
+    :param int codec:    How the values are encoded
+    :param function encode: Encodes a value when the codec is not JSON
+    """
+    if codec != CODEC_JSON and encode is None:
+        raise ValueError(f'Snapshot codec {codec} needs an encoder')
+    encode = encode or _encode
+    items = sorted((k.encode('utf-8'), encode(v))
+                   for k, v in data.items())
+    offset = _HEADER.size + len(items) * _INDEX.size
+    index = bytearray()
+    body = bytearray()
+    for k, v in items:
+        index += _INDEX.pack(offset + len(body), len(k),
+                             offset + len(body) + len(k), len(v))
+        body += k
+        body += v
+    return _HEADER.pack(MAGIC, FORMAT, codec, size, mtime, dig,
+                        len(items)) + bytes(index) + bytes(body)
+
+
+def write(source: Path,
+          data: Mapping[str, Any],
+          raw: bytes,
+          st: os.stat_result) -> None:
+    """
+    Writes the snapshot for a source file. The snapshot is replaced atomically
+    so that a concurrent reader sees either the old or the new snapshot.
+
+    :param Path source:   The source file
+    :param Mapping data:  The parsed contents of the source file
+    :param bytes raw:     The contents of the source file
+    :param stat_result st: The status of the source file, taken before it was
+                           read
+    """
+    image = build(data, st.st_size, st.st_mtime_ns, digest(raw))
+    target = snapshotPath(source)
+    fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=target.name)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(image)
+        # Readable by every program that reads the source, but mkstemp makes
+        # the file private to its owner
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, target)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def load(source: Path,
+         verify: bool=False) -> Optional[Snapshot]:
+    """
+    Maps the snapshot of a source file.
+
+    :param Path source: The source file
+    :param bool verify: Compare the content hash as well as the size and
+                        modification time of the source file
+    :return: The snapshot or None if there is no current snapshot
+    """
+    try:
+        st = source.stat()
+        with snapshotPath(source).open('rb') as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):  # Missing or empty snapshot
+        return None
+    try:
+        snap = Snapshot(buf)
+    except (ValueError, struct.error):
+        return None
+    size, mtime, dig = snap.source
+    if size != st.st_size or mtime != st.st_mtime_ns:
+        return None
+    if verify and dig != digest(source.read_bytes()):
+        return None
+    return snap
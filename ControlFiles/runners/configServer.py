@@ -0,0 +1,230 @@
+"""
+A stand-in for the central configuration store
+
+The server holds named configuration documents in memory and serves them with
+the protocol expected by `ControlFiles.loaders.httpJSON`. Every change to a
+document gives it a new version. The server remembers the changes made by the
+most recent versions so that it can answer a request for the changes since
+one of them with a delta. It keeps connections open between requests and
+counts the requests, connections and bytes it serves, which lets tests check
+that a client fetches no more than it needs.
+
+It is meant for tests and for trying a fleet configuration on one computer::
+
+    python -m ControlFiles.runners.configServer site.json --port 8765
+
+serves the contents of ``site.json`` as ``/site``.
+
+.. only:: development_administrator
+
+    Created on Oct. 17, 2026
+
+    @author: Jonathan Gossage
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from ControlFiles.loaders.httpJSON import DELTA_HEADER, VERSION_HEADER
+
+# The number of versions of a document for which deltas can be given
+HISTORY = 64
+
+
+class _Document():
+    """A document and the changes made by its recent versions"""
+    __slots__ = ('data', 'version', 'body', 'changes')
+
+    def __init__(self: '_Document',
+                 data: Mapping[str, Any]) -> None:
+        self.data = dict(data)
+        self.version = 1
+        self.body = json.dumps(self.data).encode('utf-8')
+        # The keys set and deleted by each version, oldest first
+        self.changes: List[Tuple[int, Dict[str, Any], List[str]]] = []
+
+    @property
+    def etag(self: '_Document') -> str:
+        return f'"{self.version}"'
+
+    def update(self: '_Document',
+               changes: Mapping[str, Any],
+               deletions: Iterable[str]) -> None:
+        deleted = [k for k in deletions if k in self.data]
+        for k in deleted:
+            del self.data[k]
+        self.data.update(changes)
+        self.version += 1
+        self.body = json.dumps(self.data).encode('utf-8')
+        self.changes.append((self.version, dict(changes), deleted))
+        del self.changes[:-HISTORY]
+
+    def delta(self: '_Document',
+              since: int) -> Optional[bytes]:
+        """
+        :return: The changes made after a version, or None if they are not
+                 known
+        """
+        later = [c for c in self.changes if c[0] > since]
+        if since >= self.version or len(later) != self.version - since:
+            return None
+        changed: Dict[str, Any] = {}
+        deleted = set()
+        for _, s, d in later:
+            for k in d:
+                changed.pop(k, None)
+                deleted.add(k)
+            for k, v in s.items():
+                changed[k] = v
+                deleted.discard(k)
+        return json.dumps({'set': changed,
+                           'delete': sorted(deleted)}).encode('utf-8')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep connections open
+    server: 'ConfigServer'
+
+    def setup(self: '_Handler') -> None:
+        super().setup()
+        self.server._counted('connections')
+
+    def do_GET(self: '_Handler') -> None:
+        parts = urlsplit(self.path)
+        name = parts.path.strip('/')
+        since = parse_qs(parts.query).get('since')
+        headers: Dict[str, str] = {}
+        with self.server._lock:
+            self.server.stats['requests'] += 1
+            doc = self.server._documents.get(name)
+            if self.server.busy is not None:
+                status, body = self.server.busy, b''
+            elif doc is None:
+                status, body = 404, b''
+            else:
+                headers = {'ETag': doc.etag,
+                           VERSION_HEADER: str(doc.version)}
+                delta = None
+                if since and since[0].isdigit():
+                    delta = doc.delta(int(since[0]))
+                if self.headers.get('If-None-Match') == doc.etag:
+                    status, body = 304, b''
+                elif delta is not None:
+                    status, body = 200, delta
+                    headers[DELTA_HEADER] = since[0]
+                else:
+                    status, body = 200, doc.body
+            self.server.stats['bytes'] += len(body)
+        self.send_response(status)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        if status != 304:
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self: '_Handler',
+                    *args: Any) -> None:
+        pass
+
+
+class ConfigServer(ThreadingHTTPServer):
+    """
+    Serves configuration documents on the loopback interface.
+
+    :param int port:  The port to listen on. The default is a free port.
+    :ivar dict stats: The number of ``requests`` answered, ``connections``
+                      accepted and body ``bytes`` sent
+    :ivar int busy:   The status given to every request while it is set, such
+                      as 503 to stand in for an overloaded store
+    """
+    daemon_threads = True
+
+    def __init__(self: 'ConfigServer',
+                 port: int=0,
+                 host: str='127.0.0.1') -> None:
+        super().__init__((host, port), _Handler)
+        self._lock = threading.Lock()
+        self._documents: Dict[str, _Document] = {}
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {'requests': 0, 'connections': 0, 'bytes': 0}
+        self.busy: Optional[int] = None
+
+    def _counted(self: 'ConfigServer',
+                 name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+
+    def url(self: 'ConfigServer',
+            name: str) -> str:
+        """Gives the URL of a document"""
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/{name}'
+
+    def publish(self: 'ConfigServer',
+                name: str,
+                data: Mapping[str, Any]) -> None:
+        """Replaces a document, forgetting its history"""
+        with self._lock:
+            old = self._documents.get(name)
+            doc = _Document(data)
+            if old is not None:
+                doc.version = old.version + 1
+            self._documents[name] = doc
+
+    def update(self: 'ConfigServer',
+               name: str,
+               changes: Mapping[str, Any],
+               deletions: Iterable[str]=()) -> None:
+        """Changes some of the entries of a document"""
+        with self._lock:
+            self._documents[name].update(changes, deletions)
+
+    def start(self: 'ConfigServer') -> 'ConfigServer':
+        """Serves requests in a background thread"""
+        self._thread = threading.Thread(target=self.serve_forever,
+                                        name='gvConfigServer', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self: 'ConfigServer') -> None:
+        if self._thread is not None:
+            self.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.server_close()
+
+    def __enter__(self: 'ConfigServer') -> 'ConfigServer':
+        return self.start()
+
+    def __exit__(self: 'ConfigServer',
+                 *exc: Any) -> None:
+        self.stop()
+
+
+def main(argv: Optional[List[str]]=None) -> None:
+    import argparse
+    from pathlib import Path
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('files', nargs='+', type=Path,
+                        help='JSON files, each served under its stem')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args(argv)
+    server = ConfigServer(args.port)
+    for f in args.files:
+        server.publish(f.stem, json.loads(f.read_text(encoding='utf-8')))
+        print(server.url(f.stem))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
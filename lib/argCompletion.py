@@ -0,0 +1,235 @@
+"""
+Shell completion for programs that use `lib.parse_arguments`
+
+A completion function that runs the program to find its options starts a
+Python interpreter, imports the program and builds its parser on every press
+of TAB, which is painfully slow on a loaded host. The options of a program are
+fixed by its configuration entries (see `lib.parse_arguments.Arguments`), so
+they can instead be written out once, when the program is installed:
+
+* a compact JSON index of the options and positional arguments of the program,
+  with the choices, metavariables and help of each, for tools that provide
+  their own completion
+* a ``bash`` completion script
+* a ``zsh`` completion function
+
+The scripts hold everything they need and never run the program. They
+complete option names, the choices of options and arguments that have them,
+and file names for arguments whose type is a file or a path.
+
+`scripts.generateCompletion` writes all three files for a program.
+
+.. only:: development_administrator
+
+    Created on Oct. 17, 2026
+
+    @author: Jonathan Gossage
+"""
+
+import json
+import os
+from pathlib import Path
+import re
+import shlex
+from typing import (Any, Dict, List, Mapping, Optional, TYPE_CHECKING,
+                    Union)
+
+if TYPE_CHECKING:
+    from argparse import Action, ArgumentParser
+    from lib.configuration import CfgEntry
+
+FORMAT = 1
+
+
+def _takesFiles(action: 'Action') -> bool:
+    from argparse import FileType
+    from pathlib import PurePath
+    t = action.type
+    return isinstance(t, FileType) or (isinstance(t, type) and
+                                       issubclass(t, PurePath))
+
+
+def _describe(action: 'Action') -> Dict[str, Any]:
+    from argparse import SUPPRESS
+    desc: Dict[str, Any] = {
+        'nargs': action.nargs,
+        'choices': (None if action.choices is None else
+                    [str(c) for c in action.choices]),
+        'metavar': (action.metavar if isinstance(action.metavar, str) else
+                    None if action.nargs == 0 else
+                    action.dest.upper() if action.option_strings else
+                    action.dest),
+        'help': None if action.help in (None, SUPPRESS) else action.help,
+        'files': _takesFiles(action)}
+    if isinstance(desc['nargs'], str) and desc['nargs'] == '...':
+        desc['nargs'] = '*'
+    return desc
+
+
+def build(parser: 'ArgumentParser') -> Dict[str, Any]:
+    """
+    Builds the completion index of a parser.
+
+    :return: The index, of the form::
+
+                 {"format": 1, "prog": "name",
+                  "options": [{"names": ["-w", "--workers"], "nargs": null,
+                               "choices": null, "metavar": "WORKERS",
+                               "help": "...", "files": false,
+                               "repeat": false}, ...],
+                  "positionals": [{"nargs": "*", "choices": null,
+                                   "metavar": "NAME", "help": "...",
+                                   "files": false}, ...]}
+
+             ``nargs`` is 0 for an option that takes no value.
+    """
+    from argparse import SUPPRESS
+    from argparse import _AppendAction, _AppendConstAction, _CountAction
+    from lib.parse_arguments import handleVerbosity
+    repeated = (_AppendAction, _AppendConstAction, _CountAction,
+                handleVerbosity)
+    index: Dict[str, Any] = {'format': FORMAT, 'prog': parser.prog,
+                             'options': [], 'positionals': []}
+    for action in parser._actions:
+        if action.help is SUPPRESS:
+            continue
+        desc = _describe(action)
+        if action.option_strings:
+            desc['names'] = list(action.option_strings)
+            desc['repeat'] = isinstance(action, repeated)
+            index['options'].append(desc)
+        else:
+            index['positionals'].append(desc)
+    return index
+
+
+def fromConfiguration(cfg: Mapping[str, 'CfgEntry'],
+                      prog: Optional[str]=None) -> Dict[str, Any]:
+    """
+    Builds the completion index of the options given by a configuration.
+
+    :param Mapping cfg: The configuration entries, by key
+    :param str prog:    The name the program is run by. The default is the
+                        name of the running program.
+    """
+    from lib.parse_arguments import Arguments
+    index = build(Arguments(cfg=cfg).parser())
+    if prog is not None:
+        index['prog'] = prog
+    return index
+
+
+def _function(prog: str) -> str:
+    """Gives a shell function name for a program"""
+    return '_gv_' + re.sub(r'\W', '_', prog)
+
+
+def bash(index: Mapping[str, Any]) -> str:
+    """Writes the bash completion script of a completion index"""
+    prog = index['prog']
+    cases = []
+    for o in index['options']:
+        if o['nargs'] == 0:
+            continue
+        if o['choices'] is not None:
+            words = shlex.quote(' '.join(o['choices']))
+            reply = f'COMPREPLY=($(compgen -W {words} -- "$cur"))'
+        elif o['files']:
+            reply = 'COMPREPLY=($(compgen -f -- "$cur"))'
+        else:
+            reply = 'COMPREPLY=()'
+        cases.append(f'        {"|".join(o["names"])})\n'
+                     f'            {reply}\n'
+                     f'            return;;')
+    names = shlex.quote(' '.join(n for o in index['options']
+                                 for n in o['names']))
+    choices = [c for p in index['positionals'] if p['choices']
+               for c in p['choices']]
+    if choices:
+        positional = (f'COMPREPLY=($(compgen -W'
+                      f' {shlex.quote(" ".join(choices))} -- "$cur"))')
+    elif any(p['files'] for p in index['positionals']):
+        positional = 'COMPREPLY=($(compgen -f -- "$cur"))'
+    else:
+        positional = 'COMPREPLY=()'
+    caseBlock = ('    case "$prev" in\n' + '\n'.join(cases) +
+                 '\n    esac\n') if cases else ''
+    return (f'# bash completion for {prog}, generated by'
+            f' lib.argCompletion\n'
+            f'{_function(prog)}() {{\n'
+            f'    local cur="${{COMP_WORDS[COMP_CWORD]}}"\n'
+            f'    local prev="${{COMP_WORDS[COMP_CWORD-1]}}"\n'
+            f'{caseBlock}'
+            f'    if [[ "$cur" == -* ]]; then\n'
+            f'        COMPREPLY=($(compgen -W {names} -- "$cur"))\n'
+            f'    else\n'
+            f'        {positional}\n'
+            f'    fi\n'
+            f'}}\n'
+            f'complete -F {_function(prog)} {shlex.quote(prog)}\n')
+
+
+def _zshQuote(text: str,
+              special: str='[]:\\') -> str:
+    """
+    Quotes text for use within single quotes in a zsh ``_arguments``
+    specification, escaping the characters that are special there
+    """
+    text = ''.join('\\' + c if c in special else c for c in text)
+    return text.replace("'", "'\\''")
+
+
+def _zshAction(desc: Mapping[str, Any]) -> str:
+    metavar = _zshQuote(desc['metavar'] or '')
+    if desc['choices'] is not None:
+        choices = ' '.join(_zshQuote(c).replace(' ', '\\ ')
+                           for c in desc['choices'])
+        return f'{metavar}:({choices})'
+    return f'{metavar}:_files' if desc['files'] else f'{metavar}: '
+
+
+def zsh(index: Mapping[str, Any]) -> str:
+    """Writes the zsh completion function of a completion index"""
+    prog = index['prog']
+    specs = []
+    for o in index['options']:
+        names = o['names']
+        help = f'[{_zshQuote(o["help"], "[]")}]' if o['help'] else ''
+        value = '' if o['nargs'] == 0 else ':' + _zshAction(o)
+        repeat = '*' if o['repeat'] else ''
+        if len(names) == 1:
+            specs.append(f"'{repeat}{names[0]}{help}{value}'")
+        else:
+            # An option that is not repeated excludes its other names
+            prefix = f"'{repeat or '(' + ' '.join(names) + ')'}'"
+            specs.append(f"{prefix}{{{','.join(names)}}}'{help}{value}'")
+    for p in index['positionals']:
+        prefix = {'*': '*', '+': '*', '?': ':'}.get(p['nargs'], '')
+        specs.append(f"'{prefix}:{_zshAction(p)}'")
+    lines = ' \\\n    '.join(specs)
+    return (f'#compdef {prog}\n'
+            f'# zsh completion for {prog}, generated by lib.argCompletion\n'
+            f'_arguments -s \\\n    {lines}\n')
+
+
+def write(index: Mapping[str, Any],
+          directory: Union[Path, str]) -> List[Path]:
+    """
+    Writes the completion files of a program: ``prog.json``, the bash script
+    ``prog.bash`` and the zsh function ``_prog``.
+
+    :return: The files written
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    prog = index['prog']
+    files = {directory / f'{prog}.json': json.dumps(index,
+                                                    separators=(',', ':')),
+             directory / f'{prog}.bash': bash(index),
+             directory / f'_{prog}': zsh(index)}
+    for path, text in files.items():
+        tmp = path.with_name(f'.{path.name}.tmp')
+        tmp.write_text(text, encoding='utf-8')
+        os.replace(tmp, path)
+    return list(files)
+
@@ -0,0 +1,92 @@
+"""
+Typed accessors for frequently read configuration keys
+
+Code on a hot path that reads a configuration key each time it runs would
+otherwise look the key up, unwrap the `CfgEntry` and convert the value on every
+call. An accessor is declared once for a key and a conversion. It keeps the
+converted value until the entry for its key changes; the configuration clears
+it as part of publishing the change, so a read that follows a change always
+sees the new value. The value of a `lib.configuration.LazyValue` with a time
+to live is only kept until the lazy value expires.
+
+.. only:: development_administrator
+
+    Created on Oct. 17, 2026
+
+    @author: Jonathan Gossage
+"""
+
+from time import monotonic
+from typing import Any, Callable, Optional, TYPE_CHECKING
+
+from lib.cfgLayers import MISSING
+
+if TYPE_CHECKING:
+    from lib.configuration import Configuration
+
+
+class Accessor():
+    """
+    Gives the converted value of one configuration key. Accessors are
+    created with `Configuration.accessor`.
+
+    :param Configuration cfg:   The configuration that holds the key
+    :param str key:             The configuration key
+    :param function convert:    Converts the value of the entry. The value is
+                                used as it is by default.
+    :param default:             The value given when the key is not in the
+                                configuration. It is not converted.
+    """
+    __slots__ = ('key', '_cfg', '_convert', '_default', '_value', '_expires',
+                 '__weakref__')
+
+    def __init__(self: 'Accessor',
+                 cfg: 'Configuration',
+                 key: str,
+                 convert: Optional[Callable[[Any], Any]]=None,
+                 default: Optional[Any]=None) -> None:
+        self.key = key
+        self._cfg = cfg
+        self._convert = convert
+        self._default = default
+        self._value: Any = MISSING
+        # When the cached value comes from a lazy value that expires
+        self._expires: Optional[float] = None
+
+    @property
+    def value(self: 'Accessor') -> Any:
+        v = self._value
+        if v is MISSING or (self._expires is not None and
+                            monotonic() >= self._expires):
+            v = self._load()
+        return v
+
+    def __call__(self: 'Accessor') -> Any:
+        return self.value
+
+    def invalidate(self: 'Accessor') -> None:
+        """Discards the cached value"""
+        self._value = MISSING
+
+    def _load(self: 'Accessor') -> Any:
+        # The lock keeps a change from invalidating the value between reading
+        # the entry and caching the converted value.
+        from lib.configuration import LazyValue
+        with self._cfg._lock:
+            entry = self._cfg.get(self.key)
+            expires = None
+            if entry is None:
+                v = self._default
+            else:
+                v = entry.value
+                if self._convert is not None:
+                    v = self._convert(v)
+                raw = entry._value
+                if type(raw) is LazyValue and raw.ttl is not None:
+                    expires = raw._expires
+            self._value = v
+            self._expires = expires
+        return v
+
+    def __repr__(self: 'Accessor') -> str:
+        return f'Accessor({self.key!r})'
@@ -0,0 +1,136 @@
+"""
+Delivery of configuration changes to subscribers
+
+Components register interest in the configuration keys that they use, either
+by naming the keys exactly or by giving a key prefix followed by ``*``, such as
+``log.*``. A lone ``*`` matches every key. When the configuration changes, each
+subscriber is called once with a `ConfigDiff` that only contains the keys that
+it is interested in.
+
+The subscriptions are indexed by exact key and by prefix so that the cost of
+delivering a change depends on the keys that changed and the subscribers
+affected by them, not on the total number of subscribers.
+
+.. only:: development_administrator
+
+    Created on Oct. 17, 2026
+
+    @author: Jonathan Gossage
+"""
+
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from lib.cfgWatch import ConfigDiff
+
+SUBSCRIBER = Callable[[ConfigDiff], None]
+
+
+class Subscription():
+    """
+    The registration of a callback for a set of keys and key prefixes.
+    It is returned by `Subscriptions.add` and is used to cancel the
+    registration.
+    """
+    __slots__ = ('callback', 'keys', 'prefixes')
+
+    def __init__(self: 'Subscription',
+                 callback: SUBSCRIBER,
+                 keys: Set[str],
+                 prefixes: Set[str]) -> None:
+        self.callback = callback
+        self.keys = keys
+        self.prefixes = prefixes
+
+
+class Subscriptions():
+    """
+    Indexes subscriptions by key and by key prefix and dispatches changes to
+    them. Subscriptions can be added and removed by any thread, including
+    from a callback, while changes are dispatched.
+    """
+
+    def __init__(self: 'Subscriptions') -> None:
+        # Guards the indexes. It is never held while a callback runs.
+        self._lock = threading.Lock()
+        self._exact: Dict[str, List[Subscription]] = {}
+        self._prefix: Dict[str, List[Subscription]] = {}
+        # The distinct prefix lengths, so that a key only has to be checked
+        # against the prefixes that could match it.
+        self._lengths: Dict[int, int] = {}
+
+    def add(self: 'Subscriptions',
+            callback: SUBSCRIBER,
+            keys: Optional[Iterable[str]]=None) -> Subscription:
+        """
+        Registers a callback.
+
+        :param function callback: Called with the changes to the keys of
+                                  interest
+        :param Iterable[str] keys: Keys, or prefixes followed by ``*``. Every
+                                   key is of interest if this is omitted.
+        """
+        keys = ('*',) if keys is None else tuple(keys)
+        sub = Subscription(callback,
+                           {k for k in keys if not k.endswith('*')},
+                           {k[:-1] for k in keys if k.endswith('*')})
+        with self._lock:
+            for k in sub.keys:
+                self._exact.setdefault(k, []).append(sub)
+            for p in sub.prefixes:
+                self._prefix.setdefault(p, []).append(sub)
+                self._lengths[len(p)] = self._lengths.get(len(p), 0) + 1
+        return sub
+
+    def remove(self: 'Subscriptions',
+               sub: Subscription) -> None:
+        """Cancels a subscription"""
+        with self._lock:
+            for index, keys in ((self._exact, sub.keys),
+                                (self._prefix, sub.prefixes)):
+                for k in keys:
+                    subs = index[k]
+                    subs.remove(sub)
+                    if not subs:
+                        del index[k]
+            for p in sub.prefixes:
+                self._lengths[len(p)] -= 1
+                if not self._lengths[len(p)]:
+                    del self._lengths[len(p)]
+
+    def matching(self: 'Subscriptions',
+                 key: str) -> List[Subscription]:
+        """Gives the subscriptions interested in a key"""
+        with self._lock:
+            return self._matching(key)
+
+    def _matching(self: 'Subscriptions',
+                  key: str) -> List[Subscription]:
+        """Must be called with the lock held"""
+        subs = list(self._exact.get(key, ()))
+        for n in self._lengths:
+            if n <= len(key):
+                subs.extend(self._prefix.get(key[:n], ()))
+        return subs
+
+    def dispatch(self: 'Subscriptions',
+                 diff: ConfigDiff) -> None:
+        """
+        Calls each subscription that is interested in any of the changes once,
+        with the part of the changes that it is interested in. The changes
+        are matched against the subscriptions as they are when the dispatch
+        starts.
+        """
+        parts: Dict[int, ConfigDiff] = {}
+        subs: Dict[int, Subscription] = {}
+        with self._lock:
+            for kind in ('added', 'removed', 'changed'):
+                for k, v in getattr(diff, kind).items():
+                    for sub in self._matching(k):
+                        part = parts.get(id(sub))
+                        if part is None:
+                            part = parts[id(sub)] = ConfigDiff()
+                            subs[id(sub)] = sub
+                        getattr(part, kind)[k] = v
+        for i, part in parts.items():
+            subs[i].callback(part)
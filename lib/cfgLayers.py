@@ -0,0 +1,167 @@
+"""
+Layered resolution of configuration data
+
+The configuration for an application is assembled from a number of sources
+such as the site, the application and the user. Each source supplies a layer
+of configuration entries and the layers are ranked so that an entry in a lower
+(more specific) layer overrides the same entry in a higher (more general)
+layer.
+
+Walking the layers every time an entry is requested makes the cost of a lookup
+proportional to the number of layers. Instead, the layers are merged once into
+a flattened view that holds the winning entry for every key together with the
+name of the layer that supplied it. Lookups are then a single dictionary access
+regardless of how many layers are stacked. When a layer changes, only the keys
+that the layer supplied before or after the change are resolved again.
+
+.. only:: development_administrator
+
+    Module management
+
+    Created on Oct. 17, 2026
+
+    @author: Jonathan Gossage
+"""
+
+from typing import Any, Dict, Iterable, Mapping, Optional, Sequence
+
+MISSING = object()
+"""Marks a key that had no entry in the flattened view"""
+
+
+class LayeredResolver():
+    """
+    Maintains the flattened view of a ranked set of configuration layers.
+
+    Layers are named and ranked by the order in which they are given, the
+    first layer having the lowest priority. The flattened view and the
+    provenance of every key are kept up to date as layers are changed, so that
+    `get` and `provenance` never need to look at the layers themselves.
+
+    :param Sequence[str] layers: The names of the layers, lowest priority
+                                 first.
+    """
+
+    def __init__(self: 'LayeredResolver',
+                 layers: Sequence[str]) -> None:
+        if len(set(layers)) != len(layers):
+            raise ValueError(f'Duplicate layer names in {layers}')
+        self._order: Sequence[str] = tuple(layers)
+        self._rank: Dict[str, int] = {n: i for i, n in enumerate(self._order)}
+        self._layers: Dict[str, Dict[str, Any]] = {n: {} for n in self._order}
+        self._flat: Dict[str, Any] = {}
+        self._provenance: Dict[str, str] = {}
+
+    @property
+    def layers(self: 'LayeredResolver') -> Sequence[str]:
+        """The names of the layers, lowest priority first"""
+        return self._order
+
+    @property
+    def flat(self: 'LayeredResolver') -> Dict[str, Any]:
+        """
+        The flattened view. This is the live dictionary maintained by the
+        resolver and must be treated as read-only by callers.
+        """
+        return self._flat
+
+    def layer(self: 'LayeredResolver',
+              name: str) -> Mapping[str, Any]:
+        """Gives the entries currently supplied by a layer"""
+        return self._layers[name]
+
+    def get(self: 'LayeredResolver',
+            key: str,
+            default: Optional[Any]=None) -> Optional[Any]:
+        return self._flat.get(key, default)
+
+    def provenance(self: 'LayeredResolver',
+                   key: str) -> Optional[str]:
+        """Gives the name of the layer that supplied the winning entry"""
+        return self._provenance.get(key)
+
+    def addLayer(self: 'LayeredResolver',
+                 name: str,
+                 before: Optional[str]=None) -> None:
+        """
+        Adds an empty layer. The new layer has the highest priority unless
+        `before` names an existing layer that it is to be ranked below.
+        """
+        if name in self._rank:
+            raise ValueError(f'Layer {name} is already defined')
+        order = list(self._order)
+        order.insert(self._rank[before] if before is not None else len(order),
+                     name)
+        self._order = tuple(order)
+        self._rank = {n: i for i, n in enumerate(self._order)}
+        self._layers[name] = {}
+
+    def setLayer(self: 'LayeredResolver',
+                 name: str,
+                 entries: Mapping[str, Any]) -> Dict[str, Any]:
+        """
+        Replaces the entire contents of a layer.
+
+        :return: The keys whose resolved entry changed, each with its previous
+                 entry or `MISSING`
+        """
+        old = self._layers[name]
+        new = dict(entries)
+        self._layers[name] = new
+        return self._resolve(name, old.keys() | new.keys())
+
+    def updateLayer(self: 'LayeredResolver',
+                    name: str,
+                    entries: Mapping[str, Any]) -> Dict[str, Any]:
+        """
+        Adds or replaces some of the entries in a layer.
+
+        :return: The keys whose resolved entry changed, each with its previous
+                 entry or `MISSING`
+        """
+        self._layers[name].update(entries)
+        return self._resolve(name, entries.keys())
+
+    def removeKeys(self: 'LayeredResolver',
+                   name: str,
+                   keys: Iterable[str]) -> Dict[str, Any]:
+        """
+        Removes entries from a layer. Keys not present in the layer are
+        ignored.
+
+        :return: The keys whose resolved entry changed, each with its previous
+                 entry or `MISSING`
+        """
+        layer = self._layers[name]
+        removed = [k for k in keys if layer.pop(k, MISSING) is not MISSING]
+        return self._resolve(name, removed)
+
+    def _resolve(self: 'LayeredResolver',
+                 name: str,
+                 keys: Iterable[str]) -> Dict[str, Any]:
+        """
+        Resolves the given keys after layer `name` has changed. A key that is
+        supplied by a layer above the changed layer cannot be affected and is
+        skipped without walking the layers.
+        """
+        rank = self._rank[name]
+        changed: Dict[str, Any] = {}
+        for k in keys:
+            winner = self._provenance.get(k)
+            if winner is not None and self._rank[winner] > rank:
+                continue
+            old = self._flat.get(k, MISSING)
+            for n in reversed(self._order[:rank + 1]):
+                v = self._layers[n].get(k, MISSING)
+                if v is not MISSING:
+                    if old is not v:
+                        changed[k] = old
+                    self._flat[k] = v
+                    self._provenance[k] = n
+                    break
+            else:
+                if old is not MISSING:
+                    changed[k] = old
+                    del self._flat[k]
+                self._provenance.pop(k, None)
+        return changed
@@ -0,0 +1,174 @@
+"""
+Timing of configuration loads
+
+The `profile` configuration entry profiles a whole program, which does not
+show which of the configuration sources makes startup slow. A load report
+records, for each source read by a load, the time spent in each phase of
+reading it together with the number of entries and bytes read, and the time
+spent merging each layer.
+
+The phases are:
+
+* open - opening the source, or mapping a snapshot of it
+* read - reading the raw data
+* parse - turning the raw data into values
+* validate - checking the values against the schema
+* merge - merging the values of a streamed source into its layer
+
+A loader reports its phases with `phase` and `count`. They do nothing unless
+the source is being recorded, which the configuration arranges with
+`recording` in the thread that reads the source. Phases may be nested; the
+time of an inner phase is not counted in the outer phase.
+
+.. only:: development_administrator
+
+    Created on Oct. 17, 2026
+
+    @author: Jonathan Gossage
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Any, Dict, Iterator, List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import logging
+
+PHASES = ('open', 'read', 'parse', 'validate', 'merge')
+
+
+class SourceProfile():
+    """
+    The measurements for one source.
+
+    :ivar dict times: The seconds spent in each phase
+    :ivar int entries: The number of top level entries read
+    :ivar int bytes:   The number of bytes read
+    """
+    __slots__ = ('source', 'layer', 'loader', 'times', 'entries', 'bytes',
+                 '_nested')
+
+    def __init__(self: 'SourceProfile',
+                 source: str,
+                 layer: str,
+                 loader: str) -> None:
+        self.source = source
+        self.layer = layer
+        self.loader = loader
+        self.times: Dict[str, float] = {}
+        self.entries = 0
+        self.bytes = 0
+        self._nested = 0.0  # Time spent in the inner phases of a phase
+
+    def add(self: 'SourceProfile',
+            phase: str,
+            seconds: float) -> None:
+        self.times[phase] = self.times.get(phase, 0.0) + seconds
+
+    @property
+    def total(self: 'SourceProfile') -> float:
+        return sum(self.times.values())
+
+    def asDict(self: 'SourceProfile') -> Dict[str, Any]:
+        return {'source': self.source, 'layer': self.layer,
+                'loader': self.loader, 'times': dict(self.times),
+                'entries': self.entries, 'bytes': self.bytes}
+
+
+class LoadReport():
+    """
+    The measurements for one load of a configuration.
+
+    :ivar list sources: A `SourceProfile` for each source in source order
+    :ivar dict merge:   The seconds spent merging each layer
+    """
+
+    def __init__(self: 'LoadReport') -> None:
+        self.sources: List[SourceProfile] = []
+        self.merge: Dict[str, float] = {}
+
+    def source(self: 'LoadReport',
+               name: str) -> Optional[SourceProfile]:
+        for p in self.sources:
+            if p.source == name:
+                return p
+        return None
+
+    @property
+    def total(self: 'LoadReport') -> float:
+        return sum(p.total for p in self.sources) + sum(self.merge.values())
+
+    def asDict(self: 'LoadReport') -> Dict[str, Any]:
+        return {'sources': [p.asDict() for p in self.sources],
+                'merge': dict(self.merge),
+                'total': self.total}
+
+    def format(self: 'LoadReport') -> str:
+        """Gives the report as a table with one line per source"""
+        lines = ['{:<16} {:<12} {:>8} {:>10} '.format('source', 'layer',
+                                                      'entries', 'bytes') +
+                 ' '.join(f'{p:>9}' for p in PHASES)]
+        for p in self.sources:
+            lines.append(f'{p.source:<16} {p.layer:<12} {p.entries:>8}'
+                         f' {p.bytes:>10} ' +
+                         ' '.join(f'{p.times.get(ph, 0.0) * 1000:>7.2f}ms'
+                                  for ph in PHASES))
+        for layer, seconds in self.merge.items():
+            lines.append(f'merge {layer:<10} {seconds * 1000:.2f}ms')
+        lines.append(f'total {self.total * 1000:.2f}ms')
+        return '\n'.join(lines)
+
+    def log(self: 'LoadReport',
+            logger: Optional['logging.Logger']=None,
+            level: Optional[int]=None) -> None:
+        """
+        Logs the report.
+
+        :param Logger logger: The default is the logger of this module
+        :param int level:     The default is ``logging.INFO``
+        """
+        import logging
+        if level is None:
+            level = logging.INFO
+        (logger or logging.getLogger(__name__)).log(
+            level, 'Configuration load report\n%s', self.format())
+
+
+_current: ContextVar[Optional[SourceProfile]] = \
+    ContextVar('gvConfigProfile', default=None)
+
+
+@contextmanager
+def recording(profile: Optional[SourceProfile]) -> Iterator[None]:
+    """Records the phases reported in this context in a source profile"""
+    token = _current.set(profile)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Times a phase of reading the source being recorded"""
+    p = _current.get()
+    if p is None:
+        yield
+        return
+    saved = p._nested
+    p._nested = 0.0
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = perf_counter() - start
+        p.add(name, elapsed - p._nested)
+        p._nested = saved + elapsed
+
+
+def count(nbytes: int) -> None:
+    """Adds to the number of bytes read from the source being recorded"""
+    p = _current.get()
+    if p is not None:
+        p.bytes += nbytes
@@ -0,0 +1,188 @@
+"""
+Validation of configuration values
+
+A schema describes the values that are acceptable for configuration keys: their
+type, the number of values, the permitted choices and the permitted range.
+A schema is compiled once into one validation function per key, each of which
+only performs the checks that apply to its key. Whole sources are then
+validated in bulk as they are loaded and every problem found is reported
+together, so that a bad value is caught when the configuration is loaded rather
+than deep inside the application.
+
+A schema can be derived from the `ArgDescriptor` of configuration entries,
+since it describes how the value of the entry is given on the command line.
+
+.. only:: development_administrator
+
+    Created on Oct. 17, 2026
+
+    @author: Jonathan Gossage
+"""
+
+from typing import (Any, Callable, Dict, Iterable, List, Mapping, Optional,
+                    Sequence, Tuple, Union)
+
+VALIDATOR = Callable[[Any], Optional[str]]
+
+
+class SchemaError(ValueError):
+    """
+    Raised when configuration values do not conform to their schema.
+
+    :ivar list errors: A description of each problem found
+    """
+    def __init__(self: 'SchemaError',
+                 errors: Sequence[str]) -> None:
+        super().__init__('Invalid configuration values:\n  ' +
+                         '\n  '.join(errors))
+        self.errors = list(errors)
+
+
+class FieldSpec():
+    """
+    Describes the acceptable values for a configuration key.
+
+    :param type type_:      The type of the value, or of each value when there
+                            are several. Only classes are checked; converters
+                            such as ``argparse.FileType`` are not.
+    :param nargs:           The number of values, as for ``argparse``. A key
+                            with ``*``, ``+`` or a number of values has a list
+                            as its value.
+    :param Sequence choices: The permitted values
+    :param minimum:          The smallest permitted value
+    :param maximum:          The largest permitted value
+    """
+    __slots__ = ('type', 'nargs', 'choices', 'minimum', 'maximum')
+
+    def __init__(self: 'FieldSpec',
+                 type_: Optional[Union[type, Callable[[str], Any]]]=None,
+                 nargs: Optional[Union[str, int]]=None,
+                 choices: Optional[Sequence[Any]]=None,
+                 minimum: Optional[Any]=None,
+                 maximum: Optional[Any]=None) -> None:
+        self.type = type_
+        self.nargs = nargs
+        self.choices = choices
+        self.minimum = minimum
+        self.maximum = maximum
+
+
+def _typeCheck(t: type) -> Callable[[Any], bool]:
+    # JSON has no separate boolean and integer values in Python terms, so
+    # booleans must be excluded explicitly.
+    if t is int:
+        return lambda v: type(v) is int
+    if t is float:
+        return lambda v: type(v) in (int, float)
+    return lambda v: isinstance(v, t)
+
+
+def _compileField(spec: FieldSpec) -> VALIDATOR:
+    """Builds the validation function for a key"""
+    checks: List[Tuple[Callable[[Any], bool], str]] = []
+    if isinstance(spec.type, type):
+        checks.append((_typeCheck(spec.type),
+                       f'expected {spec.type.__name__}'))
+    if spec.choices is not None:
+        choices = spec.choices
+        checks.append((lambda v: v in choices,
+                       f'expected one of {list(choices)}'))
+    if spec.minimum is not None:
+        lo = spec.minimum
+        checks.append((lambda v: v >= lo, f'less than {lo}'))
+    if spec.maximum is not None:
+        hi = spec.maximum
+        checks.append((lambda v: v <= hi, f'greater than {hi}'))
+
+    def one(v: Any) -> Optional[str]:
+        for ok, msg in checks:
+            try:
+                if not ok(v):
+                    return f'{v!r} {msg}'
+            except TypeError:  # Unorderable value in a range check
+                return f'{v!r} {msg}'
+        return None
+
+    nargs = spec.nargs
+    if nargs not in ('*', '+') and not isinstance(nargs, int):
+        return one if checks else lambda v: None
+
+    def many(v: Any) -> Optional[str]:
+        if not isinstance(v, list):
+            return f'{v!r} expected a list'
+        if nargs == '+' and not v:
+            return 'expected at least one value'
+        if isinstance(nargs, int) and len(v) != nargs:
+            return f'expected {nargs} values, got {len(v)}'
+        for e in v:
+            err = one(e)
+            if err is not None:
+                return err
+        return None
+
+    return many
+
+
+class Schema():
+    """
+    A compiled set of validation functions, one for each key with a
+    `FieldSpec`.
+
+    :param Mapping fields: The specification of each key
+    """
+
+    def __init__(self: 'Schema',
+                 fields: Mapping[str, FieldSpec]) -> None:
+        self._validators: Dict[str, VALIDATOR] = \
+            {k: _compileField(f) for k, f in fields.items()}
+
+    @classmethod
+    def fromEntries(cls,
+                    entries: Mapping[str, Any]) -> 'Schema':
+        """
+        Derives a schema from the type and number of values in the
+        `ArgDescriptor` of configuration entries. Entries without a descriptor
+        are not checked.
+        """
+        return cls({k: FieldSpec(e.argDes.type, e.argDes.nargs)
+                    for k, e in entries.items()
+                    if getattr(e, 'argDes', None) is not None})
+
+    def validate(self: 'Schema',
+                 data: Mapping[str, Any],
+                 source: Optional[str]=None,
+                 unwrap: Optional[Callable[[Any], Any]]=None) -> List[str]:
+        """
+        Checks the keys of a mapping that appear in the schema.
+
+        :param Mapping data:     The values to check
+        :param str source:       Names the origin of the values in the error
+                                 messages
+        :param function unwrap:  Extracts the value to check from each item of
+                                 `data`
+        :return: A description of each problem found
+        """
+        prefix = f'{source}: ' if source else ''
+        validators = self._validators
+        errors = []
+        for k in data.keys() & validators.keys():
+            v = data[k] if unwrap is None else unwrap(data[k])
+            err = validators[k](v)
+            if err is not None:
+                errors.append(f'{prefix}{k}: {err}')
+        errors.sort()
+        return errors
+
+    def check(self: 'Schema',
+              sources: Iterable[Tuple[Optional[str], Mapping[str, Any]]],
+              unwrap: Optional[Callable[[Any], Any]]=None) -> None:
+        """
+        Validates several named sources, reporting every problem in all of
+        them together.
+
+        :raises SchemaError: Some values are not valid
+        """
+        errors = [e for name, data in sources
+                  for e in self.validate(data, name, unwrap)]
+        if errors:
+            raise SchemaError(errors)
@@ -0,0 +1,132 @@
+"""
+Sharing a configuration between processes
+
+A server that runs many worker processes would otherwise have each worker read
+and parse the same configuration sources and hold its own copy of the result.
+Instead, a supervisor process can build the configuration once and publish its
+flattened view in a `shared memory <https://docs.python.org/3/library/multiprocessing.shared_memory.html>`_
+segment. Workers attach to the segment by name and read it in place, without
+touching the sources. The entries of the segment form the shared layer of a
+worker's configuration, ranked just above the worker's own defaults so that
+the supervisor's values win over them.
+
+The segment starts with the length of a snapshot image, as described in
+`ControlFiles.loaders.snapshot`, of the pickled values of the entries. The
+image follows, and then the pickled description, argument descriptor, flags
+and administrative data of the entries that have any. A worker reads those
+fields when it attaches, and a value only when it is first read. A published
+segment never changes; a supervisor that reloads its configuration publishes
+a new segment and tells its workers the new name.
+
+.. only:: development_administrator
+
+    Created on Oct. 17, 2026
+
+    @author: Jonathan Gossage
+"""
+
+from multiprocessing import shared_memory
+import pickle
+import struct
+import sys
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from ControlFiles.loaders import snapshot as _s
+
+# The length of the snapshot image at the start of a segment
+_LENGTH = struct.Struct('<Q')
+# The description, argument descriptor, flags and administrative data of an
+# entry
+FIELDS = Tuple[Any, ...]
+
+
+def _encode(value: Any) -> bytes:
+    return pickle.dumps(value, protocol=5)
+
+
+class SharedConfiguration():
+    """
+    A configuration image published in a shared memory segment by the
+    supervisor process. The segment is removed when the publisher is closed,
+    so the supervisor must keep this object for as long as workers may attach.
+
+    :param Mapping values:  The values of the flattened configuration
+    :param str name:        The name of the segment. A unique name is chosen
+                            by default.
+    :param Mapping fields:  The other fields of the entries that have any, by
+                            key
+    """
+
+    def __init__(self: 'SharedConfiguration',
+                 values: Mapping[str, Any],
+                 name: Optional[str]=None,
+                 fields: Optional[Mapping[str, FIELDS]]=None) -> None:
+        image = _s.build(values, codec=_s.CODEC_PICKLE, encode=_encode)
+        extra = pickle.dumps(dict(fields or {}), protocol=5)
+        size = _LENGTH.size + len(image) + len(extra)
+        self._shm = shared_memory.SharedMemory(name=name, create=True,
+                                               size=size)
+        buf = self._shm.buf
+        _LENGTH.pack_into(buf, 0, len(image))
+        buf[_LENGTH.size:_LENGTH.size + len(image)] = image
+        buf[_LENGTH.size + len(image):size] = extra
+
+    @property
+    def name(self: 'SharedConfiguration') -> str:
+        """The name that workers use to attach to the segment"""
+        return self._shm.name
+
+    def close(self: 'SharedConfiguration') -> None:
+        """Removes the segment. Workers that are attached keep their view."""
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def __enter__(self: 'SharedConfiguration') -> 'SharedConfiguration':
+        return self
+
+    def __exit__(self: 'SharedConfiguration', *exc: Any) -> None:
+        self.close()
+
+
+class _Attachment(shared_memory.SharedMemory):
+    """
+    A segment attached by a worker. The segment stays mapped for as long as
+    the mapping built on it is in use, however the objects happen to be
+    collected, so it is not closed when this object is collected.
+    """
+    def __del__(self: '_Attachment') -> None:
+        pass
+
+
+def attach(name: str) -> Tuple[_s.Snapshot, Dict[str, FIELDS]]:
+    """
+    Attaches to a segment published by a `SharedConfiguration`.
+
+    :param str name: The name of the segment
+    :return: A read-only mapping of the values of the configuration entries
+             and the other fields of the entries that have any, by key
+    """
+    if sys.version_info >= (3, 13):
+        shm = _Attachment(name=name, track=False)
+    else:
+        # Before Python 3.13 every process that attaches to a segment
+        # registers it with its resource tracker, which removes the segment
+        # when the process exits. Only the publisher may remove it, so the
+        # registration is withdrawn. A process started by multiprocessing,
+        # such as a pool worker, reports to the tracker of the process that
+        # started it instead. Its registration is the publisher's own, which
+        # lets the tracker remove the segment if the publisher dies, so it is
+        # left alone.
+        from multiprocessing import parent_process, resource_tracker
+        shm = _Attachment(name=name)
+        if parent_process() is None:
+            resource_tracker.unregister(shm._name, 'shared_memory')
+    buf = shm.buf
+    (length,) = _LENGTH.unpack_from(buf)
+    start = _LENGTH.size
+    fields = pickle.loads(buf[start + length:])
+    return (_s.Snapshot(buf[start:start + length], owner=shm,
+                        decode=pickle.loads),
+            fields)
@@ -0,0 +1,334 @@
+"""
+Immutable configuration snapshots
+
+A snapshot is a read-only view of the flattened configuration at one moment.
+Snapshots are persistent maps implemented as
+`hash array mapped tries <https://en.wikipedia.org/wiki/Hash_array_mapped_trie>`_.
+Publishing a new version of the configuration only copies the path from the
+root of the trie to each changed key, so the cost is proportional to the number
+of keys changed and everything else is shared with the previous version.
+
+Because a snapshot never changes, worker threads can read it without taking
+any locks. A reader that needs a consistent view across several keys keeps the
+snapshot it started with while the configuration moves on.
+
+.. only:: development_administrator
+
+    Created on Oct. 17, 2026
+
+    @author: Jonathan Gossage
+"""
+
+import sys
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+from lib.cfgLayers import MISSING
+
+_BITS = 5
+_MASK = (1 << _BITS) - 1
+_HASHBITS = 64  # Hashes are reduced to this many bits
+
+# A leaf of the trie is a tuple (hash, key, value). Interior nodes are
+# _Bitmap or _Collision instances.
+_LEAF = Tuple[int, Any, Any]
+
+
+class _Bitmap():
+    """
+    An interior node. Bit i of the bitmap is set when the node has an item
+    for the hash fragment i; the items are stored in bit order.
+    """
+    __slots__ = ('bitmap', 'array')
+
+    def __init__(self: '_Bitmap',
+                 bitmap: int,
+                 array: Tuple[Any, ...]) -> None:
+        self.bitmap = bitmap
+        self.array = array
+
+
+class _Collision():
+    """Holds the leaves whose keys have identical hashes"""
+    __slots__ = ('leaves',)
+
+    def __init__(self: '_Collision',
+                 leaves: Tuple[_LEAF, ...]) -> None:
+        self.leaves = leaves
+
+
+_EMPTY = _Bitmap(0, ())
+
+if sys.version_info >= (3, 10):
+    _popcount = int.bit_count
+else:
+    def _popcount(x: int) -> int:
+        """Gives the number of bits set in a non-negative integer"""
+        return bin(x).count('1')
+
+
+def _hash(key: Any) -> int:
+    return hash(key) & ((1 << _HASHBITS) - 1)
+
+
+def _pair(a: _LEAF,
+          b: _LEAF,
+          shift: int) -> Any:
+    """Builds the smallest subtrie holding two leaves with different keys"""
+    if shift >= _HASHBITS or a[0] == b[0]:
+        return _Collision((a, b))
+    ia, ib = (a[0] >> shift) & _MASK, (b[0] >> shift) & _MASK
+    if ia == ib:
+        return _Bitmap(1 << ia, (_pair(a, b, shift + _BITS),))
+    return _Bitmap((1 << ia) | (1 << ib), (a, b) if ia < ib else (b, a))
+
+
+def _split(node: _Collision,
+           leaf: _LEAF,
+           shift: int) -> _Bitmap:
+    """Separates a leaf from a collision node whose hash is different"""
+    ic, il = (node.leaves[0][0] >> shift) & _MASK, (leaf[0] >> shift) & _MASK
+    if ic == il:
+        return _Bitmap(1 << ic, (_split(node, leaf, shift + _BITS),))
+    return _Bitmap((1 << ic) | (1 << il),
+                   (node, leaf) if ic < il else (leaf, node))
+
+
+def _build(leaves: List[_LEAF],
+           shift: int) -> Any:
+    """Builds a subtrie from leaves with distinct keys without any copying"""
+    if len(leaves) == 1:
+        return leaves[0]
+    if shift >= _HASHBITS or all(l[0] == leaves[0][0] for l in leaves):
+        return _Collision(tuple(leaves))
+    groups: Dict[int, List[_LEAF]] = {}
+    for l in leaves:
+        groups.setdefault((l[0] >> shift) & _MASK, []).append(l)
+    bitmap = 0
+    array = []
+    for i in sorted(groups):
+        bitmap |= 1 << i
+        g = groups[i]
+        array.append(g[0] if len(g) == 1 else _build(g, shift + _BITS))
+    return _Bitmap(bitmap, tuple(array))
+
+
+def _lookup(node: Any,
+            h: int,
+            key: Any) -> Any:
+    shift = 0
+    while True:
+        if type(node) is _Collision:
+            for l in node.leaves:
+                if l[1] == key:
+                    return l[2]
+            return MISSING
+        bit = 1 << ((h >> shift) & _MASK)
+        if not node.bitmap & bit:
+            return MISSING
+        item = node.array[_popcount(node.bitmap & (bit - 1))]
+        if type(item) is tuple:
+            return item[2] if item[0] == h and item[1] == key else MISSING
+        node = item
+        shift += _BITS
+
+
+def _assoc(node: Any,
+           shift: int,
+           leaf: _LEAF) -> Tuple[Any, bool]:
+    """
+    :return: The new node, which is `node` itself when nothing changed, and
+             whether a key was added
+    """
+    h, key, value = leaf
+    if type(node) is _Collision:
+        for i, l in enumerate(node.leaves):
+            if l[1] == key:
+                if l[2] is value:
+                    return node, False
+                return _Collision(node.leaves[:i] + (leaf,) +
+                                  node.leaves[i + 1:]), False
+        if node.leaves[0][0] == h:
+            return _Collision(node.leaves + (leaf,)), True
+        return _split(node, leaf, shift), True
+    bit = 1 << ((h >> shift) & _MASK)
+    idx = _popcount(node.bitmap & (bit - 1))
+    array = node.array
+    if not node.bitmap & bit:
+        return _Bitmap(node.bitmap | bit,
+                       array[:idx] + (leaf,) + array[idx:]), True
+    item = array[idx]
+    added = False
+    if type(item) is tuple:
+        if item[1] == key:
+            if item[2] is value:
+                return node, False
+            new = leaf
+        else:
+            new = _pair(item, leaf, shift + _BITS)
+            added = True
+    else:
+        new, added = _assoc(item, shift + _BITS, leaf)
+        if new is item:
+            return node, False
+    return _Bitmap(node.bitmap, array[:idx] + (new,) + array[idx + 1:]), added
+
+
+def _dissoc(node: Any,
+            shift: int,
+            h: int,
+            key: Any) -> Any:
+    """
+    :return: The new node, `node` itself if the key is absent, or None if the
+             node has become empty
+    """
+    if type(node) is _Collision:
+        leaves = tuple(l for l in node.leaves if l[1] != key)
+        if len(leaves) == len(node.leaves):
+            return node
+        if not leaves:
+            return None
+        return leaves[0] if len(leaves) == 1 else _Collision(leaves)
+    bit = 1 << ((h >> shift) & _MASK)
+    if not node.bitmap & bit:
+        return node
+    idx = _popcount(node.bitmap & (bit - 1))
+    array = node.array
+    item = array[idx]
+    if type(item) is tuple:
+        if item[1] != key:
+            return node
+        new = None
+    else:
+        new = _dissoc(item, shift + _BITS, h, key)
+        if new is item:
+            return node
+        # A subtrie reduced to a single leaf is replaced by the leaf
+        if type(new) is _Bitmap and len(new.array) == 1 and\
+           type(new.array[0]) is tuple:
+            new = new.array[0]
+    if new is None:
+        if len(array) == 1:
+            return None
+        return _Bitmap(node.bitmap & ~bit, array[:idx] + array[idx + 1:])
+    return _Bitmap(node.bitmap, array[:idx] + (new,) + array[idx + 1:])
+
+
+def _walk(node: Any) -> Iterator[_LEAF]:
+    items = node.leaves if type(node) is _Collision else node.array
+    for item in items:
+        if type(item) is tuple:
+            yield item
+        else:
+            yield from _walk(item)
+
+
+class PersistentMap(Mapping[Any, Any]):
+    """
+    An immutable mapping. The methods that would change it return a new map
+    that shares all unchanged parts with this one.
+
+    :ivar int version: Counts the versions of a map derived from an original
+                       map through `evolve`
+    """
+    __slots__ = ('_root', '_len', 'version')
+
+    def __init__(self: 'PersistentMap',
+                 data: Optional[Mapping[Any, Any]]=None) -> None:
+        self._root = _EMPTY
+        self._len = 0
+        self.version = 0
+        if data:
+            leaves = [(_hash(k), k, v) for k, v in data.items()]
+            root = _build(leaves, 0)
+            # A map of colliding keys still needs a bitmap node at its root
+            self._root = root if type(root) is _Bitmap else\
+                _Bitmap(1 << (leaves[0][0] & _MASK), (root,))
+            self._len = len(leaves)
+
+    @classmethod
+    def _make(cls,
+              root: Any,
+              length: int,
+              version: int) -> 'PersistentMap':
+        m = cls.__new__(cls)
+        m._root = _EMPTY if root is None else root
+        m._len = length
+        m.version = version
+        return m
+
+    def __getitem__(self: 'PersistentMap',
+                    key: Any) -> Any:
+        v = _lookup(self._root, _hash(key), key)
+        if v is MISSING:
+            raise KeyError(key)
+        return v
+
+    def get(self: 'PersistentMap',
+            key: Any,
+            default: Optional[Any]=None) -> Any:
+        v = _lookup(self._root, _hash(key), key)
+        return default if v is MISSING else v
+
+    def __contains__(self: 'PersistentMap',
+                     key: Any) -> bool:
+        return _lookup(self._root, _hash(key), key) is not MISSING
+
+    def __iter__(self: 'PersistentMap') -> Iterator[Any]:
+        return (l[1] for l in _walk(self._root))
+
+    def __len__(self: 'PersistentMap') -> int:
+        return self._len
+
+    def __repr__(self: 'PersistentMap') -> str:
+        return f'PersistentMap(<{self._len} entries>, version={self.version})'
+
+    def set(self: 'PersistentMap',
+            key: Any,
+            value: Any) -> 'PersistentMap':
+        return self.evolve({key: value})
+
+    def delete(self: 'PersistentMap',
+               key: Any) -> 'PersistentMap':
+        if key not in self:
+            raise KeyError(key)
+        return self.evolve({key: MISSING})
+
+    def evolve(self: 'PersistentMap',
+               changes: Mapping[Any, Any]) -> 'PersistentMap':
+        """
+        Gives the next version of the map.
+
+        :param Mapping changes: The new values by key. A value of `MISSING`
+                                removes the key.
+        """
+        root = self._root
+        length = self._len
+        for k, v in changes.items():
+            h = _hash(k)
+            if v is MISSING:
+                new = _dissoc(root, 0, h, k)
+                if new is not root:
+                    length -= 1
+                    if new is None or type(new) is tuple:
+                        # The root must remain a bitmap node
+                        new = _EMPTY if new is None else\
+                            _Bitmap(1 << (h & _MASK), (new,))
+                root = new
+            else:
+                root, added = _assoc(root, 0, (h, k, v))
+                length += added
+        return self._make(root, length, self.version + 1)
+
+
+def freezeForFork() -> None:
+    """
+    Moves every object that exists now, including the current snapshots, out
+    of reach of the cyclic garbage collector. Call this in a pre-fork server
+    just before forking the workers so that garbage collection in the workers
+    does not write to, and so copy, the memory pages holding the inherited
+    configuration. Reference counting still writes to the objects that a worker
+    actually touches.
+    """
+    import gc
+    gc.collect()
+    gc.freeze()
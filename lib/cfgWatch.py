@@ -0,0 +1,233 @@
+"""
+Watching configuration sources for changes
+
+Long running applications may run for weeks or months and must be able to pick
+up a change to their configuration without being restarted. This module
+supplies a watcher that reports when the files behind the configuration
+sources change and the description of the resulting changes to the
+configuration that is delivered to interested parties.
+
+On Linux the watcher uses `inotify <https://man7.org/linux/man-pages/man7/inotify.7.html>`_
+so that changes are reported as soon as they happen without any cost while
+nothing changes. Elsewhere, or when inotify is not available, the watched files
+are polled.
+
+The directories containing the files are watched rather than the files
+themselves since many editors and deployment tools replace a file by renaming a
+new file over it.
+
+.. only:: development_administrator
+
+    Created on Oct. 17, 2026
+
+    @author: Jonathan Gossage
+"""
+
+import os
+import struct
+import sys
+import threading
+from typing import (Any, Callable, Dict, Iterable, Iterator, Optional, Set,
+                    Tuple, TYPE_CHECKING)
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+from lib.cfgLayers import MISSING
+
+
+class ConfigDiff():
+    """
+    Describes the changes to the flattened view of a configuration at the
+    level of individual keys.
+
+    :ivar dict added:   The new entries, by key
+    :ivar dict removed: The entries that were removed, by key
+    :ivar dict changed: The previous and current entries for keys whose entry
+                        changed
+    """
+    __slots__ = ('added', 'removed', 'changed')
+
+    def __init__(self: 'ConfigDiff') -> None:
+        self.added: Dict[str, Any] = {}
+        self.removed: Dict[str, Any] = {}
+        self.changed: Dict[str, Tuple[Any, Any]] = {}
+
+    @classmethod
+    def compute(cls,
+                previous: Dict[str, Any],
+                current: Dict[str, Any]) -> 'ConfigDiff':
+        """
+        Builds the difference for a set of keys.
+
+        :param dict previous: The keys that may have changed, with their
+                              previous entries or `MISSING`
+        :param dict current:  The flattened view after the change
+        """
+        diff = cls()
+        for k, old in previous.items():
+            new = current.get(k, MISSING)
+            if old is MISSING:
+                if new is not MISSING:
+                    diff.added[k] = new
+            elif new is MISSING:
+                diff.removed[k] = old
+            elif old != new:
+                diff.changed[k] = (old, new)
+        return diff
+
+    def keys(self: 'ConfigDiff') -> Iterator[str]:
+        """All the keys affected by the change"""
+        yield from self.added
+        yield from self.removed
+        yield from self.changed
+
+    def __bool__(self: 'ConfigDiff') -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+    def __repr__(self: 'ConfigDiff') -> str:
+        return (f'ConfigDiff(added={list(self.added)},'
+                f' removed={list(self.removed)},'
+                f' changed={list(self.changed)})')
+
+
+# inotify definitions from <sys/inotify.h>
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_MASK = _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE |\
+           _IN_DELETE
+_IN_EVENT = struct.Struct('iIII')
+
+
+def _inotify() -> Optional[Any]:
+    """Gives access to the inotify functions of the C library if possible"""
+    if not sys.platform.startswith('linux'):
+        return None
+    import ctypes
+    import ctypes.util
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                           use_errno=True)
+        libc.inotify_init1  # Raises AttributeError if missing
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class FileWatcher():
+    """
+    Reports changes to a set of files from a background thread.
+
+    Changes that arrive close together, such as a file being truncated and
+    then written, are coalesced and reported in one call.
+
+    :param Iterable[Path] paths: The files to watch. They need not exist.
+    :param function callback:    Called with the set of changed paths
+    :param float interval:       How long to wait for further changes after
+                                 a change is seen, and how often files are
+                                 polled when inotify is not used
+    :param bool polling:         Always poll the files
+    """
+
+    def __init__(self: 'FileWatcher',
+                 paths: Iterable['Path'],
+                 callback: Callable[[Set['Path']], None],
+                 interval: float=1.0,
+                 polling: bool=False) -> None:
+        from pathlib import Path
+        self._paths: Set[Path] = {Path(p).absolute() for p in paths}
+        self._callback = callback
+        self._interval = interval
+        self._stop = threading.Event()
+        self._libc = None if polling else _inotify()
+        self._thread = threading.Thread(target=self._run,
+                                        name='gvConfigWatcher',
+                                        daemon=True)
+
+    @property
+    def usingInotify(self: 'FileWatcher') -> bool:
+        return self._libc is not None
+
+    def start(self: 'FileWatcher') -> 'FileWatcher':
+        self._thread.start()
+        return self
+
+    def stop(self: 'FileWatcher') -> None:
+        self._stop.set()
+        if self._thread.is_alive() and\
+           self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _run(self: 'FileWatcher') -> None:
+        if self._libc is not None:
+            fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd >= 0:
+                try:
+                    self._watchInotify(fd)
+                finally:
+                    os.close(fd)
+                return
+        self._watchPolling()
+
+    def _report(self: 'FileWatcher',
+                changed: Set['Path']) -> None:
+        if changed and not self._stop.is_set():
+            self._callback(changed)
+
+    def _watchInotify(self: 'FileWatcher',
+                      fd: int) -> None:
+        import select
+        dirs: Dict[int, 'Path'] = {}
+        for d in {p.parent for p in self._paths}:
+            wd = self._libc.inotify_add_watch(fd, os.fsencode(d), _IN_MASK)
+            if wd >= 0:
+                dirs[wd] = d
+        pending: Set['Path'] = set()
+        while not self._stop.is_set():
+            # Wait for events. Once a change is pending, a quiet interval
+            # means that the burst of changes is over.
+            ready, _, _ = select.select([fd], [], [], self._interval)
+            if not ready:
+                self._report(pending)
+                pending = set()
+                continue
+            try:
+                buf = os.read(fd, 65536)
+            except BlockingIOError:
+                continue
+            offset = 0
+            while offset < len(buf):
+                wd, _, _, length = _IN_EVENT.unpack_from(buf, offset)
+                offset += _IN_EVENT.size
+                name = buf[offset:offset + length].rstrip(b'\0')
+                offset += length
+                if wd in dirs:
+                    p = dirs[wd] / os.fsdecode(name)
+                    if p in self._paths:
+                        pending.add(p)
+
+    def _watchPolling(self: 'FileWatcher') -> None:
+        def signature(p: 'Path') -> Optional[Tuple[int, int, int]]:
+            try:
+                st = p.stat()
+            except OSError:
+                return None
+            return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+        seen = {p: signature(p) for p in self._paths}
+        pending: Set['Path'] = set()
+        while not self._stop.wait(self._interval):
+            changed = set()
+            for p in self._paths:
+                sig = signature(p)
+                if sig != seen[p]:
+                    seen[p] = sig
+                    changed.add(p)
+            if changed:
+                pending |= changed
+            else:
+                self._report(pending)
+                pending = set()
@@ -63,12 +63,37 @@ system:
 
 #import json
 #from json import JSONEncoder
-from  argparse import SUPPRESS, FileType, REMAINDER, Action
+# Importing this module must be cheap since every program imports it at
+# startup. Modules that are only needed by some features, such as argparse,
+# logging, shared memory, file watching, subscriptions, accessors, schemas,
+# snapshots and load profiling, are imported when the feature is first used.
+from contextlib import contextmanager
+import os
 import sys
-from typing import (Any, Optional, Dict, Mapping, Tuple, Callable,
-                    Literal, Union)
+import threading
+from time import monotonic, perf_counter
+from typing import (Any, Optional, Dict, Iterable, Iterator, List, Mapping,
+                    Sequence, Set, Tuple, Callable, Literal, Union,
+                    TYPE_CHECKING)
+from weakref import WeakSet
 
-from lib.parse_arguments import Arguments as _a
+from ControlFiles.loaders import Source, loadSources
+from lib.cfgLayers import MISSING, LayeredResolver
+
+if TYPE_CHECKING:
+    from argparse import Action, FileType
+    from pathlib import Path
+    from lib.cfgAccessor import Accessor
+    from lib.cfgEvents import Subscription, Subscriptions
+    from lib.cfgProfile import LoadReport, SourceProfile
+    from lib.cfgSchema import Schema
+    from lib.cfgShared import SharedConfiguration
+    from lib.cfgSnapshot import PersistentMap
+    from lib.cfgWatch import ConfigDiff, FileWatcher
+
+# The values of argparse.SUPPRESS and argparse.REMAINDER
+SUPPRESS = '==SUPPRESS=='
+REMAINDER = '...'
 
 #import lib.version
 #v = lib.version.Version
@@ -210,135 +235,195 @@ Defines the kind of testing being done on this run
 
 #TODO: Update configuration.py with key names from cfg.data
 
+# The layers that make up a configuration, lowest priority first. The site,
+# application and user layers are the three default sources. Command line
+# arguments override them and entries set by the running program override
+# everything.
+defaults_layer    = 'defaults'
+site_layer        = 'site'
+application_layer = 'application'
+user_layer        = 'user'
+cmdline_layer     = 'cmdline'
+runtime_layer     = 'runtime'
+# The entries published by a supervisor process. In a worker this layer is
+# ranked just above the defaults.
+shared_layer      = 'shared'
+DEFAULT_LAYERS = (defaults_layer, site_layer, application_layer, user_layer,
+                  cmdline_layer, runtime_layer)
+
+# The policies for merging entries that are already in the configuration
+merge_override = 'override'
+merge_keep     = 'keep'
+merge_error    = 'error'
+
+# The sources loaded when none are given to a configuration. Each source names
+# the loader registered in `ControlFiles.loaders` that reads it.
+DEFAULT_SOURCES = (Source('pre', site_layer, 'fileJSON',
+                          path='/etc/gvConfig', file='pre.json'),)
+# The formats written by `Configuration.export`
+EXPORT_FORMATS = ('json', 'msgpack', 'env')
+# The configuration index used to find the site configuration of a named
+# application. See `ControlFiles.loaders.fileIndex`.
+DEFAULT_INDEX = '/etc/gvConfig/index.json'
+
+
+def applicationSources(application: str,
+                       index: str=DEFAULT_INDEX) -> Tuple[Source, ...]:
+    """
+    Gives the sources that read only the site configuration used by an
+    application, as found through the configuration index.
+
+    The source is watched through the index and through the configuration
+    files that the index lists when the source is made, so that a change to a
+    site file is seen before the index is rebuilt.
+    """
+    from ControlFiles.loaders.fileIndex import files
+    return (Source('index', site_layer, 'fileIndex', index=index,
+                   application=application,
+                   watch=(index, *map(str, files(index)))),)
+
+
 # The action types
 ACTLIT = Literal[ 'store,', 'store_const', 'store-true', 'store_false',
                   'append', 'append_const', 'count', 'help', 'version',
                   'extend']
-class ArgDescriptor(dict):
+
+
+class _Record():
+    """
+    Base class for the compact records that describe configuration entries.
+
+    Records keep their fields in `__slots__` rather than in a per-instance
+    dictionary. Large configurations contain tens of thousands of entries and
+    the saving in memory and attribute access time is significant. Subclasses
+    list their fields in `__slots__` in constructor order. A field whose slot
+    name starts with an underscore is read through a property of the same
+    name without the underscore; records compare the slots themselves.
+    """
+    __slots__ = ()
+
+    def _fields(self: '_Record') -> Iterator[str]:
+        return (f.lstrip('_') for f in self.__slots__)
+
+    def asDict(self: '_Record') -> Dict[str, Any]:
+        """Gives the fields of the record as a dictionary"""
+        return {f: getattr(self, f) for f in self._fields()}
+
+    def __eq__(self: '_Record',
+               other: Any) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f)
+                   for f in self.__slots__)
+
+    __hash__ = None  # Records are mutable
+
+    def __repr__(self: '_Record') -> str:
+        fields = ', '.join(f'{f}={getattr(self, f)!r}' for f in self._fields())
+        return f'{type(self).__name__}({fields})'
+
+
+class ArgDescriptor(_Record):
     """
     Describes how to define a command line override for a configuration entry.
     This is an attribute of the `CfgEntry` for a configuration item.
     If it has no value, the configuration item cannot be overridden from the
     command line.
     """
+    __slots__ = ('dest', 'keywordDefs', 'positional', 'type', 'nargs',
+                 'default', 'const', 'action')
+
     def __init__(self: 'ArgDescriptor',
                  dest: str,
                  keywordDefs: Tuple[str, ...],
                  positional: str,
-                 type_: Union[FileType, Callable[[str], type], type],
-                 nargs: Union[Literal['?', '*', '+'], REMAINDER, int],
+                 type_: Union['FileType', Callable[[str], type], type],
+                 nargs: Union[Literal['?', '*', '+', '...'], int],
                  default: Any = SUPPRESS,
                  const: Optional[Any]=None,
-                 action: Union[ACTLIT, Action]='store'
+                 action: Union[ACTLIT, 'Action']='store'
                 ) -> None:
-        dict.__init__(self,
-                      _dest=dest,
-                       _keywordDefs=keywordDefs,
-                       _positional=positional,
-                       _type=type_,
-                       _default=default,
-                       _const=const,
-                       _nargs=nargs,
-                       _action=action)
-
-    @property
-    def dest(self: 'ArgDescriptor') -> str:
-        return super()['_dest']
-
-    @dest.setter
-    def dest(self: 'ArgDescriptor',
-             type_: str) -> None:
-        super()['_dest'] = type_
+        self.dest = dest
+        self.keywordDefs = keywordDefs
+        self.positional = positional
+        self.type = type_
+        self.nargs = nargs
+        self.default = default
+        self.const = const
+        self.action = action
 
-    @property
-    def keywordDefs(self: 'ArgDescriptor') -> Optional[str]:
-        return super()['_keywordDefs']
-
-    @keywordDefs.setter
-    def keywordDefs(self: 'ArgDescriptor',
-                    keywordDefs: str) -> None:
-        super()['_keywordDefs'] = keywordDefs
-
-    @property
-    def positional(self: 'ArgDescriptor') -> Optional[str]:
-        return super()['_positional']
-
-    @positional.setter
-    def positional(self: 'ArgDescriptor',
-                   positional: str) -> None:
-        super()['_positional'] = positional
-
-    @property
-    def type(self: 'ArgDescriptor') -> str:
-        return super()['_type']
-
-    @type.setter
-    def type(self: 'ArgDescriptor',
-             type_: str) -> None:
-        super()['_type'] = type_
-
-    @property
-    def default(self: 'ArgDescriptor') -> str:
-        return super()['_default']
-
-    @default.setter
-    def default(self: 'ArgDescriptor',
-                default: str) -> None:
-        super()['_default'] = default
-
-    @property
-    def const(self: 'ArgDescriptor') -> Any:
-        return super()['_const']
-
-    @const.setter
-    def const(self: 'ArgDescriptor',
-                const: str) -> None:
-        super()['_const'] = const
 
-    @property
-    def nargs(self: 'ArgDescriptor') -> Any:
-        return super()['_nargs']
-
-    @nargs.setter
-    def nargs(self: 'ArgDescriptor',
-                nargs: str) -> None:
-        super()['_nargs'] = nargs
-
-class CfgAdmin(dict):
+class CfgAdmin(_Record):
     """
     This class contains the administrative data associated with a configuration
     item. If it has no value, administrative ability for this configuration
     item will be limited.
     """
+    __slots__ = ('owner', 'overideable')
+
     def __init__(self: 'CfgAdmin',
                  owner:Optional[str]=None,
                  overideable: bool=False) -> None:
-        dict.__init__(self,
-                      _owner=owner,
-                      _overideable=overideable)
+        self.owner = owner
+        self.overideable = overideable
 
-    @property
-    def owner(self: 'CfgAdmin') -> str:
-        return super()['_owner']
 
-    @owner.setter
-    def owner(self: 'CfgAdmin',
-              owner: str) -> None:
-        super()['_owner'] = owner
+def _plain(value: Any) -> Any:
+    return value
 
-    @property
-    def overideable(self: 'CfgAdmin') -> str:
-        return super()['_overideable']
 
-    @overideable.setter
-    def overideable(self: 'CfgAdmin',
-              overideable: str) -> None:
-        super()['_overideable'] = overideable
+class LazyValue():
+    """
+    A configuration value that is computed when it is first read. The result
+    is kept, for a limited time when `ttl` is given, so that expensive values
+    such as those that need a user database lookup cost nothing unless they
+    are used.
+
+    A lazy value is pickled as the value it computes, so a configuration that
+    contains lazy values can still be published with
+    `Configuration.publishShared`.
+
+    :param function func: Computes the value
+    :param float ttl:     The number of seconds for which the value is kept.
+                          It is kept for ever by default.
+    """
+    __slots__ = ('func', 'ttl', '_value', '_expires')
+
+    def __init__(self: 'LazyValue',
+                 func: Callable[[], Any],
+                 ttl: Optional[float]=None) -> None:
+        self.func = func
+        self.ttl = ttl
+        self._value: Any = MISSING
+        self._expires = 0.0
+
+    def get(self: 'LazyValue') -> Any:
+        v = self._value
+        if v is MISSING or (self.ttl is not None and
+                            monotonic() >= self._expires):
+            v = self.func()
+            if self.ttl is not None:
+                self._expires = monotonic() + self.ttl
+            self._value = v
+        return v
+
+    def __reduce__(self: 'LazyValue') -> Tuple[Any, Tuple[Any]]:
+        return _plain, (self.get(),)
 
-class CfgEntry(dict):
+    def __repr__(self: 'LazyValue') -> str:
+        state = 'unresolved' if self._value is MISSING else repr(self._value)
+        name = getattr(self.func, '__name__', self.func)
+        return f'LazyValue({name}, {state})'
+
+
+class CfgEntry(_Record):
     """
     Encapsulates all the components of a configuration entry.
+
+    The value of an entry may be a `LazyValue`, which is computed when the
+    value is first read.
     """
+    __slots__ = ('name', '_value', 'description', 'argDes', 'flags', 'admin')
 
     def __init__(self: 'CfgEntry',
                  name: str,  # This is the key of the entry in the
@@ -361,111 +446,701 @@ class CfgEntry(dict):
                                  environment
         :param CfgAdmin admin:   Administrative data for this entry
         """ 
-        dict.__init__(self,
-                      _name=name,
-                      _value=value,
-                      _description=description,
-                      _ad=ad,
-                      _flags=flags,
-                      _admin=admin)
-
-    @property
-    def name(self: 'CfgEntry') -> str:
-        return super()['_name']
-
-    @name.setter
-    def name(self: 'CfgEntry',
-             name: str):
-        super()['_name'] = name
+        self.name = name
+        self._value = value
+        self.description = description
+        self.argDes = ad
+        self.flags = flags
+        self.admin = admin
 
     @property
     def value(self: 'CfgEntry') -> Any:
-        return super()['_value']
+        v = self._value
+        return v.get() if type(v) is LazyValue else v
 
     @value.setter
     def value(self: 'CfgEntry',
-              v: Any):
-        super()['_value'] = v
-
-    @property
-    def description(self: 'CfgEntry') -> str:
-        return super()['_description']
+              value: Any) -> None:
+        self._value = value
 
-    @description.setter
-    def description(self: 'CfgEntry',
-                    description):
-        super()['_description'] = description
 
-    @property
-    def argDes(self: 'CfgEntry'):
-        return self['_ad']
+class _MappedEntry(CfgEntry):
+    """
+    An entry whose value is left in a read-only mapping, such as a snapshot,
+    until it is read. A snapshot decodes the value the first time and keeps
+    it. The entry compares, and is pickled, as the `CfgEntry` it stands for.
+    """
+    __slots__ = ('_source',)
 
-    @argDes.setter
-    def argDes(self: 'CfgEntry',
-              ad: ArgDescriptor):
-        super()['_ad'] = ad
+    def __init__(self: '_MappedEntry',
+                 name: str,
+                 source: Mapping[str, Any],
+                 description: Optional[str]=None,
+                 ad: Optional[ArgDescriptor]=None,
+                 flags: int=0,
+                 admin: Optional[CfgAdmin]=None) -> None:
+        self.name = name
+        self._source = source
+        self.description = description
+        self.argDes = ad
+        self.flags = flags
+        self.admin = admin
 
     @property
-    def flags(self: 'CfgEntry') -> int:
-        return super()['_flags']
+    def _value(self: '_MappedEntry') -> Any:
+        return self._source[self.name]
 
-    @flags.setter
-    def flags(self: 'CfgEntry',
-              flags: int):
-        super()['_flags'] = flags
+    @_value.setter
+    def _value(self: '_MappedEntry',
+               value: Any) -> None:
+        self._source = {self.name: value}
 
-    @property
-    def admin(self: 'CfgEntry'):
-        return super()['_admin']
+    def _fields(self: '_MappedEntry') -> Iterator[str]:
+        return (f.lstrip('_') for f in CfgEntry.__slots__)
 
-    @admin.setter
-    def admin(self: 'CfgEntry',
-              admin: CfgAdmin):
-        super()['_admin'] = admin
+    def __eq__(self: '_MappedEntry',
+               other: Any) -> bool:
+        if not isinstance(other, CfgEntry):
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f)
+                   for f in CfgEntry.__slots__)
+
+    def __reduce__(self: '_MappedEntry') -> Tuple[Any, Tuple[Any, ...]]:
+        return CfgEntry, (self.name, self._value, self.description,
+                          self.argDes, self.flags, self.admin)
 
 
 class Configuration():
     """
-    classdocs TBA
+    Holds the configuration of an application.
+
+    The configuration is built from the layers named in `DEFAULT_LAYERS`. The
+    layers are merged into a flattened view when they are loaded or changed so
+    that `get` is a single dictionary lookup no matter how many layers are
+    stacked. The layer that supplied each entry can be found with
+    `provenance`. Immutable versions of the flattened view, which can be
+    shared between threads without locking, are given by `snapshot`.
+
+    Every change to the flattened view is described by a `ConfigDiff` that is
+    delivered to the callbacks registered with `subscribe` for the keys
+    concerned. Changes made inside a `batch` are delivered together when the
+    batch ends. A configuration can `watch` the files behind its sources and
+    reload a source as soon as its file changes.
     """
 
-    def __init__(self: 'Configuration') -> None:
+    def __init__(self: 'Configuration',
+                 sources: Optional[Sequence[Source]]=None,
+                 maxWorkers: Optional[int]=None,
+                 schema: Optional['Schema']=None,
+                 shared: Optional[str]=None,
+                 application: Optional[str]=None,
+                 load: bool=True) -> None:
         """
+        :param Sequence[Source] sources: The sources of configuration data.
+                                         They are read concurrently and then
+                                         merged into their layers in the order
+                                         given, so a later source overrides an
+                                         earlier source for the same layer.
+                                         Defaults to `DEFAULT_SOURCES`.
+        :param int maxWorkers:           The maximum number of sources that are
+                                         read at the same time
+        :param Schema schema:            Validates the values from the sources
+                                         and those merged by the program. All
+                                         the invalid values in a load are
+                                         reported together by a `SchemaError`
+                                         and nothing is changed.
+        :param str shared:               The name of a shared memory segment
+                                         published by a supervisor process
+                                         with `publishShared`. The entries in
+                                         it form the `shared_layer`, which
+                                         overrides only the defaults, and are
+                                         used in place of loading any sources
+                                         unless `sources` is also given.
+        :param str application:          The name of the application. When
+                                         `sources` is not given, only the
+                                         site configuration that the
+                                         configuration index lists for the
+                                         application is loaded, as given by
+                                         `applicationSources`.
+        :param bool load:                Read the sources and the command
+                                         line. Otherwise the configuration
+                                         holds only its defaults until
+                                         `reload` and `parseCommandLine` are
+                                         called.
         """
 
-        self._cfg: Dict[str, CfgEntry] = {}
+        self._layers = LayeredResolver(DEFAULT_LAYERS)
+        self._cfg: Dict[str, CfgEntry] = self._layers.flat
+        self._lock = threading.RLock()
+        # Made when the first callback subscribes
+        self._subscriptions: Optional['Subscriptions'] = None
+        self._accessors: Dict[str, 'WeakSet[Accessor]'] = {}
+        self._batch = threading.local()
+        self._watcher: Optional['FileWatcher'] = None
+        self._snapshot: Optional['PersistentMap'] = None
+        self._schema = schema
+        self._loadReport: Optional['LoadReport'] = None
         # Gives default values for critical configuration entries that may not
         # be specified elsewhere
         default_cfg = ((debug, False), (profile, False), (noupdate, False),
                        (nologging, False), (noargs, False), (noconfig, True),
                        (cmdargs, None), (cmdfile, None), (version, '0.1'),
                        (release, '0.1.0'), (verbose, 0), (uac, None),
-                       (test, None))
+                       (test, None),
+                       # Environmental values that are costly to obtain
+                       (userid, LazyValue(_userid)),
+                       (username, LazyValue(_username)),
+                       (uid, LazyValue(_uid)), (gid, LazyValue(_gid)),
+                       (computer_name, LazyValue(_computerName)))
         default_admin = CfgAdmin(overideable=True)
-        for k, v in default_cfg:
-            if k not in self._cfg:
-                self._cfg[k] = CfgEntry(k,
-                                        v,
-                                        default_admin)
-
-        # Load the master preliminary configuration - All the work is done
-        # within the loaded module as a result of importing it so we don't need
-        # to use anything from it.
-        print(sys.path)
-        import gvConfig.master
-        gvConfig.master.Master()()  # Load all the disk based configuration
-
-        # Get the command line arguments if supported by this application.
-        # By this time we will know whether the application supports command
-        # line arguments.
-
-        if not self._cfg.get(noargs):
-            self._cfg.update(_a().Parse())
+        self._layers.setLayer(defaults_layer,
+                              {k: CfgEntry(k,
+                                           v,
+                                           admin=default_admin)
+                               for k, v in default_cfg})
+        # The entries shared by a supervisor process override only the
+        # defaults of this process
+        if shared is not None:
+            self._layers.addLayer(shared_layer, before=site_layer)
+            self._layers.setLayer(shared_layer, _attach(shared))
+
+        # Load all the disk based configuration
+        if sources is None:
+            sources = _defaultSources(shared, application)
+        self._sources: Sequence[Source] = tuple(sources)
+        self._sourceData: Dict[str, Mapping[str, Any]] = {}
+        # The data last read successfully from each source, by source name.
+        # It is only kept once a fallback has been asked for.
+        self._lastGood: Optional[Dict[str, Mapping[str, Any]]] = None
+        if load:
+            self.reload(maxWorkers=maxWorkers)
+            self.parseCommandLine()
+
+    def parseCommandLine(self: 'Configuration',
+                         argv: Optional[Sequence[str]]=None) -> None:
+        """
+        Sets the command line layer from the command line arguments, if
+        supported by this application. By this time the sources will have
+        told us whether the application supports command line arguments.
+
+        :param Sequence[str] argv: The arguments. The default is the `cmdargs`
+                                   entry or, when that is not set, the
+                                   command line.
+        """
+        if getattr(self._cfg.get(noargs), 'value', False):
+            return
+        from lib.parse_arguments import Arguments
+        values = Arguments(cfg=self._cfg).Parse(argv)
+        # Only the values change, so the options are still there the next
+        # time the command line is parsed
+        cfg = self._cfg
+        self.setLayer(cmdline_layer,
+                      {k: v if e is None else
+                          CfgEntry(k, v, e.description, e.argDes, e.flags,
+                                   e.admin)
+                       for k, v in values.items() for e in (cfg.get(k),)})
+
+    def reload(self: 'Configuration',
+               names: Optional[Iterable[str]]=None,
+               maxWorkers: Optional[int]=None) -> 'ConfigDiff':
+        """
+        Reads sources again and rebuilds the layers that they supply. The
+        other sources of those layers are not read again.
+
+        :param Iterable[str] names: The names of the sources to read. All the
+                                    sources are read by default.
+        :param int maxWorkers:      The maximum number of sources that are read
+                                    at the same time
+        :return: The changes to the configuration
+
+        A source whose loader streams its data is merged one group at a time
+        once the other sources have been merged, so that the early groups of
+        a very large source can be used, and are delivered to subscribers,
+        while the rest of it is still being read. Invalid groups from a
+        streamed source are skipped and reported together when the source has
+        been read. A streamed source that cannot be read to the end leaves
+        its layer as it was, although its subscribers are given the groups
+        merged before the error and then the changes that undo them.
+        """
+        from lib.cfgProfile import LoadReport
+        sources = self._selectSources(names)
+        report = LoadReport()
+        data = loadSources(sources, maxWorkers,
+                           self._profiles(sources, report))
+        return self._apply(sources, data, report)
+
+    @classmethod
+    async def aload(cls,
+                    sources: Optional[Sequence[Source]]=None,
+                    timeout: Optional[float]=None,
+                    fallback: bool=False,
+                    schema: Optional['Schema']=None,
+                    shared: Optional[str]=None,
+                    application: Optional[str]=None) -> 'Configuration':
+        """
+        Builds a configuration without blocking the event loop of an asyncio
+        application. The sources are read concurrently in worker threads.
+
+        :param float timeout: The time allowed to read each source
+        :param bool fallback: Keep the data read successfully from each
+                              source so that later calls of `areload` can
+                              fall back on it
+        :return: The configuration
+
+        The other arguments are as for the constructor.
+        """
+        cfg = await _toThread(cls, sources=sources, schema=schema,
+                              shared=shared, application=application,
+                              load=False)
+        await cfg.areload(timeout=timeout, fallback=fallback)
+        cfg.parseCommandLine()
+        return cfg
+
+    async def areload(self: 'Configuration',
+                      names: Optional[Iterable[str]]=None,
+                      timeout: Optional[float]=None,
+                      fallback: bool=False) -> 'ConfigDiff':
+        """
+        Reads sources again as `reload` does, but without blocking the event
+        loop. Each source is read in a worker thread. A source that takes
+        longer than `timeout` is abandoned, although its thread runs on until
+        the loader returns.
+
+        :param Iterable[str] names: The names of the sources to read. All the
+                                    sources are read by default.
+        :param float timeout:       The time allowed to read each source
+        :param bool fallback:       Use the data last read successfully from a
+                                    source by this configuration when it
+                                    cannot be read in time or fails. From
+                                    then on the data read from each source is
+                                    kept for later calls.
+        :return: The changes to the configuration
+        :raises TimeoutError: A source was not read in time and there was no
+                              data to fall back on
+        """
+        import asyncio
+        from lib.cfgProfile import LoadReport, recording
+
+        def read(s: Source,
+                 p: 'SourceProfile') -> Any:
+            with recording(p):
+                d = s.load()
+                # A stream is read in full here rather than in the event loop
+                return d if isinstance(d, Mapping) else dict(d)
+
+        async def one(s: Source,
+                      p: 'SourceProfile') -> Any:
+            try:
+                try:
+                    return await asyncio.wait_for(_toThread(read, s, p),
+                                                  timeout)
+                except asyncio.TimeoutError as e:
+                    # Not the built in TimeoutError before Python 3.11
+                    raise TimeoutError(f'Configuration source {s.name} was'
+                                       f' not read in time') from e
+            except Exception:
+                last = self._lastGood.get(s.name) if fallback else None
+                if last is None:
+                    raise
+                import logging
+                logging.getLogger(__name__).warning(
+                    'Configuration source %s could not be read - using the'
+                    ' data last read from it', s.name, exc_info=True)
+                return last
+
+        if fallback and self._lastGood is None:
+            with self._lock:
+                self._lastGood = dict(self._sourceData)
+        sources = self._selectSources(names)
+        report = LoadReport()
+        profiles = self._profiles(sources, report)
+        data = await asyncio.gather(*(one(s, p)
+                                      for s, p in zip(sources, profiles)))
+        return self._apply(sources, data, report)
+
+    def _selectSources(self: 'Configuration',
+                       names: Optional[Iterable[str]]) -> Sequence[Source]:
+        if names is None:
+            return self._sources
+        names = set(names)
+        return [s for s in self._sources if s.name in names]
+
+    def _profiles(self: 'Configuration',
+                  sources: Sequence[Source],
+                  report: 'LoadReport') -> List['SourceProfile']:
+        from lib.cfgProfile import SourceProfile
+        report.sources = [SourceProfile(s.name, s.layer, s.loader)
+                          for s in sources]
+        return report.sources
+
+    def _apply(self: 'Configuration',
+               sources: Sequence[Source],
+               data: Sequence[Any],
+               report: 'LoadReport') -> 'ConfigDiff':
+        """Merges the data read from sources into their layers"""
+        from lib.cfgProfile import phase, recording
+        from lib.cfgWatch import ConfigDiff
+        loaded = []
+        streams = []
+        for s, d, p in zip(sources, data, report.sources):
+            if isinstance(d, Mapping):
+                loaded.append((s, d, p))
+                p.entries = len(d)
+            else:
+                streams.append((s, d, p))
+        if self._schema is not None:
+            errors = []
+            for s, d, p in loaded:
+                with recording(p), phase('validate'):
+                    errors.extend(self._schema.validate(d, s.name,
+                                                        _entryValue))
+            if errors:
+                from lib.cfgSchema import SchemaError
+                raise SchemaError(errors)
+        with self._lock:
+            for s, d, _ in loaded:
+                self._sourceData[s.name] = d
+                if self._lastGood is not None:
+                    self._lastGood[s.name] = d
+            changes = self._rebuild((s.layer for s, _, _ in loaded), report)
+            self._commit(changes)
+        self._publish(changes)
+        for s, groups, p in streams:
+            with recording(p), phase('merge'):
+                for k, old in self._stream(s, groups, p).items():
+                    changes.setdefault(k, old)
+        self._loadReport = report
+        if getattr(self._cfg.get(profile), 'value', False):
+            report.log()
+        return ConfigDiff.compute(changes, self._cfg)
+
+    def _rebuild(self: 'Configuration',
+                 layers: Iterable[str],
+                 report: Optional['LoadReport']=None) -> Dict[str, Any]:
+        """
+        Rebuilds layers from the data of their sources. Entries whose value
+        has not changed are kept so that they are not reported as changed.
+        Must be called with the lock held.
+        """
+        changes: Dict[str, Any] = {}
+        for layer in dict.fromkeys(layers):
+            start = perf_counter()
+            for k, old in self._layers.setLayer(
+                    layer, self._layerEntries(layer)).items():
+                changes.setdefault(k, old)
+            if report is not None:
+                report.merge[layer] = report.merge.get(layer, 0.0) +\
+                    perf_counter() - start
+        return changes
+
+    def _stream(self: 'Configuration',
+                source: Source,
+                groups: Iterable[Tuple[str, Any]],
+                prof: 'SourceProfile') -> Dict[str, Any]:
+        """
+        Merges the groups of a streamed source as they are read. The time
+        taken is recorded in the profile of the source. When the source cannot
+        be read to the end, the groups already merged are undone.
+
+        :return: The keys that changed with their previous entries
+        """
+        from lib.cfgProfile import phase
+        changes: Dict[str, Any] = {}
+        data: Dict[str, Any] = {}
+        errors: List[str] = []
+        later = self._sources[self._sources.index(source) + 1:]
+        later = [s for s in later if s.layer == source.layer]
+        with self._lock:
+            # Restored if the source cannot be read to the end
+            saved = (dict(self._layers.layer(source.layer)),
+                     self._sourceData.get(source.name, MISSING))
+            self._sourceData[source.name] = data
+        try:
+            for k, v in groups:
+                if self._schema is not None:
+                    with phase('validate'):
+                        err = self._schema.validate({k: v}, source.name,
+                                                    _entryValue)
+                    if err:
+                        errors.extend(err)
+                        continue
+                with self._lock:
+                    data[k] = v
+                    # A later source of the same layer takes precedence
+                    if any(k in self._sourceData.get(s.name, ())
+                           for s in later):
+                        continue
+                    group = self._layers.updateLayer(
+                        source.layer,
+                        _asEntries({k: v}, self._layers.layer(source.layer)))
+                    self._commit(group)
+                self._publish(group)
+                for key, old in group.items():
+                    changes.setdefault(key, old)
+        except BaseException:
+            self._restore(source, *saved)
+            raise
+        # Removes the keys that are no longer in the source
+        with self._lock:
+            group = self._rebuild((source.layer,))
+            self._commit(group)
+        self._publish(group)
+        for k, old in group.items():
+            changes.setdefault(k, old)
+        prof.entries = len(data)
+        if errors:
+            from lib.cfgSchema import SchemaError
+            raise SchemaError(sorted(errors))
+        if self._lastGood is not None:
+            with self._lock:
+                self._lastGood[source.name] = data
+        return changes
+
+    def _restore(self: 'Configuration',
+                 source: Source,
+                 entries: Dict[str, CfgEntry],
+                 data: Any) -> None:
+        """
+        Puts back the layer of a streamed source, and the data last read from
+        the source, as they were before the source was read. The subscribers
+        are given the changes that undo the groups already merged.
+        """
+        with self._lock:
+            if data is MISSING:
+                self._sourceData.pop(source.name, None)
+            else:
+                self._sourceData[source.name] = data
+            changes = self._layers.setLayer(source.layer, entries)
+            self._commit(changes)
+        self._publish(changes)
+
+    def _layerEntries(self: 'Configuration',
+                      layer: str) -> Dict[str, CfgEntry]:
+        """
+        Merges the data from all the sources of a layer in source order. The
+        values of a source that gives a read-only mapping rather than a dict,
+        such as a snapshot, are only decoded when they are first read.
+        """
+        merged: Dict[str, Any] = {}
+        previous = self._layers.layer(layer)
+        for s in self._sources:
+            if s.layer == layer:
+                data = self._sourceData.get(s.name, {})
+                merged.update(data if isinstance(data, dict) else
+                              _lazyEntries(data, previous))
+        return _asEntries(merged, previous)
+
+    def _commit(self: 'Configuration',
+                changes: Dict[str, Any]) -> None:
+        """
+        Publishes the next version of the snapshot and invalidates the
+        accessors of the changed keys once the flattened view has changed.
+        Must be called with the lock held.
+        """
+        if changes and self._snapshot is not None:
+            cfg = self._cfg
+            self._snapshot = self._snapshot.evolve(
+                {k: cfg.get(k, MISSING) for k in changes})
+        if self._accessors:
+            for k in changes:
+                for a in self._accessors.get(k, ()):
+                    a.invalidate()
+
+    def accessor(self: 'Configuration',
+                 key: str,
+                 convert: Optional[Callable[[Any], Any]]=None,
+                 default: Optional[Any]=None) -> 'Accessor':
+        """
+        Gives an accessor that caches the converted value of a key, for
+        example ``verbosity = cfg.accessor(verbose, int)``. The cached value
+        is discarded whenever the entry for the key changes. The configuration
+        only keeps a weak reference to the accessor.
+
+        :param str key:          The configuration key
+        :param function convert: Converts the value of the entry
+        :param default:          The value when the key is not present
+        """
+        from lib.cfgAccessor import Accessor
+        a = Accessor(self, key, convert, default)
+        with self._lock:
+            self._accessors.setdefault(key, WeakSet()).add(a)
+        return a
+
+    def snapshot(self: 'Configuration') -> 'PersistentMap':
+        """
+        Gives an immutable snapshot of the flattened view. Readers can use it
+        from any thread without locking; later changes to the configuration
+        produce new snapshots and never affect this one. The first snapshot is
+        built when it is first requested; after that each change only costs
+        time proportional to the number of keys changed.
+
+        A pre-fork server should take the snapshot and call
+        `lib.cfgSnapshot.freezeForFork` before forking its workers.
+        """
+        snap = self._snapshot
+        if snap is None:
+            with self._lock:
+                if self._snapshot is None:
+                    from lib.cfgSnapshot import PersistentMap
+                    self._snapshot = PersistentMap(self._cfg)
+                snap = self._snapshot
+        return snap
+
+    def _publish(self: 'Configuration',
+                 changes: Dict[str, Any]) -> 'ConfigDiff':
+        """
+        Delivers the changes made to the flattened view to the subscribers.
+
+        :param dict changes: The keys that changed with their previous entries
+        """
+        from lib.cfgWatch import ConfigDiff
+        diff = ConfigDiff.compute(changes, self._cfg)
+        pending = getattr(self._batch, 'pending', None)
+        if pending is not None:
+            for k, old in changes.items():
+                pending.setdefault(k, old)
+        elif diff and self._subscriptions is not None:
+            self._subscriptions.dispatch(diff)
+        return diff
+
+    @contextmanager
+    def batch(self: 'Configuration') -> Iterator[None]:
+        """
+        Defers the delivery of changes made by this thread until the end of
+        the batch. Each subscriber is then called once with all the changes
+        that concern it. A key that is changed several times is reported once
+        and a key that ends the batch with the entry it started with is not
+        reported at all. Batches may be nested; changes are delivered when the
+        outermost batch ends.
+        """
+        if getattr(self._batch, 'pending', None) is not None:
+            yield
+            return
+        self._batch.pending = pending = {}
+        try:
+            yield
+        finally:
+            self._batch.pending = None
+            from lib.cfgWatch import ConfigDiff
+            diff = ConfigDiff.compute(pending, self._cfg)
+            if diff and self._subscriptions is not None:
+                self._subscriptions.dispatch(diff)
+
+    def subscribe(self: 'Configuration',
+                  callback: Callable[['ConfigDiff'], None],
+                  keys: Optional[Iterable[str]]=None) -> 'Subscription':
+        """
+        Registers a callback that is given a `ConfigDiff` whenever entries
+        that it is interested in change. Changes found by `watch` are
+        delivered from the watcher thread.
+
+        :param function callback:  Called with the changes
+        :param Iterable[str] keys: The keys of interest. A key ending in
+                                   ``*`` is a prefix, so ``log.*`` matches
+                                   every key that starts with ``log.``. All
+                                   keys are of interest by default.
+        :return: The subscription to pass to `unsubscribe`
+        """
+        with self._lock:
+            return self._subscribers().add(callback, keys)
+
+    def unsubscribe(self: 'Configuration',
+                    subscription: 'Subscription') -> None:
+        with self._lock:
+            self._subscribers().remove(subscription)
+
+    def _subscribers(self: 'Configuration') -> 'Subscriptions':
+        """
+        Gives the subscriptions, making them when they are first needed. Must
+        be called with the lock held.
+        """
+        if self._subscriptions is None:
+            from lib.cfgEvents import Subscriptions
+            self._subscriptions = Subscriptions()
+        return self._subscriptions
+
+    def watch(self: 'Configuration',
+              interval: float=1.0,
+              polling: bool=False) -> 'FileWatcher':
+        """
+        Watches the files behind the sources of this configuration. When a
+        file changes, only the sources read from that file are reloaded and
+        the subscribers are given the resulting changes. A source that cannot
+        be read, for example because it is being rewritten, leaves the
+        configuration unchanged until the file changes again.
+
+        :param float interval: See `FileWatcher`
+        :param bool polling:   Poll the files even when inotify is available
+        """
+        self.unwatch()
+        from lib.cfgWatch import FileWatcher
+        owners: Dict['Path', List[str]] = {}
+        for s in self._sources:
+            for p in s.paths():
+                owners.setdefault(p.absolute(), []).append(s.name)
+
+        def changed(paths: Set['Path']) -> None:
+            try:
+                self.reload({n for p in paths for n in owners[p]})
+            except Exception:
+                import logging
+                logging.getLogger(__name__).exception(
+                    'Configuration reload failed - keeping the current'
+                    ' configuration')
+
+        self._watcher = FileWatcher(owners, changed, interval, polling).start()
+        return self._watcher
+
+    def unwatch(self: 'Configuration') -> None:
+        """Stops watching the files behind the sources"""
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
 
     @property
-    def cfg(self: 'Configuration') -> Dict[str, CfgEntry]:
+    def loadReport(self: 'Configuration') -> Optional['LoadReport']:
+        """
+        The time taken to read and merge each source in the most recent load
+        or reload. The report is logged when the `profile` entry is set.
+        """
+        return self._loadReport
+
+    @property
+    def schema(self: 'Configuration') -> Optional['Schema']:
+        """The schema that validates values as they are loaded"""
+        return self._schema
+
+    @property
+    def sources(self: 'Configuration') -> Sequence[Source]:
+        """The sources of this configuration"""
+        return self._sources
+
+    @property
+    def cfg(self: 'Configuration') -> Mapping[str, CfgEntry]:
+        """The flattened view of the configuration. It must not be modified."""
         return self._cfg
 
+    def provenance(self: 'Configuration',
+                   key: str) -> Optional[str]:
+        """
+        Gives the name of the layer that supplied the entry for a key. Entries
+        taken from a shared memory segment are attributed to `shared_layer`.
+        """
+        return self._layers.provenance(key)
+
+    def setLayer(self: 'Configuration',
+                 layer: str,
+                 entries: Mapping[str, Any]) -> None:
+        """
+        Replaces the contents of a layer. Only the keys supplied by the layer
+        before or after the change are resolved again. The values are
+        converted to CfgEntries if necessary.
+        """
+        with self._lock:
+            changes = self._layers.setLayer(layer, _asEntries(entries))
+            self._commit(changes)
+        self._publish(changes)
+
     def setMember(self: 'Configuration',
                   key: str,
                   value: Any) -> None:
@@ -474,9 +1149,14 @@ class Configuration():
         entities. Default value are used for the ArgDescriptor and CfgAdmin
         properties of CfgEntry.
         """
-        if key not in self._cfg:
-            self._cfg[key] = CfgEntry(key,
-                                      value)
+        with self._lock:
+            if key in self._cfg:
+                return
+            changes = self._layers.updateLayer(runtime_layer,
+                                               {key: CfgEntry(key,
+                                                              value)})
+            self._commit(changes)
+        self._publish(changes)
 
     def add(self: 'Configuration',
             entry: Mapping[str, Any]) -> None:
@@ -484,32 +1164,302 @@ class Configuration():
         Adds the contents of a Mapping to the configuration. The values are
         converted to CfgEntries if necessary.
         """
-        for k, v in entry:
-            if self._cfg.get(k) is None:
-                raise(KeyError,
-                      f'{k} is already in configuration - cannot add')
-            self._cfg[k] = CfgEntry(v) if not isinstance(v, CfgEntry) else v
+        self.merge(entry,
+                   policy=merge_error)
+
+    def merge(self: 'Configuration',
+              entries: Mapping[str, Any],
+              policy: str=merge_override,
+              layer: str=runtime_layer,
+              owner: Optional[str]=None) -> 'ConfigDiff':
+        """
+        Merges a batch of entries into a layer. The whole batch is checked
+        before anything is changed and all the problems are reported together.
+        The entries are then published in a single step, so other threads and
+        the subscribers never see part of a batch.
+
+        :param Mapping entries: The entries to merge. The values are converted
+                                to CfgEntries if necessary.
+        :param str policy:      What to do with keys that are already in the
+                                configuration. `merge_override` replaces them,
+                                `merge_keep` leaves them alone and
+                                `merge_error` rejects the batch.
+        :param str layer:       The layer that receives the entries
+        :param str owner:       The owner making the change. An entry that is
+                                not overideable can only be replaced by its
+                                owner.
+        :raises KeyError:   The policy is `merge_error` and some keys are
+                            already in the configuration
+        :raises ValueError: Some entries cannot be overridden
+        :raises SchemaError: Some values are not valid
+        :return: The changes to the configuration
+        """
+        if policy not in (merge_override, merge_keep, merge_error):
+            raise ValueError(f'Unknown merge policy {policy}')
+        with self._lock:
+            present = entries.keys() & self._cfg.keys()
+            if policy == merge_error and present:
+                raise KeyError(f'{sorted(present)} already in configuration'
+                               ' - cannot add')
+            if policy == merge_keep:
+                entries = {k: v for k, v in entries.items()
+                           if k not in present}
+                present = ()
+            self._checkOverride(present, owner)
+            if self._schema is not None:
+                self._schema.check(((None, entries),), _entryValue)
+            changes = self._layers.updateLayer(layer,
+                                               _asEntries(entries))
+            self._commit(changes)
+        return self._publish(changes)
+
+    def updateMany(self: 'Configuration',
+                   values: Mapping[str, Any],
+                   layer: str=runtime_layer,
+                   owner: Optional[str]=None) -> 'ConfigDiff':
+        """
+        Changes the values of a batch of existing entries, keeping their
+        descriptions, argument descriptors, flags and administrative data.
+        The batch is checked and published as a whole, as for `merge`.
+
+        :param Mapping values: The new values by key
+        :param str layer:      The layer that receives the changed entries
+        :param str owner:      The owner making the change
+        :raises KeyError:   Some keys are not in the configuration
+        :raises ValueError: Some entries cannot be overridden
+        :raises SchemaError: Some values are not valid
+        :return: The changes to the configuration
+        """
+        with self._lock:
+            missing = values.keys() - self._cfg.keys()
+            if missing:
+                raise KeyError(f'{sorted(missing)} not in configuration'
+                               ' - cannot update')
+            self._checkOverride(values.keys(), owner)
+            if self._schema is not None:
+                self._schema.check(((None, values),))
+            cfg = self._cfg
+            changes = self._layers.updateLayer(
+                layer,
+                {k: CfgEntry(k, v, e.description, e.argDes, e.flags, e.admin)
+                 for k, v in values.items() for e in (cfg[k],)})
+            self._commit(changes)
+        return self._publish(changes)
+
+    def _checkOverride(self: 'Configuration',
+                       keys: Iterable[str],
+                       owner: Optional[str]) -> None:
+        """
+        Checks that the entries for the keys may be overridden, reporting
+        every entry that may not.
+        """
+        cfg = self._cfg
+        refused = [k for k in keys
+                   for a in (cfg[k].admin,)
+                   if a is not None and not a.overideable and
+                      (a.owner is None or a.owner != owner)]
+        if refused:
+            raise ValueError(f'{sorted(refused)} cannot be overridden')
 
     def delete(self: 'Configuration',
-               entry: CfgEntry):
-        if isinstance(entry,
-                      CfgEntry):
-            if entry.key() not in self._cfg:  # Got an entry object
-                raise(KeyError,
-                      f'{entry.key} is not in configuration - cannot delete')
-            else:
-                    del self._cfg[entry.key()]
-        else:  # Got a text key
-            if entry.key() in self._cfg:
-                raise(KeyError,
-                      f'{entry} is not in configuration - cannot delete')
-            else:
-                del self._cfg[entry]
+               entry: Union[CfgEntry, str]):
+        """
+        Deletes an entry that was set by the running program. Entries supplied
+        by other layers are restored when the running program stops overriding
+        them.
+        """
+        key = entry.name if isinstance(entry, CfgEntry) else entry
+        with self._lock:
+            if key not in self._layers.layer(runtime_layer):
+                raise KeyError(f'{key} is not in configuration'
+                               ' - cannot delete')
+            changes = self._layers.removeKeys(runtime_layer,
+                                              (key,))
+            self._commit(changes)
+        self._publish(changes)
 
     def get(self: 'Configuration',
             key: str) -> Optional[Any]:
         return self._cfg.get(key)
 
+    def publishShared(self: 'Configuration',
+                      name: Optional[str]=None) -> 'SharedConfiguration':
+        """
+        Publishes the flattened view in a shared memory segment so that worker
+        processes can construct their configuration with
+        ``Configuration(shared=segment.name)`` instead of loading it. The
+        caller owns the returned segment and must close it when the workers no
+        longer need it.
+
+        :param str name: The name of the segment
+        """
+        with self._lock:
+            entries = dict(self._cfg)
+        from lib.cfgShared import SharedConfiguration
+        return SharedConfiguration(
+            {k: e.value for k, e in entries.items()}, name,
+            {k: (e.description, e.argDes, e.flags, e.admin)
+             for k, e in entries.items()
+             if e.description is not None or e.argDes is not None or
+             e.flags or e.admin is not None})
+
+    def export(self: 'Configuration',
+               format: str='json',
+               path: Optional[Union[str, 'Path']]=None) -> bytes:
+        """
+        Writes the values of the flattened view in one of `EXPORT_FORMATS`.
+        Each format can be read back by the loader of the same name in
+        `ControlFiles.loaders`: ``fileJSON``, ``fileMsgpack`` or ``fileEnv``.
+
+        :param str format: ``json``, ``msgpack`` or ``env``
+        :param Path path:  The file to write, if any
+        :return: The exported configuration
+        :raises ValueError: The format is not known
+        :raises TypeError:  A value cannot be represented in the format
+        """
+        if format not in EXPORT_FORMATS:
+            raise ValueError(f'Unknown export format {format}; expected one'
+                             f' of {", ".join(EXPORT_FORMATS)}')
+        with self._lock:
+            entries = dict(self._cfg)
+        data = {k: e.value for k, e in entries.items()}
+        if format == 'json':
+            import json
+            raw = json.dumps(data, separators=(',', ':')).encode('utf-8')
+        elif format == 'msgpack':
+            from ControlFiles.loaders.fileMsgpack import dumps
+            raw = dumps(data)
+        else:
+            from ControlFiles.loaders.fileEnv import dumps
+            raw = dumps(data).encode('utf-8')
+        if path is not None:
+            from pathlib import Path
+            Path(path).write_bytes(raw)
+        return raw
+
     def len(self) -> int:
         return len(self._cfg)
-#TODO: Load configuration data from file
+
+
+def _userid() -> str:
+    import getpass
+    return getpass.getuser()
+
+
+def _username() -> str:
+    """The full name of the user, or the user id if it is not known"""
+    try:
+        import pwd
+        name = pwd.getpwuid(os.getuid()).pw_gecos.split(',')[0]
+    except (ImportError, KeyError):
+        name = ''
+    return name or _userid()
+
+
+def _uid() -> Optional[int]:
+    return os.getuid() if hasattr(os, 'getuid') else None
+
+
+def _gid() -> Optional[int]:
+    return os.getgid() if hasattr(os, 'getgid') else None
+
+
+def _computerName() -> str:
+    import socket
+    return socket.gethostname()
+
+
+def _defaultSources(shared: Optional[str],
+                    application: Optional[str]) -> Sequence[Source]:
+    """Gives the sources loaded when a configuration is given none"""
+    if shared is not None:
+        return ()
+    if application is not None:
+        return applicationSources(application)
+    return DEFAULT_SOURCES
+
+
+async def _toThread(func: Callable[..., Any],
+                    *args: Any,
+                    **kwargs: Any) -> Any:
+    """
+    Runs a function in a worker thread as `asyncio.to_thread` does. That
+    function only exists from Python 3.9.
+    """
+    import asyncio
+    if sys.version_info >= (3, 9):
+        return await asyncio.to_thread(func, *args, **kwargs)
+    import contextvars
+    from functools import partial
+    ctx = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        None, partial(ctx.run, func, *args, **kwargs))
+
+
+def _attach(name: str) -> Dict[str, CfgEntry]:
+    """
+    Gives the entries of a shared segment. Their values stay in the segment
+    until they are read.
+    """
+    from lib.cfgShared import attach
+    values, fields = attach(name)
+    return {k: _MappedEntry(k, values, *fields.get(k, ())) for k in values}
+
+
+def _entryValue(v: Any) -> Any:
+    return v.value if isinstance(v, CfgEntry) else v
+
+
+def _lazyEntries(data: Mapping[str, Any],
+                 previous: Optional[Mapping[str, CfgEntry]]=None
+                 ) -> Dict[str, CfgEntry]:
+    """
+    Gives entries whose values are read from a mapping when needed. The entry
+    in `previous` is reused when it reads the same mapping, or a snapshot that
+    holds the same encoded value, so that an unchanged value is not decoded to
+    find that it has not changed.
+    """
+    previous = previous or {}
+    result: Dict[str, CfgEntry] = {}
+    for k in data:
+        e = previous.get(k)
+        if type(e) is not _MappedEntry or e.description is not None or\
+           e.argDes is not None or e.flags or e.admin is not None or\
+           not _sameValue(e._source, data, k):
+            e = _MappedEntry(k, data)
+        result[k] = e
+    return result
+
+
+def _sameValue(old: Mapping[str, Any],
+               new: Mapping[str, Any],
+               key: str) -> bool:
+    """Tells, without decoding them, whether two mappings hold a key alike"""
+    if old is new:
+        return True
+    from ControlFiles.loaders.snapshot import Snapshot
+    if not (isinstance(old, Snapshot) and isinstance(new, Snapshot) and
+            old.codec == new.codec):
+        return False
+    encoded = old.encoded(key)
+    return encoded is not None and encoded == new.encoded(key)
+
+
+def _asEntries(entries: Mapping[str, Any],
+               previous: Optional[Mapping[str, CfgEntry]]=None
+               ) -> Dict[str, CfgEntry]:
+    """
+    Converts the values of a mapping to CfgEntries where necessary. The entry
+    in `previous` is reused when it holds the same plain value.
+    """
+    previous = previous or {}
+    result = {}
+    for k, v in entries.items():
+        if not isinstance(v, CfgEntry):
+            e = previous.get(k)
+            if e is None or e.admin is not None or e.argDes is not None or\
+               type(e.value) is not type(v) or e.value != v:
+                e = CfgEntry(k, v)
+            v = e
+        result[k] = v
+    return result
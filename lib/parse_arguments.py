@@ -23,42 +23,107 @@ concerned.
     @author: Jonathan Gossage
 """
 
-import importlib
-from pathlib import PurePath
+# Most runs of a program give no arguments or only ask for more verbosity or
+# for the version. `Arguments.Parse` scans such command lines itself, so
+# argparse is only imported, and the parser only built, when they are needed.
+from contextvars import ContextVar
+import os
 import sys
+import threading
+from typing import (Any, Callable, Dict, Iterable, List, Mapping, Optional,
+                    Sequence, Tuple, TYPE_CHECKING)
+
+import lib.configuration as _c
+
+if TYPE_CHECKING:
+    from argparse import ArgumentParser
+
+
+def _handleVerbosity() -> type:
+    """Defines `handleVerbosity` when it is first needed"""
+    cls = globals().get('handleVerbosity')
+    if cls is not None:
+        return cls
+    from argparse import Action
+
+    class handleVerbosity(Action):
+        """
+    An argparse Action that limits the verbosity level to 3 for the verbose
+    flag. Note that making the verbosity level 3 also serves as a signal to
+    run the program in debugging mode.
+
+    The level is counted in the namespace being parsed rather than in the
+    action, so that a parser can be reused for many command lines.
+        """
+        def __init__(self,
+                     option_strings,
+                     dest,
+                     default=0,
+                     **kwargs):
+            kwargs.pop('nargs', None)
+            super().__init__(option_strings,
+                             dest,
+                             nargs=0,
+                             default=default,
+                             **kwargs)
+
+        def __call__(self,
+                     parser,
+                     namespace,
+                     values,
+                     option_string=None):
+            setattr(namespace,
+                    self.dest,
+                    _verbosity(getattr(namespace, self.dest, None) or 0))
+
+    handleVerbosity.__module__ = __name__
+    globals()['handleVerbosity'] = handleVerbosity
+    return handleVerbosity
+
+
+def __getattr__(name: str) -> Any:
+    if name == 'handleVerbosity':
+        return _handleVerbosity()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
-from argparse import ArgumentParser, RawDescriptionHelpFormatter, Action
 
-import lib.gvLogging as _l
+def _verbosity(level: int) -> int:
+    """Gives the verbosity level after one more verbose flag"""
+    if level >= 3:
+        import logging
+        logging.getLogger(__name__).warning(
+            'Maximum permitted verbosity level is 3. Truncating level'
+            ' accordingly')
+        return level
+    return level + 1
 
-class handleVerbosity(Action):
+
+def _prog() -> str:
+    """Gives the name of the program, as argparse shows it"""
+    return os.path.splitext(os.path.basename(sys.argv[0]))[0]
+
+
+class ArgumentsError(Exception):
     """
-An argparse Action that limits the verbosity level to 3 for the verbose flag.
-Note that making the verbosity level 3 also serves as a signal to run the
-program in debugging mode.
+    A command line parsed by `Arguments.parseMany` could not be parsed, or
+    asked for help or the version.
+
+    :ivar int status:   The exit status that argparse would have given
+    :ivar str message:  The text that argparse would have written
     """
+
     def __init__(self,
-                 option_strings,
-                 dest,
-                 **kwargs):
-        super(option_strings,
-              dest,
-              kwargs)
-        self._count = 0
-
-    def __call__(self,
-                 parser,
-                 namespace,
-                 values,
-                 option_string=None):
-        if ++self._count >= 3:
-            if self._count > 3:
-                _l.getLogging().warning('Maximum permitted verbosity level'
-                                        'is 3. Truncating level accordingly')
-        else:
-            setattr(namespace,
-                    self.dest,
-                    values)
+                 status: int,
+                 message: str) -> None:
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+# The text written by the parser while `Arguments.parseMany` parses a command
+# line, or None when the parser may write and exit as usual
+_output: ContextVar[Optional[List[str]]] = ContextVar('gvArgumentsOutput',
+                                                      default=None)
 
 
 class ArgumentDesc(object):
@@ -228,30 +293,84 @@ class ArgumentDesc(object):
         self._dest = value
 
 
-class Arguments(object):
-    """Handles command line argument parsing"""
+# The actions that take no value from the command line and those that take no
+# constant
+_NOVALUE = frozenset(('store_const', 'store_true', 'store_false',
+                      'append_const', 'count', 'help', 'version'))
+_NOCONST = frozenset(('store_true', 'store_false', 'count', 'help',
+                      'version'))
+# The options that every parser defines
+_BUILTIN = frozenset(('-v', '--verbose', '-V', '--version', '-h', '--help'))
+# The arguments that `Arguments.Parse` can scan without argparse
+_VERSION = frozenset(('-V', '--version'))
+_OPTIONAL_NARGS = frozenset(('?', '*'))
+
+# A parser built by `Arguments.parser` together with the configuration key of
+# each of its destinations
+PARSER = Tuple['ArgumentParser', Dict[str, str]]
+
+# The parsers built in this process, by program and argument specification.
+# Building the parser for a program with many configuration backed options is
+# a visible part of its startup, and a program that parses many command lines
+# needs to build it only once. Parsers cannot be pickled, so they are not kept
+# between runs.
+_parsers: Dict[Tuple[Any, ...], PARSER] = {}
+_parsersLock = threading.Lock()
+
+
+def argumentSpec(name: str,
+                 entry: '_c.CfgEntry'
+                 ) -> Tuple[Tuple[str, ...], Dict[str, Any]]:
+    """
+    Gives the arguments of ``add_argument`` that define the command line
+    override of a configuration entry.
 
-    def __init__(self,
-                 program_version, updated):
-        self._program_version = program_version
-        self._updated = updated
-        self._c = importlib.import_module('lib.configurationx')
-        self._l = importlib.__import__('lib.gvLogging', fromlist=('Logging'))
-
-    def Parse(self):
-        if not self.get(self._c.noargs):
-            return {}  # Command line processing not wanted
-        # Construct messages used during command line argument parsing.
-        #TODO: Fix accessing of build date
-        # Build date is when the relevant module is successfully checked into
-        # GitHub
-        program_create_date = f'{self._c.cfg[self.datecr]}'
-        program_build_date = str(self._updated)
-        program_version_message = \
-            '%%(prog)s {} {}'.format(self._program_version,
-                                     program_build_date)
-        program_shortdesc = __import__('__main__').__doc__.split('\n')[1]
-        program_license = f"""{program_shortdesc}
+    :param str name:        The key of the entry
+    :param CfgEntry entry:  The entry, which must have an `ArgDescriptor`
+    :return: The option strings, or the name of a positional argument, and
+             the keyword arguments
+    """
+    from argparse import SUPPRESS
+    ad = entry.argDes
+    action = ad.action or 'store'
+    kwargs: Dict[str, Any] = {'action': action, 'dest': ad.dest or name}
+    if ad.keywordDefs:
+        names = tuple(ad.keywordDefs)
+    else:
+        names = (kwargs.pop('dest'),)
+        if ad.positional:
+            kwargs['metavar'] = ad.positional
+    if entry.description:
+        kwargs['help'] = entry.description
+    if ad.default == SUPPRESS:
+        # argparse recognises its own constant by identity
+        kwargs['default'] = SUPPRESS
+    elif ad.default is not None:
+        kwargs['default'] = ad.default
+    if action not in _NOVALUE:
+        if ad.type is not None:
+            kwargs['type'] = ad.type
+        if ad.nargs is not None:
+            kwargs['nargs'] = ad.nargs
+    if action not in _NOCONST and ad.const is not None:
+        kwargs['const'] = ad.const
+    return names, kwargs
+
+
+def _shortDescription() -> str:
+    """Gives the second line of the main module's documentation"""
+    lines = (getattr(sys.modules.get('__main__'), '__doc__', None) or
+             '').split('\n')
+    return lines[1] if len(lines) > 1 else lines[0]
+
+
+def _license(created: Any,
+             updated: Any) -> str:
+    """Gives the description shown by ``--help``"""
+    program_create_date = f'{created}'
+    program_build_date = str(updated)
+    program_shortdesc = _shortDescription()
+    return f"""{program_shortdesc}
 Created by Jonathan Gossage on {program_create_date}.
 Copyright © 2020 Jonathan Gossage All rights reserved.
 
@@ -265,24 +384,318 @@ or conditions of any kind, either express or implied.
 
 USAGE
 """
+
+
+_classes: Optional[Tuple[type, type]] = None
+
+
+def _parserClasses() -> Tuple[type, type]:
+    """
+    Defines, when they are first needed, the parser and version action used
+    by `Arguments`. They take functions that write the description and the
+    version message when they are shown.
+    """
+    global _classes
+    if _classes is not None:
+        return _classes
+    from argparse import Action, ArgumentParser, SUPPRESS
+
+    class LazyArgumentParser(ArgumentParser):
+        """
+        An ArgumentParser whose description is written when it is shown.
+
+        While `Arguments.parseMany` is parsing, what the parser would write
+        is kept and it raises `ArgumentsError` instead of exiting.
+        """
+
+        def __init__(self,
+                     describe: Callable[[], str],
+                     **kwargs: Any) -> None:
+            self._describe: Optional[Callable[[], str]] = describe
+            super().__init__(**kwargs)
+
+        @property
+        def description(self) -> Optional[str]:
+            if self._describe is not None:
+                self._description = self._describe()
+                self._describe = None
+            return self._description
+
+        @description.setter
+        def description(self,
+                        value: Optional[str]) -> None:
+            self._description = value
+            if value is not None:
+                self._describe = None
+
+        def _print_message(self,
+                           message: str,
+                           file: Any=None) -> None:
+            output = _output.get()
+            if output is None:
+                super()._print_message(message, file)
+            elif message:
+                output.append(message)
+
+        def exit(self,
+                 status: int=0,
+                 message: Optional[str]=None) -> None:
+            output = _output.get()
+            if output is None:
+                super().exit(status, message)
+            if message:
+                output.append(message)
+            raise ArgumentsError(status, ''.join(output))
+
+    class LazyVersionAction(Action):
+        """
+        The argparse ``version`` action for a version message that is
+        written when it is shown
+        """
+
+        def __init__(self,
+                     option_strings: Sequence[str],
+                     version: Callable[[], str],
+                     dest: str=SUPPRESS,
+                     default: Any=SUPPRESS,
+                     help: str="show program's version number and exit"
+                     ) -> None:
+            super().__init__(option_strings=option_strings,
+                             dest=dest,
+                             default=default,
+                             nargs=0,
+                             help=help)
+            self.version = version
+
+        def __call__(self,
+                     parser: ArgumentParser,
+                     namespace: Any,
+                     values: Any,
+                     option_string: Optional[str]=None) -> None:
+            formatter = parser._get_formatter()
+            formatter.add_text(self.version())
+            parser._print_message(formatter.format_help(), sys.stdout)
+            parser.exit()
+
+    for cls in (LazyArgumentParser, LazyVersionAction):
+        cls.__module__ = __name__
+    _classes = (LazyArgumentParser, LazyVersionAction)
+    return _classes
+
+
+class Arguments(object):
+    """
+    Handles command line argument parsing
+
+    Every configuration entry that has an `ArgDescriptor` can be overridden
+    from the command line. The parser is built from the descriptors in one
+    pass over the configuration and kept for later parses by any `Arguments`
+    for the same program, version and descriptors.
+
+    :param str program_version: The version shown by ``--version``. The
+                                default is the `version` configuration entry.
+    :param str updated:         The date the program was built. The default
+                                is the `dateup` configuration entry.
+    :param Mapping cfg:         The configuration entries, by key, such as
+                                `lib.configuration.Configuration.cfg`
+    """
+
+    def __init__(self,
+                 program_version: Optional[str]=None,
+                 updated: Optional[str]=None,
+                 cfg: Optional[Mapping[str, '_c.CfgEntry']]=None):
+        self._c = _c
+        self._cfg: Mapping[str, '_c.CfgEntry'] = {} if cfg is None else cfg
+        self._program_version = program_version if program_version is not\
+            None else self.get(_c.version)
+        self._updated = updated if updated is not None else\
+            self.get(_c.dateup)
+
+    def get(self,
+            key: str) -> Any:
+        """Gives the value of a configuration entry or None"""
+        e = self._cfg.get(key)
+        return None if e is None else e.value
+
+    def _key(self) -> Tuple[Tuple[Any, ...], List[Tuple[str, '_c.CfgEntry']]]:
+        entries = [(k, e) for k, e in self._cfg.items()
+                   if getattr(e, 'argDes', None) is not None]
+        return ((_prog(), self._program_version,
+                 self._updated, self.get(self._c.datecr),
+                 tuple((k, repr(e.argDes), e.description)
+                       for k, e in entries)),
+                entries)
+
+    def parser(self) -> 'ArgumentParser':
+        """Gives the parser for the command line"""
+        return self._parser()[0]
+
+    def _parser(self) -> PARSER:
+        key, entries = self._key()
+        built = _parsers.get(key)
+        if built is None:
+            with _parsersLock:
+                built = _parsers.get(key)
+                if built is None:
+                    built = _parsers[key] = self._build(entries)
+        return built
+
+    def _build(self,
+               entries: Sequence[Tuple[str, '_c.CfgEntry']]) -> PARSER:
+        # The messages used during command line argument parsing are only
+        # written if they are shown, by --help, --version or an error.
+        #TODO: Fix accessing of build date
+        # Build date is when the relevant module is successfully checked into
+        # GitHub
+        created = self.get(self._c.datecr)
+        version, updated = self._program_version, self._updated
         # Setup argument parser
-        parser = ArgumentParser(description=program_license,
-                                prog=PurePath(sys.argv[0]).stem,
-                                formatter_class=RawDescriptionHelpFormatter
-                                )
+        from argparse import RawDescriptionHelpFormatter, SUPPRESS
+        Parser, VersionAction = _parserClasses()
+        parser = Parser(lambda: _license(created, updated),
+                        prog=_prog(),
+                        formatter_class=RawDescriptionHelpFormatter
+                        )
         parser.add_argument('-v',
                             '--verbose',
                             dest='verbose',
-                            action=handleVerbosity,
+                            action=_handleVerbosity(),
+                            default=SUPPRESS,
                             help='set verbosity level [default: 0]'
                             )
         parser.add_argument('-V',
                             '--version',
-                            action='version',
-                            version=program_version_message
+                            action=VersionAction,
+                            version=lambda: '%(prog)s {} {}'.format(version,
+                                                                    updated)
                             )
-#TODO: Add code to create more add_argument methods for items in configuration
-# from configuration file
-
-        # Process arguments
-        return vars(parser.parse_args())
+        # The options of the configuration entries
+        dests = {'verbose': self._c.verbose}
+        for name, entry in entries:
+            names, kwargs = argumentSpec(name, entry)
+            taken = _BUILTIN.intersection(names)
+            if taken:
+                # Defined above, so only the other flags of the option are
+                # kept
+                import logging
+                names = tuple(n for n in names if n not in taken)
+                logging.getLogger(__name__).warning(
+                    'Configuration entry %s cannot use the reserved flags'
+                    ' %s.%s', name, ', '.join(sorted(taken)),
+                    ' Using ' + ', '.join(names) + ' only.' if names else
+                    ' It cannot be set on the command line.')
+                if not names:
+                    continue
+            action = parser.add_argument(*names, **kwargs)
+            dests[action.dest] = name
+        return parser, dests
+
+    def _canScan(self) -> bool:
+        """
+        Tells whether the command lines of the program can be scanned without
+        the parser. An entry that gives a value, or requires one, when it is
+        not on the command line needs the parser.
+        """
+        for e in self._cfg.values():
+            ad = getattr(e, 'argDes', None)
+            if ad is not None and (ad.default != _c.SUPPRESS or
+                                   not (ad.keywordDefs or
+                                        ad.nargs in _OPTIONAL_NARGS)):
+                return False
+        return True
+
+    def _scan(self,
+              argv: Sequence[str],
+              canScan: Optional[bool]=None) -> Optional[Dict[str, Any]]:
+        """
+        Parses a command line that gives only verbose and version flags
+        without building the parser.
+
+        :param bool canScan: The result of `_canScan`, when it is already
+                             known
+        :return: The values given on the command line or None when the
+                 command line needs the parser
+        """
+        for arg in argv:
+            if not (arg in _VERSION or arg == '--verbose' or
+                    (len(arg) > 1 and arg[0] == '-' and
+                     arg.count('v') == len(arg) - 1)):
+                return None
+        if not (self._canScan() if canScan is None else canScan):
+            return None
+        level = None
+        for arg in argv:
+            if arg in _VERSION:
+                # As printed by argparse
+                sys.stdout.write(f'{_prog()} {self._program_version}'
+                                 f' {self._updated}\n')
+                sys.exit(0)
+            for _ in range(1 if arg == '--verbose' else len(arg) - 1):
+                level = _verbosity(level or 0)
+        return {} if level is None else {self._c.verbose: level}
+
+    def Parse(self,
+              argv: Optional[Sequence[str]]=None) -> Dict[str, Any]:
+        """
+        Parses a command line.
+
+        :param Sequence[str] argv: The arguments. The default is the `cmdargs`
+                                   configuration entry or, when that is not
+                                   set, the command line.
+        :return: The values given on the command line, by configuration key
+        """
+        if self.get(self._c.noargs):
+            return {}  # Command line processing not wanted
+        if argv is None:
+            argv = self.get(self._c.cmdargs)
+            if argv is None:
+                argv = sys.argv[1:]
+        result = self._scan(argv)
+        if result is not None:
+            return result
+        parser, dests = self._parser()
+        return self._values(parser, dests, argv)
+
+    def parseMany(self,
+                  argvs: Iterable[Sequence[str]]
+                  ) -> Tuple[List[Optional[Dict[str, Any]]],
+                             Dict[int, ArgumentsError]]:
+        """
+        Parses many command lines, such as the emulated command lines of the
+        jobs run by a scheduler, with one parser. Nothing is written and the
+        program does not exit when a command line is invalid or asks for help
+        or the version.
+
+        :param Iterable argvs: The command lines
+        :return: The values given on each command line, by configuration key,
+                 or None for a command line that could not be parsed, and an
+                 `ArgumentsError` for each of those, by its position
+        """
+        if self.get(self._c.noargs):
+            return [{} for _ in argvs], {}
+        results: List[Optional[Dict[str, Any]]] = []
+        errors: Dict[int, ArgumentsError] = {}
+        built: Optional[PARSER] = None
+        canScan = self._canScan()
+        for i, argv in enumerate(argvs):
+            result = None if _VERSION.intersection(argv) else\
+                self._scan(argv, canScan)
+            if result is None:
+                if built is None:
+                    built = self._parser()
+                token = _output.set([])
+                try:
+                    result = self._values(*built, argv)
+                except ArgumentsError as e:
+                    errors[i] = e
+                finally:
+                    _output.reset(token)
+            results.append(result)
+        return results, errors
+
+    @staticmethod
+    def _values(parser: 'ArgumentParser',
+                dests: Mapping[str, str],
+                argv: Sequence[str]) -> Dict[str, Any]:
+        return {dests.get(k, k): v
+                for k, v in vars(parser.parse_args(argv)).items()}
@@ -0,0 +1,65 @@
+"""
+Generate the shell completion files of a program
+
+Writes the JSON completion index, the bash completion script and the zsh
+completion function of a program that parses its command line with
+`lib.parse_arguments.Arguments`, so that completing its options never runs
+the program. See `lib.argCompletion`.
+
+The options of the program are found from the configuration that it builds.
+The program names a function that gives that configuration, or the mapping of
+its entries, in the same ``package.module:function`` form used to name
+configuration loaders::
+
+    python -m scripts.generateCompletion myapp.config:configuration \\
+        --prog myapp --output /usr/share/gvConfig/completion
+
+The bash script is read with ``source`` or installed in
+``/usr/share/bash-completion/completions`` and the zsh function is installed
+in a directory of ``fpath``.
+
+.. only:: development_administrator
+
+    Created on Oct. 17, 2026
+
+    @author: Jonathan Gossage
+"""
+
+from argparse import ArgumentParser
+from importlib import import_module
+from pathlib import Path
+import sys
+from typing import List, Optional
+
+from lib import argCompletion
+
+
+def main(argv: Optional[List[str]]=None) -> int:
+    parser = ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('configuration',
+                        help='The function that gives the configuration of'
+                             ' the program, as package.module:function. The'
+                             ' function defaults to configuration.')
+    parser.add_argument('--prog', required=True,
+                        help='The name the program is run by')
+    parser.add_argument('--output', type=Path, default=Path.cwd(),
+                        help='The directory to write the files to')
+    args = parser.parse_args(argv)
+
+    module, _, attr = args.configuration.partition(':')
+    func = getattr(import_module(module), attr or 'configuration')
+    # The configuration would otherwise parse this script's command line
+    saved, sys.argv = sys.argv, [args.prog]
+    try:
+        cfg = func()
+    finally:
+        sys.argv = saved
+    cfg = getattr(cfg, 'cfg', cfg)  # A Configuration or its entries
+    index = argCompletion.fromConfiguration(cfg, args.prog)
+    for path in argCompletion.write(index, args.output):
+        print(path)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""
+Measure the time taken to parse a command line at startup
+
+Programs run from cron usually give no arguments or only ``-v``, which
+`lib.parse_arguments.Arguments` scans without importing argparse or building
+a parser. This benchmark parses such a command line in fresh interpreters and
+compares it with a command line that needs the parser, the abbreviation
+``--verb`` of ``--verbose``. The time measured includes importing
+`lib.parse_arguments` and whatever it imports after `lib.configuration`.
+
+Run it from the root of the repository::
+
+    python -m tests.benchmarks.argParse [--options N] [--runs N]
+
+.. only:: development_administrator
+
+    Created on Oct. 17, 2026
+
+    @author: Jonathan Gossage
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import List
+
+# Times one parse in a new interpreter. The configuration has `options`
+# entries that can be overridden from the command line.
+_PROGRAM = '''
+import sys
+from time import perf_counter
+import lib.configuration as _c
+cfg = {{f'opt{{i}}': _c.CfgEntry(f'opt{{i}}', i, f'Option {{i}}',
+                               _c.ArgDescriptor(f'opt{{i}}', (f'--opt{{i}}',),
+                                                None, int, None))
+        for i in range({options})}}
+start = perf_counter()
+from lib.parse_arguments import Arguments
+Arguments('1.0', '2026-10-17', cfg).Parse({argv!r})
+print(perf_counter() - start)
+'''
+
+
+def measure(argv: List[str],
+            options: int) -> float:
+    """
+    Parses a command line in a new interpreter.
+
+    :return: The seconds taken
+    """
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)  # Measure with cached byte code
+    result = subprocess.run([sys.executable, '-c',
+                             _PROGRAM.format(argv=argv, options=options)],
+                            capture_output=True, text=True, env=env,
+                            check=True)
+    return float(result.stdout)
+
+
+def main(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--options', type=int, default=200,
+                        help='The number of configuration backed options')
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    measure([], args.options)  # Compile the byte code
+    for label, cmdline in (('scanned', ['-v']), ('argparse', ['--verb'])):
+        times = [measure(cmdline, args.options) for _ in range(args.runs)]
+        print(f'{label:<9} {" ".join(cmdline):<7} median'
+              f' {statistics.median(times) * 1000:.2f}ms,'
+              f' min {min(times) * 1000:.2f}ms over {args.runs} runs')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
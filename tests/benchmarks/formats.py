@@ -0,0 +1,101 @@
+"""
+Compare the export formats of a configuration
+
+Writes synthetic configurations of several sizes in each of the export
+formats of `lib.configuration.Configuration` and reports the size of each file
+and the time taken to write it and to read it back with its loader. The
+configurations resemble real ones: keys are grouped by prefix and the values
+are a mix of integers, floats, booleans, short strings, paths and small lists.
+
+Run it from the root of the repository::
+
+    python -m tests.benchmarks.formats [--sizes 1000 100000 1000000]
+
+.. only:: development_administrator
+
+    Created on Oct. 17, 2026
+
+    @author: Jonathan Gossage
+"""
+
+import argparse
+import json
+from pathlib import Path
+import random
+import sys
+import tempfile
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Tuple
+
+from ControlFiles.loaders import fileEnv, fileJSON, fileMsgpack
+
+# Writes a mapping and reads a file back, for each format
+FORMATS: Dict[str, Tuple[Callable[[Dict[str, Any]], bytes],
+                         Callable[[Path], Any]]] = {
+    'json': (lambda d: json.dumps(d, separators=(',', ':')).encode('utf-8'),
+             lambda p: fileJSON.handler(p.parent, p.name)),
+    'msgpack': (fileMsgpack.dumps,
+                lambda p: fileMsgpack.handler(p.parent, p.name)),
+    'env': (lambda d: fileEnv.dumps(d).encode('utf-8'),
+            lambda p: fileEnv.handler(p.parent, p.name)),
+}
+
+
+def synthetic(size: int,
+              seed: int=0) -> Dict[str, Any]:
+    """Builds a configuration with `size` keys"""
+    rnd = random.Random(seed)
+    values: List[Callable[[int], Any]] = [
+        lambda i: rnd.randrange(-10**6, 10**6),
+        lambda i: rnd.random() * 1000,
+        lambda i: rnd.random() < 0.5,
+        lambda i: f'value-{i}',
+        lambda i: f'/srv/app{i % 97}/data/{i}.db',
+        lambda i: [rnd.randrange(100) for _ in range(3)]]
+    return {f'group{i // 100}.item{i}': values[i % len(values)](i)
+            for i in range(size)}
+
+
+def run(size: int,
+        directory: Path,
+        repeat: int) -> List[Tuple[str, int, float, float]]:
+    """
+    :return: For each format, its name, the file size in bytes and the best
+             times in seconds to write and to read the file
+    """
+    data = synthetic(size)
+    results = []
+    for name, (dump, load) in FORMATS.items():
+        path = directory / f'config{size}.{name}'
+        writes, reads = [], []
+        for _ in range(repeat):
+            start = perf_counter()
+            path.write_bytes(dump(data))
+            writes.append(perf_counter() - start)
+            start = perf_counter()
+            loaded = load(path)
+            reads.append(perf_counter() - start)
+        if loaded != data:
+            raise AssertionError(f'{name} did not read back what it wrote')
+        results.append((name, path.stat().st_size, min(writes), min(reads)))
+    return results
+
+
+def main(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[1000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f'{"keys":>8} {"format":<8} {"bytes":>12} {"write":>10}'
+          f' {"read":>10}')
+    with tempfile.TemporaryDirectory() as d:
+        for size in args.sizes:
+            for name, nbytes, write, read in run(size, Path(d), args.repeat):
+                print(f'{size:>8} {name:<8} {nbytes:>12}'
+                      f' {write * 1000:>8.1f}ms {read * 1000:>8.1f}ms')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,86 @@
+"""
+Measure the time taken to import a module
+
+Every program imports `lib.configuration` when it starts, so its import time
+is paid on every run of every tool. This benchmark imports a module in fresh
+interpreters with ``python -X importtime`` and reports the cumulative time of
+the module, and the modules that take longest, after discarding a first run
+that compiles the byte code.
+
+The benchmark fails, with exit status 1, when the fastest run takes longer
+than the budget. The default budget of 40ms leaves room for slower machines
+above the 15-25ms that the import takes with its heavy dependencies deferred,
+while importing them all again takes 45-70ms. The unit test
+``testDeferredImports`` names those dependencies.
+
+Run it from the root of the repository::
+
+    python -m tests.benchmarks.importTime [module] [--runs N] [--budget MS]
+
+.. only:: development_administrator
+
+    Created on Oct. 17, 2026
+
+    @author: Jonathan Gossage
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+BUDGET_MS = 40.0
+
+
+def measure(module: str) -> Dict[str, Tuple[int, int]]:
+    """
+    Imports a module in a new interpreter.
+
+    :return: The self and cumulative times in microseconds of each module
+             imported, by module name
+    """
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)  # Measure with cached byte code
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                             f'import {module}'],
+                            capture_output=True, text=True, env=env,
+                            check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(own), int(cumulative))
+    return times
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('module', nargs='?', default='lib.configuration')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--top', type=int, default=10,
+                        help='The number of slowest modules shown')
+    parser.add_argument('--budget', type=float, default=BUDGET_MS,
+                        help='The milliseconds the fastest import may take.'
+                             ' 0 disables the check.')
+    args = parser.parse_args(argv)
+
+    measure(args.module)  # Compile the byte code
+    runs = [measure(args.module) for _ in range(args.runs)]
+    total = [r[args.module][1] for r in runs]
+    print(f'{args.module}: median {statistics.median(total) / 1000:.2f}ms,'
+          f' min {min(total) / 1000:.2f}ms over {args.runs} runs')
+    slowest = sorted(runs[-1].items(), key=lambda i: i[1][0], reverse=True)
+    for name, (own, _) in slowest[:args.top]:
+        print(f'  {own / 1000:8.2f}ms {name}')
+    if args.budget and min(total) / 1000 > args.budget:
+        print(f'{args.module}: over the budget of {args.budget:.2f}ms',
+              file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
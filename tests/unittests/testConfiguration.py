@@ -0,0 +1,725 @@
+"""
+Test the configuration module and its supporting modules
+
+.. only:: development_administrator
+
+    Module management
+
+    Created on Oct. 17, 2026
+
+    @author: Jonathan Gossage
+"""
+
+import json
+import os
+from pathlib import Path
+import pickle
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from ControlFiles import loaders as _ld
+from lib.cfgLayers import MISSING, LayeredResolver
+from lib.cfgSchema import FieldSpec, Schema, SchemaError
+from lib.cfgSnapshot import PersistentMap
+import lib.configuration as _c
+
+# The command line of the test runner is not meant for the configurations
+# built by these tests
+_ld.register('testNoArgs', lambda: {_c.noargs: True})
+NOARGS = (_ld.Source('noargs', _c.application_layer, 'testNoArgs'),)
+
+
+class TestLayeredResolver(unittest.TestCase):
+
+    def setUp(self: 'TestLayeredResolver') -> None:
+        self.r = LayeredResolver(('site', 'application', 'user'))
+        self.r.setLayer('site', {'a': 1, 'b': 2, 'c': 3})
+        self.r.setLayer('user', {'a': 10})
+
+    def testLowerLayerOverrides(self: 'TestLayeredResolver'):
+        self.assertEqual(self.r.get('a'), 10)
+        self.assertEqual(self.r.provenance('a'), 'user')
+        self.assertEqual(self.r.get('b'), 2)
+        self.assertEqual(self.r.provenance('b'), 'site')
+        self.assertIsNone(self.r.get('missing'))
+
+    def testOnlyAffectedKeysChange(self: 'TestLayeredResolver'):
+        # 'a' is overridden by the user layer so changing it in the
+        # application layer has no visible effect
+        changed = self.r.setLayer('application', {'a': 5, 'b': 6})
+        self.assertEqual(changed, {'b': 2})
+        self.assertEqual(self.r.get('a'), 10)
+        self.assertEqual(self.r.provenance('b'), 'application')
+
+    def testRemovalRestoresHigherLayer(self: 'TestLayeredResolver'):
+        changed = self.r.removeKeys('user', ('a', 'nothere'))
+        self.assertEqual(changed, {'a': 10})
+        self.assertEqual(self.r.get('a'), 1)
+        self.assertEqual(self.r.provenance('a'), 'site')
+        self.r.setLayer('site', {})
+        self.assertNotIn('a', self.r.flat)
+        self.assertIsNone(self.r.provenance('a'))
+
+    def testAddLayer(self: 'TestLayeredResolver'):
+        self.r.addLayer('host', before='user')
+        self.assertEqual(self.r.layers,
+                         ('site', 'application', 'host', 'user'))
+        self.r.updateLayer('host', {'a': 7, 'c': 8})
+        self.assertEqual(self.r.get('a'), 10)
+        self.assertEqual(self.r.get('c'), 8)
+        with self.assertRaises(ValueError):
+            self.r.addLayer('site')
+
+
+class TestCfgEntry(unittest.TestCase):
+
+    def testCompactRecords(self: 'TestCfgEntry'):
+        ad = _c.ArgDescriptor('verbose', ('-v',), None, int, '?')
+        admin = _c.CfgAdmin('site', overideable=True)
+        e = _c.CfgEntry(_c.verbose, 1, 'Verbosity', ad, admin=admin)
+        for r in (ad, admin, e):
+            self.assertFalse(hasattr(r, '__dict__'))
+        self.assertEqual(e.value, 1)
+        self.assertIs(e.argDes, ad)
+        self.assertEqual(ad.type, int)
+        self.assertTrue(e.admin.overideable)
+        e.value = 2
+        self.assertEqual(e.asDict()['value'], 2)
+        with self.assertRaises(AttributeError):
+            e.other = 3
+
+    def testEquality(self: 'TestCfgEntry'):
+        self.assertEqual(_c.CfgEntry('a', 1), _c.CfgEntry('a', 1))
+        self.assertNotEqual(_c.CfgEntry('a', 1), _c.CfgEntry('a', 2))
+        self.assertIn('value=1', repr(_c.CfgEntry('a', 1)))
+
+    def testLazyValue(self: 'TestCfgEntry'):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return len(calls)
+
+        e = _c.CfgEntry('a', _c.LazyValue(compute))
+        self.assertEqual(calls, [])
+        self.assertEqual((e.value, e.value), (1, 1))
+        expiring = _c.CfgEntry('b', _c.LazyValue(compute, ttl=0))
+        self.assertEqual((expiring.value, expiring.value), (2, 3))
+        self.assertEqual(pickle.loads(pickle.dumps(e)).asDict(), e.asDict())
+        cfg = _c.Configuration(NOARGS)
+        self.assertIsInstance(cfg.get(_c.uid)._value, _c.LazyValue)
+        self.assertEqual(cfg.get(_c.uid).value, os.getuid())
+        self.assertTrue(cfg.get(_c.computer_name).value)
+
+
+class TestConfiguration(unittest.TestCase):
+
+    def setUp(self: 'TestConfiguration') -> None:
+        self._dir = tempfile.TemporaryDirectory()
+        self.path = Path(self._dir.name)
+        for name, data in (('site1.json', {'a': 1, 'b': 1}),
+                           ('site2.json', {'b': 2}),
+                           ('user.json', {'a': 3, _c.verbose: 2})):
+            (self.path / name).write_text(json.dumps(data))
+
+    def tearDown(self: 'TestConfiguration') -> None:
+        self._dir.cleanup()
+
+    def sources(self: 'TestConfiguration'):
+        return (_ld.Source('s1', _c.site_layer, path=self.path,
+                           file='site1.json'),
+                _ld.Source('s2', _c.site_layer, path=self.path,
+                           file='site2.json'),
+                _ld.Source('u', _c.user_layer, path=self.path,
+                           file='user.json')) + NOARGS
+
+    def testLoadSources(self: 'TestConfiguration'):
+        cfg = _c.Configuration(self.sources())
+        self.assertEqual(cfg.get('a').value, 3)
+        self.assertEqual(cfg.provenance('a'), _c.user_layer)
+        self.assertEqual(cfg.get('b').value, 2)
+        self.assertEqual(cfg.get(_c.verbose).value, 2)
+        self.assertEqual(cfg.get(_c.debug).value, False)
+        self.assertEqual(cfg.provenance(_c.debug), _c.defaults_layer)
+
+    def testLoadersRunConcurrently(self: 'TestConfiguration'):
+        barrier = threading.Barrier(2, timeout=5)
+
+        def slow(value):
+            barrier.wait()  # Fails unless both sources are read together
+            return {'k': value}
+
+        _ld.register('testSlow', slow)
+        cfg = _c.Configuration((_ld.Source('x', _c.site_layer, 'testSlow',
+                                           value=1),
+                                _ld.Source('y', _c.site_layer, 'testSlow',
+                                           value=2)) + NOARGS)
+        self.assertEqual(cfg.get('k').value, 2)
+
+    def testSnapshotDecodedOnDemand(self: 'TestConfiguration'):
+        from ControlFiles.loaders import snapshot as _s
+        (self.path / 'big.json').write_text(
+            json.dumps({f'k{i}': [i] for i in range(1000)}))
+        srcs = (_ld.Source('big', _c.site_layer, path=self.path,
+                           file='big.json', snapshot=True),
+                _ld.Source('s2', _c.site_layer, path=self.path,
+                           file='site2.json')) + NOARGS
+        _c.Configuration(srcs)  # Compiles the snapshot
+        with mock.patch.object(_s, '_decode', wraps=_s._decode) as decode:
+            cfg = _c.Configuration(srcs)
+            decode.assert_not_called()
+            self.assertEqual(cfg.provenance('k7'), _c.site_layer)
+            self.assertEqual(cfg.get('b').value, 2)
+            decode.assert_not_called()
+            self.assertEqual(cfg.get('k7').value, [7])
+            self.assertEqual(cfg.get('k7').value, [7])
+            decode.assert_called_once()
+        self.assertEqual(pickle.loads(pickle.dumps(cfg.get('k8'))),
+                         _c.CfgEntry('k8', [8]))
+        # Reading an unchanged snapshot again decodes nothing
+        with mock.patch.object(_s, '_decode', wraps=_s._decode) as decode:
+            self.assertFalse(cfg.reload())
+            decode.assert_not_called()
+        self.assertEqual(cfg.get('k9').value, [9])
+
+    def testModulePathLoader(self: 'TestConfiguration'):
+        src = _ld.Source('p', _c.site_layer,
+                         'ControlFiles.loaders.fileJSON:handler',
+                         path=self.path, file='site2.json')
+        self.assertEqual(_ld.loadSources((src,)), [{'b': 2}])
+        with self.assertRaises(KeyError):
+            _ld.resolve('noSuchLoader')
+
+    def testApplicationIndex(self: 'TestConfiguration'):
+        from ControlFiles.loaders import fileIndex
+        index = self.path / 'index.json'
+        fileIndex.write(index, (self.path / 'site1.json',), {'app': ['a']})
+        cfg = _c.Configuration(_c.applicationSources('app', str(index)) +
+                               NOARGS)
+        self.assertEqual(cfg.get('a').value, 1)
+        self.assertIsNone(cfg.get('b'))
+        self.assertEqual(cfg.sources[0].paths(),
+                         [index, (self.path / 'site1.json').absolute()])
+
+    def testExport(self: 'TestConfiguration'):
+        cfg = _c.Configuration(self.sources())
+        expected = {k: e.value for k, e in cfg.cfg.items()}
+        for fmt, ext, loader in (('json', 'json', 'fileJSON'),
+                                 ('msgpack', 'msgpack', 'fileMsgpack'),
+                                 ('env', 'env', 'fileEnv')):
+            cfg.export(fmt, self.path / f'out.{ext}')
+            src = _ld.Source('out', _c.site_layer, loader, path=self.path,
+                             file=f'out.{ext}')
+            self.assertEqual(src.load(), expected)
+        with self.assertRaises(ValueError):
+            cfg.export('yaml')
+
+    def testCommandLine(self: 'TestConfiguration'):
+        with mock.patch('sys.argv', ['prog', '-vv']):
+            cfg = _c.Configuration(())
+        self.assertEqual(cfg.get(_c.verbose).value, 2)
+        self.assertEqual(cfg.provenance(_c.verbose), _c.cmdline_layer)
+        cfg.parseCommandLine(['-v'])
+        self.assertEqual(cfg.get(_c.verbose).value, 1)
+        cfg.merge({_c.noargs: True})
+        cfg.parseCommandLine(['-vvv'])  # Ignored
+        self.assertEqual(cfg.get(_c.verbose).value, 1)
+
+    def testCommandLineKeepsOptions(self: 'TestConfiguration'):
+        with mock.patch('sys.argv', ['prog']):
+            cfg = _c.Configuration(())
+        ad = _c.ArgDescriptor('workers', ('-w', '--workers'), None, int, None)
+        cfg.merge({'workers': _c.CfgEntry('workers', 4, 'Number of workers',
+                                          ad)}, layer=_c.site_layer)
+        cfg.parseCommandLine(['-w', '8'])
+        cfg.parseCommandLine(['-w', '9'])
+        e = cfg.get('workers')
+        self.assertEqual(e.value, 9)
+        self.assertEqual(cfg.provenance('workers'), _c.cmdline_layer)
+        self.assertEqual(e.description, 'Number of workers')
+        self.assertIs(e.argDes, ad)
+
+    def testRuntimeLayer(self: 'TestConfiguration'):
+        cfg = _c.Configuration(NOARGS)
+        cfg.add({'x': 1})
+        with self.assertRaises(KeyError):
+            cfg.add({'x': 2})
+        cfg.setMember('y', 2)
+        self.assertEqual(cfg.get('y').value, 2)
+        cfg.delete('x')
+        self.assertIsNone(cfg.get('x'))
+
+    def testStreamedSource(self: 'TestConfiguration'):
+        seen = []
+        srcs = (_ld.Source('big', _c.site_layer, 'fileJSONStream',
+                           path=self.path, file='site1.json'),
+                _ld.Source('s2', _c.site_layer, path=self.path,
+                           file='site2.json')) + NOARGS
+        cfg = _c.Configuration(srcs)
+        cfg.subscribe(lambda diff: seen.append(list(diff.keys())))
+        self.assertEqual(cfg.get('a').value, 1)
+        self.assertEqual(cfg.get('b').value, 2)  # The later source wins
+        (self.path / 'site1.json').write_text(json.dumps({'c': 1, 'd': 2}))
+        diff = cfg.reload(('big',))
+        self.assertEqual(seen, [['c'], ['d'], ['a']])  # One call per group
+        self.assertEqual(sorted(diff.keys()), ['a', 'c', 'd'])
+        self.assertIsNone(cfg.get('a'))
+        self.assertEqual(cfg.get('b').value, 2)
+
+    def testTruncatedStream(self: 'TestConfiguration'):
+        seen = []
+        srcs = (_ld.Source('big', _c.site_layer, 'fileJSONStream',
+                           path=self.path, file='site1.json'),) + NOARGS
+        cfg = _c.Configuration(srcs)
+        before = dict(cfg.cfg)
+        cfg.subscribe(lambda diff: seen.append(diff))
+        text = json.dumps({'a': 10, 'b': 20, 'c': 3})
+        (self.path / 'site1.json').write_text(text[:-8])
+        with self.assertRaises(ValueError):
+            cfg.reload(('big',))
+        self.assertEqual(cfg.cfg, before)
+        self.assertEqual(cfg.snapshot()['a'].value, 1)
+        # The groups merged before the error are undone
+        self.assertEqual([sorted(d.keys()) for d in seen],
+                         [['a'], ['b'], ['a', 'b']])
+        self.assertEqual(seen[-1].changed['a'][1].value, 1)
+        (self.path / 'site1.json').write_text(text)
+        self.assertEqual(sorted(cfg.reload(('big',)).keys()), ['a', 'b', 'c'])
+
+    def testLoadReport(self: 'TestConfiguration'):
+        srcs = self.sources() + (_ld.Source('big', _c.user_layer,
+                                            'fileJSONStream', path=self.path,
+                                            file='site1.json'),)
+        cfg = _c.Configuration(srcs)
+        report = cfg.loadReport
+        self.assertEqual([p.source for p in report.sources],
+                         ['s1', 's2', 'u', 'noargs', 'big'])
+        s1 = report.source('s1')
+        self.assertEqual(s1.entries, 2)
+        self.assertEqual(s1.bytes, (self.path / 'site1.json').stat().st_size)
+        self.assertLessEqual({'open', 'read', 'parse'}, s1.times.keys())
+        self.assertIn('merge', report.source('big').times)
+        self.assertEqual(report.source('big').entries, 2)
+        self.assertIn(_c.site_layer, report.merge)
+        self.assertEqual(report.asDict()['sources'][2]['entries'], 2)
+        cfg.merge({_c.profile: True})
+        with self.assertLogs('lib.cfgProfile') as logs:
+            cfg.reload(('s2',))
+        self.assertIn('s2', logs.output[0])
+
+
+class TestAsyncLoad(unittest.TestCase):
+
+    def setUp(self: 'TestAsyncLoad') -> None:
+        self.delay = 0
+        self.release = threading.Event()
+
+        def slow(value):
+            if self.delay:
+                self.release.wait(self.delay)
+            return {'k': value}
+
+        _ld.register('testAsync', slow)
+        self.sources = (_ld.Source('fast', _c.site_layer, 'testAsync',
+                                   value=1),
+                        _ld.Source('slow', _c.user_layer, 'testAsync',
+                                   value=2)) + NOARGS
+
+    def tearDown(self: 'TestAsyncLoad') -> None:
+        self.release.set()
+
+    def testLoad(self: 'TestAsyncLoad'):
+        import asyncio
+        cfg = asyncio.run(_c.Configuration.aload(self.sources, timeout=5))
+        self.assertEqual(cfg.get('k').value, 2)
+        self.assertEqual(cfg.provenance('k'), _c.user_layer)
+
+    def testTimeoutFallback(self: 'TestAsyncLoad'):
+        import asyncio
+        cfg = asyncio.run(_c.Configuration.aload(self.sources,
+                                                 fallback=True))
+        self.delay = 0.5
+        with self.assertRaises(TimeoutError):
+            asyncio.run(cfg.areload(timeout=0.05))
+        with self.assertLogs('lib.configuration', 'WARNING'):
+            asyncio.run(cfg.areload(timeout=0.05, fallback=True))
+        self.assertEqual(cfg.get('k').value, 2)
+        # The data kept by one configuration is not used by another
+        with self.assertRaises(TimeoutError):
+            asyncio.run(_c.Configuration.aload(self.sources, timeout=0.05,
+                                               fallback=True))
+
+
+class TestBulkOperations(unittest.TestCase):
+
+    def setUp(self: 'TestBulkOperations') -> None:
+        self.cfg = _c.Configuration(NOARGS)
+        self.cfg.setLayer(_c.site_layer,
+                          {'locked': _c.CfgEntry('locked', 1,
+                                                 admin=_c.CfgAdmin('site')),
+                           'open': _c.CfgEntry('open', 1, 'Described',
+                                               admin=_c.CfgAdmin(
+                                                   overideable=True))})
+        self.diffs = []
+        self.cfg.subscribe(self.diffs.append)
+
+    def testMergePolicies(self: 'TestBulkOperations'):
+        self.cfg.merge({'open': 2, 'new': 3})
+        self.assertEqual(self.cfg.get('open').value, 2)
+        self.assertEqual(len(self.diffs), 1)
+        self.cfg.merge({'open': 5, 'other': 4}, policy=_c.merge_keep)
+        self.assertEqual(self.cfg.get('open').value, 2)
+        self.assertEqual(self.cfg.get('other').value, 4)
+        with self.assertRaises(KeyError):
+            self.cfg.merge({'new': 1, 'fresh': 1}, policy=_c.merge_error)
+        self.assertIsNone(self.cfg.get('fresh'))
+
+    def testOverrideChecks(self: 'TestBulkOperations'):
+        with self.assertRaises(ValueError) as cm:
+            self.cfg.merge({'locked': 2, 'open': 2, 'new': 1})
+        self.assertIn('locked', str(cm.exception))
+        # Nothing from a rejected batch is applied
+        self.assertIsNone(self.cfg.get('new'))
+        self.assertEqual(self.cfg.get('open').value, 1)
+        self.cfg.merge({'locked': 2}, owner='site')
+        self.assertEqual(self.cfg.get('locked').value, 2)
+
+    def testUpdateMany(self: 'TestBulkOperations'):
+        diff = self.cfg.updateMany({'open': 7})
+        self.assertEqual(self.cfg.get('open').description, 'Described')
+        self.assertEqual(diff.changed['open'][1].value, 7)
+        self.assertEqual(self.cfg.provenance('open'), _c.runtime_layer)
+        with self.assertRaises(KeyError):
+            self.cfg.updateMany({'open': 8, 'absent': 1})
+        with self.assertRaises(ValueError):
+            self.cfg.updateMany({'locked': 8})
+
+
+class TestSchema(unittest.TestCase):
+
+    def setUp(self: 'TestSchema') -> None:
+        self.schema = Schema({_c.verbose: FieldSpec(int, minimum=0, maximum=3),
+                              'mode': FieldSpec(str, choices=('a', 'b')),
+                              'paths': FieldSpec(str, nargs='+'),
+                              'ratio': FieldSpec(float)})
+
+    def testValidate(self: 'TestSchema'):
+        self.assertEqual(self.schema.validate({_c.verbose: 2, 'mode': 'a',
+                                               'paths': ['x'], 'ratio': 1,
+                                               'other': object()}),
+                         [])
+        errors = self.schema.validate({_c.verbose: 5, 'mode': 'c',
+                                       'paths': [], 'ratio': True},
+                                      'site')
+        self.assertEqual(len(errors), 4)
+        self.assertTrue(all(e.startswith('site: ') for e in errors))
+        self.assertEqual(self.schema.validate({_c.verbose: '1'}),
+                         [f"{_c.verbose}: '1' expected int"])
+
+    def testFromEntries(self: 'TestSchema'):
+        ad = _c.ArgDescriptor('names', ('-n',), None, str, 2)
+        schema = Schema.fromEntries({'names': _c.CfgEntry('names', None,
+                                                          ad=ad),
+                                     'plain': _c.CfgEntry('plain', 1)})
+        self.assertEqual(schema.validate({'names': ['a', 'b'], 'plain': 'x'}),
+                         [])
+        self.assertEqual(len(schema.validate({'names': ['a']})), 1)
+
+    def testLoadReportsAllErrors(self: 'TestSchema'):
+        with tempfile.TemporaryDirectory() as d:
+            (Path(d) / 'a.json').write_text(json.dumps({_c.verbose: 9}))
+            (Path(d) / 'b.json').write_text(json.dumps({'mode': 'z'}))
+            with self.assertRaises(SchemaError) as cm:
+                _c.Configuration((_ld.Source('a', _c.site_layer, path=d,
+                                             file='a.json'),
+                                  _ld.Source('b', _c.user_layer, path=d,
+                                             file='b.json')),
+                                 schema=self.schema)
+        self.assertEqual(len(cm.exception.errors), 2)
+        cfg = _c.Configuration(NOARGS, schema=self.schema)
+        with self.assertRaises(SchemaError):
+            cfg.merge({'mode': 'z', 'new': 1})
+        self.assertIsNone(cfg.get('new'))
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def testPersistentMap(self: 'TestSnapshot'):
+        class Colliding(str):
+            def __hash__(self):
+                return 42
+
+        ref = {f'k{i}': i for i in range(500)}
+        ref.update({Colliding(f'c{i}'): i for i in range(5)})
+        m = PersistentMap(ref)
+        self.assertEqual(dict(m.items()), ref)
+        m2 = m.evolve({'k1': MISSING, Colliding('c1'): MISSING, 'new': 1})
+        self.assertEqual(len(m), len(ref))
+        self.assertEqual(len(m2), len(ref) - 1)
+        self.assertNotIn('k1', m2)
+        self.assertNotIn(Colliding('c1'), m2)
+        self.assertEqual(m2[Colliding('c2')], 2)
+        self.assertEqual(m['k1'], 1)
+        self.assertEqual(m2.version, m.version + 1)
+        with self.assertRaises(KeyError):
+            m2.delete('k1')
+
+    def testDeleteToEmpty(self: 'TestSnapshot'):
+        m = PersistentMap({1: 'a'}).delete(1)
+        self.assertEqual(len(m), 0)
+        m = m.set(33, 'b')  # Same hash fragment at the root as 1
+        self.assertEqual(dict(m.items()), {33: 'b'})
+        m = PersistentMap({1: 'a', 33: 'b'}).delete(1).delete(33)
+        self.assertEqual(dict(m.set(1, 'c').items()), {1: 'c'})
+
+    def testConfigurationSnapshot(self: 'TestSnapshot'):
+        cfg = _c.Configuration(NOARGS)
+        cfg.add({'a': 1})
+        first = cfg.snapshot()
+        self.assertIs(cfg.snapshot(), first)
+        cfg.merge({'a': 2, 'b': 3})
+        second = cfg.snapshot()
+        self.assertEqual(first['a'].value, 1)
+        self.assertNotIn('b', first)
+        self.assertEqual(second['a'].value, 2)
+        self.assertEqual(second['b'].value, 3)
+        cfg.delete('b')
+        self.assertNotIn('b', cfg.snapshot())
+        self.assertEqual(dict(cfg.snapshot().items()), cfg.cfg)
+
+
+class TestShared(unittest.TestCase):
+
+    def testWorkerAttaches(self: 'TestShared'):
+        supervisor = _c.Configuration(NOARGS)
+        supervisor.merge({'a': 1, 'b': [1, 2], _c.verbose: 3,
+                          _c.debug: True})
+        with supervisor.publishShared() as segment:
+            # The second worker checks that the segment outlives the first
+            for _ in range(2):
+                worker = subprocess.run(
+                    (sys.executable, '-c',
+                     'import lib.configuration as c\n'
+                     f'cfg = c.Configuration(shared={segment.name!r})\n'
+                     'values = cfg.cfg["a"]._source\n'
+                     'print(sorted(values._decoded), len(values) > 2)\n'
+                     'cfg.add({"c": 3})\n'
+                     'print(cfg.get("a").value, cfg.get("b").value,'
+                     ' cfg.get(c.verbose).value, cfg.get(c.debug).value,'
+                     ' cfg.provenance(c.verbose), cfg.provenance("a"),'
+                     ' cfg.provenance("c"), "c" in cfg.cfg)'),
+                    cwd=Path(__file__).parents[2], capture_output=True,
+                    text=True, check=True)
+                # Only the entries read while it was built were decoded
+                self.assertEqual(worker.stdout.split(),
+                                 ["['noargs',", "'profile']", 'True',
+                                  '1', '[1,', '2]', '3', 'True',
+                                  _c.shared_layer, _c.shared_layer,
+                                  _c.runtime_layer, 'True'])
+                self.assertEqual(worker.stderr, '')
+
+    def testPoolWorkers(self: 'TestShared'):
+        # The workers of a pool share the resource tracker of the supervisor,
+        # which must still know the segment when the supervisor removes it
+        script = ('import multiprocessing\n'
+                  'import lib.configuration as c\n'
+                  'def work(name):\n'
+                  '    return c.Configuration(shared=name).get("a").value\n'
+                  'if __name__ == "__main__":\n'
+                  '    supervisor = c.Configuration(())\n'
+                  '    supervisor.merge({"a": 1})\n'
+                  '    for method in ("spawn", "fork"):\n'
+                  '        with supervisor.publishShared() as segment, \\\n'
+                  '             multiprocessing.get_context(method).Pool(2)'
+                  ' as pool:\n'
+                  '            print(pool.map(work, [segment.name] * 4))\n')
+        with tempfile.TemporaryDirectory() as d:
+            path = Path(d) / 'supervisor.py'
+            path.write_text(script)
+            root = Path(__file__).parents[2]
+            env = dict(os.environ, PYTHONPATH=str(root))
+            out = subprocess.run((sys.executable, str(path)), cwd=root,
+                                 env=env, capture_output=True, text=True,
+                                 check=True, timeout=60)
+        self.assertEqual(out.stdout.split('\n'),
+                         ['[1, 1, 1, 1]', '[1, 1, 1, 1]', ''])
+        self.assertEqual(out.stderr, '')
+
+
+class TestAccessor(unittest.TestCase):
+
+    def testCachedUntilChanged(self: 'TestAccessor'):
+        cfg = _c.Configuration(NOARGS)
+        cfg.merge({'port': '80', 'other': 1})
+        calls = []
+
+        def convert(v):
+            calls.append(v)
+            return int(v)
+
+        port = cfg.accessor('port', convert)
+        missing = cfg.accessor('absent', int, default=7)
+        self.assertEqual((port(), port.value), (80, 80))
+        self.assertEqual(calls, ['80'])
+        cfg.merge({'other': 2})  # Another key does not invalidate
+        self.assertEqual(port(), 80)
+        self.assertEqual(len(calls), 1)
+        cfg.merge({'port': '8080'})
+        self.assertEqual(port(), 8080)
+        self.assertEqual(missing(), 7)
+        cfg.merge({'absent': '3'})
+        self.assertEqual(missing(), 3)
+        cfg.delete('absent')
+        self.assertEqual(missing(), 7)
+
+    def testLazyValueExpires(self: 'TestAccessor'):
+        cfg = _c.Configuration(NOARGS)
+        values = iter(range(10))
+        cfg.merge({'kept': _c.LazyValue(lambda: next(values)),
+                   'expiring': _c.LazyValue(lambda: next(values), ttl=0)})
+        kept = cfg.accessor('kept')
+        expiring = cfg.accessor('expiring', str)
+        self.assertEqual((kept(), kept()), (0, 0))
+        self.assertEqual((expiring(), expiring()), ('1', '2'))
+
+
+class TestStartup(unittest.TestCase):
+
+    def testDeferredImports(self: 'TestStartup'):
+        # Modules only needed by some features must not be imported with the
+        # configuration. See tests/benchmarks/importTime.py.
+        heavy = ('argparse', 'asyncio', 'concurrent.futures', 'json',
+                 'lib.cfgAccessor', 'lib.cfgEvents', 'lib.cfgProfile',
+                 'lib.cfgSchema', 'lib.cfgShared', 'lib.cfgSnapshot',
+                 'lib.cfgWatch', 'lib.parse_arguments', 'logging',
+                 'multiprocessing', 'pathlib', 'socket')
+        out = subprocess.run(
+            [sys.executable, '-c',
+             'import sys\n'
+             'import lib.configuration\n'
+             f'print([m for m in {heavy!r} if m in sys.modules])'],
+            capture_output=True, text=True, check=True,
+            cwd=Path(__file__).parents[2])
+        self.assertEqual(out.stdout.strip(), '[]')
+
+
+class TestSubscriptions(unittest.TestCase):
+
+    def setUp(self: 'TestSubscriptions') -> None:
+        self.cfg = _c.Configuration(NOARGS)
+        self.calls = {}
+
+        def recorder(name):
+            def record(diff):
+                self.calls.setdefault(name, []).append(diff)
+            return record
+
+        self.cfg.subscribe(recorder('verbose'), (_c.verbose,))
+        self.cfg.subscribe(recorder('log'), ('log.*',))
+        self.cfg.subscribe(recorder('all'))
+
+    def testKeysAndPrefixes(self: 'TestSubscriptions'):
+        self.cfg.add({'log.level': 1, 'other': 2})
+        self.assertNotIn('verbose', self.calls)
+        self.assertEqual(list(self.calls['log'][0].added), ['log.level'])
+        self.assertEqual(set(self.calls['all'][0].added),
+                         {'log.level', 'other'})
+        self.cfg.setLayer(_c.user_layer, {_c.verbose: 3})
+        self.assertEqual(len(self.calls['verbose']), 1)
+        self.assertEqual(len(self.calls['log']), 1)
+
+    def testBatch(self: 'TestSubscriptions'):
+        with self.cfg.batch():
+            self.cfg.add({'log.a': 1})
+            self.cfg.add({'log.b': 2})
+            self.cfg.setMember('x', 1)
+            self.cfg.delete('x')
+            self.assertEqual(self.calls, {})
+        self.assertEqual(len(self.calls['log']), 1)
+        self.assertEqual(set(self.calls['log'][0].added), {'log.a', 'log.b'})
+        self.assertEqual(set(self.calls['all'][0].keys()), {'log.a', 'log.b'})
+
+    def testUnsubscribe(self: 'TestSubscriptions'):
+        sub = self.cfg.subscribe(lambda d: self.fail('unsubscribed'),
+                                 ('z*',))
+        self.cfg.unsubscribe(sub)
+        self.cfg.add({'zz': 1})
+
+    def testSubscribeDuringDispatch(self: 'TestSubscriptions'):
+        late = []
+
+        def subscriber(diff):
+            self.cfg.unsubscribe(first)
+            self.cfg.subscribe(late.append, ('log.*',))
+
+        first = self.cfg.subscribe(subscriber, ('log.*',))
+        self.cfg.add({'log.a': 1})
+        self.assertEqual(late, [])  # Not matched by the running dispatch
+        self.cfg.add({'log.b': 1})
+        self.assertEqual([list(d.added) for d in late], [['log.b']])
+
+
+class TestWatch(unittest.TestCase):
+
+    def setUp(self: 'TestWatch') -> None:
+        self._dir = tempfile.TemporaryDirectory()
+        self.path = Path(self._dir.name)
+        (self.path / 'site.json').write_text(json.dumps({'a': 1, 'b': 1}))
+        (self.path / 'user.json').write_text(json.dumps({'c': 1}))
+        self.cfg = _c.Configuration(
+            (_ld.Source('site', _c.site_layer, path=self.path,
+                        file='site.json'),
+             _ld.Source('user', _c.user_layer, path=self.path,
+                        file='user.json')) + NOARGS)
+        self.diffs = []
+        self.received = threading.Event()
+
+        def collect(diff):
+            self.diffs.append(diff)
+            self.received.set()
+
+        self.cfg.subscribe(collect)
+
+    def tearDown(self: 'TestWatch') -> None:
+        self.cfg.unwatch()
+        self._dir.cleanup()
+
+    def testReloadDiff(self: 'TestWatch'):
+        (self.path / 'site.json').write_text(json.dumps({'a': 2, 'd': 1}))
+        diff = self.cfg.reload(('site',))
+        self.assertEqual(list(diff.added), ['d'])
+        self.assertEqual(list(diff.removed), ['b'])
+        self.assertEqual(diff.changed['a'][1].value, 2)
+        self.assertEqual(len(self.diffs), 1)
+        self.assertEqual(set(self.diffs[0].keys()), {'a', 'b', 'd'})
+        self.assertFalse(self.cfg.reload())  # Nothing changed
+
+    def checkWatch(self: 'TestWatch',
+                   polling: bool):
+        watcher = self.cfg.watch(interval=0.05, polling=polling)
+        if not polling and not watcher.usingInotify:
+            self.skipTest('inotify is not available')
+        time.sleep(0.1)
+        (self.path / 'user.json').write_text(json.dumps({'c': 2}))
+        if polling:  # Make sure the change is visible to the poller
+            st = (self.path / 'user.json').stat()
+            os.utime(self.path / 'user.json',
+                     ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        self.assertTrue(self.received.wait(5))
+        self.assertEqual(list(self.diffs[0].changed), ['c'])
+        self.assertEqual(self.cfg.get('c').value, 2)
+
+    def testWatchInotify(self: 'TestWatch'):
+        self.checkWatch(False)
+
+    def testWatchPolling(self: 'TestWatch'):
+        self.checkWatch(True)
+
+
+if __name__ == '__main__':
+    unittest.main()
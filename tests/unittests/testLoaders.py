@@ -0,0 +1,330 @@
+"""
+Test the configuration loaders in ControlFiles.loaders
+
+.. only:: development_administrator
+
+    Module management
+
+    Created on Oct. 17, 2026
+
+    @author: Jonathan Gossage
+"""
+
+import http.client
+import json
+import os
+from pathlib import Path
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from ControlFiles.loaders import (fileEnv, fileIndex, fileJSON, fileMsgpack,
+                                  httpJSON)
+from ControlFiles.loaders.cache import ParseCache
+from ControlFiles.loaders import snapshot as _s
+from ControlFiles.runners.configServer import ConfigServer
+
+
+class TestFileJSON(unittest.TestCase):
+
+    def setUp(self: 'TestFileJSON') -> None:
+        self._dir = tempfile.TemporaryDirectory()
+        self.path = Path(self._dir.name)
+        self.data = {'user': {'name': 'gv'}, 'verbose': 2, 'é': [1, 2]}
+        (self.path / 'pre.json').write_text(json.dumps(self.data))
+
+    def tearDown(self: 'TestFileJSON') -> None:
+        self._dir.cleanup()
+
+    def testPlainLoad(self: 'TestFileJSON'):
+        self.assertEqual(fileJSON.handler(self.path, 'pre.json'), self.data)
+        self.assertEqual(fileJSON.handler(self.path, 'missing.json'), {})
+
+    def testSnapshot(self: 'TestFileJSON'):
+        first = fileJSON.handler(self.path, 'pre.json', snapshot=True)
+        self.assertEqual(first, self.data)
+        snap = _s.snapshotPath(self.path / 'pre.json')
+        self.assertEqual(snap.stat().st_mode & 0o777, 0o644)
+        second = fileJSON.handler(self.path, 'pre.json', snapshot=True,
+                                  verify=True)
+        self.assertIsInstance(second, _s.Snapshot)
+        self.assertEqual(second['verbose'], 2)
+        self.assertEqual(second['é'], [1, 2])
+        self.assertNotIn('absent', second)
+        self.assertEqual(dict(second), self.data)
+
+    def testOnlyJSONSnapshotsRead(self: 'TestFileJSON'):
+        import pickle
+        source = self.path / 'pre.json'
+        st = source.stat()
+        image = _s.build({'verbose': 9}, st.st_size, st.st_mtime_ns,
+                         _s.digest(source.read_bytes()), _s.CODEC_PICKLE,
+                         pickle.dumps)
+        _s.snapshotPath(source).write_bytes(image)
+        self.assertIsNone(_s.load(source))
+        self.assertEqual(fileJSON.handler(self.path, 'pre.json',
+                                          snapshot=True), self.data)
+        with self.assertRaises(ValueError):
+            _s.Snapshot(image)
+        self.assertEqual(_s.Snapshot(image, decode=pickle.loads)['verbose'],
+                         9)
+
+    def testStaleSnapshotIgnored(self: 'TestFileJSON'):
+        source = self.path / 'pre.json'
+        fileJSON.handler(self.path, 'pre.json', snapshot=True)
+        source.write_text(json.dumps({'verbose': 3}))
+        st = source.stat()
+        os.utime(source, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        self.assertIsNone(_s.load(source))
+        self.assertEqual(fileJSON.handler(self.path, 'pre.json',
+                                          snapshot=True),
+                         {'verbose': 3})
+        self.assertEqual(dict(_s.load(source)), {'verbose': 3})
+
+    def testStream(self: 'TestFileJSON'):
+        data = {'n%d' % i: {'v': [i, 1.5e3, None, True, '}"']}
+                for i in range(50)}
+        (self.path / 'big.json').write_text(json.dumps(data, indent=1))
+        for size in (1, 7, 1 << 16):
+            self.assertEqual(list(fileJSON.streamHandler(self.path, 'big.json',
+                                                         chunkSize=size)),
+                             list(data.items()))
+        self.assertEqual(list(fileJSON.streamHandler(self.path, 'none')), [])
+        (self.path / 'bad.json').write_text('{"a": 1, "b": 2,}')
+        groups = fileJSON.streamHandler(self.path, 'bad.json', chunkSize=2)
+        self.assertEqual(next(groups), ('a', 1))
+        self.assertEqual(next(groups), ('b', 2))
+        with self.assertRaises(json.JSONDecodeError):
+            next(groups)
+
+
+class TestParseCache(unittest.TestCase):
+
+    def setUp(self: 'TestParseCache') -> None:
+        self._dir = tempfile.TemporaryDirectory()
+        self.path = Path(self._dir.name)
+        self.cache = ParseCache(self.path / 'cache', maxBytes=1000)
+        self.parsed = []
+
+    def tearDown(self: 'TestParseCache') -> None:
+        self._dir.cleanup()
+
+    def parse(self: 'TestParseCache',
+              raw: bytes):
+        self.parsed.append(raw)
+        return json.loads(raw)
+
+    def testReuse(self: 'TestParseCache'):
+        source = self.path / 'a.json'
+        source.write_text(json.dumps({'a': 1}))
+        self.assertEqual(self.cache.load(source, self.parse), {'a': 1})
+        self.assertEqual(self.cache.load(source, self.parse), {'a': 1})
+        self.assertEqual(len(self.parsed), 1)
+        # A verified entry that is still current is not written again
+        with mock.patch.object(self.cache, '_store') as store:
+            self.assertEqual(self.cache.load(source, self.parse,
+                                             verify=True), {'a': 1})
+        store.assert_not_called()
+        # Touching the file does not change the content hash
+        st = source.stat()
+        os.utime(source, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        self.assertEqual(self.cache.load(source, self.parse), {'a': 1})
+        self.assertEqual(len(self.parsed), 1)
+        source.write_text(json.dumps({'a': 2}))
+        os.utime(source, ns=(st.st_atime_ns, st.st_mtime_ns + 2 * 10**9))
+        self.assertEqual(self.cache.load(source, self.parse), {'a': 2})
+        self.assertEqual(len(self.parsed), 2)
+        self.assertEqual(fileJSON.handler(self.path, 'a.json',
+                                          cache=self.cache),
+                         {'a': 2})
+        self.assertEqual(len(self.parsed), 2)
+
+    def testEviction(self: 'TestParseCache'):
+        sources = []
+        for i in range(4):
+            sources.append(self.path / f'{i}.json')
+            sources[-1].write_text(json.dumps({'v': 'x' * 300}))
+            self.cache.load(sources[-1], self.parse)
+            time.sleep(0.01)  # Distinct modification times
+        self.assertFalse(self.cache.entryPath(sources[0]).exists())
+        self.assertTrue(self.cache.entryPath(sources[3]).exists())
+        total = sum(p.stat().st_size
+                    for p in self.cache.directory.iterdir())
+        self.assertLessEqual(total, 1000)
+
+
+class TestFileIndex(unittest.TestCase):
+
+    def setUp(self: 'TestFileIndex') -> None:
+        self._dir = tempfile.TemporaryDirectory()
+        self.path = Path(self._dir.name)
+        self.site = self.path / 'site.json'
+        self.site.write_text(json.dumps({'web.port': 80, 'web.host': 'hé',
+                                         'db.url': 'x', 'shared': [1, 2]},
+                                        ensure_ascii=False, indent=2),
+                             encoding='utf-8')
+        self.local = self.path / 'local.json'
+        self.local.write_text(json.dumps({'web.port': 8080}))
+        self.index = self.path / 'index.json'
+        fileIndex.write(self.index, (self.site, self.local),
+                        {'web': ['web.', 'shared'], 'db': ['db.']})
+
+    def tearDown(self: 'TestFileIndex') -> None:
+        self._dir.cleanup()
+
+    def testSelectByApplication(self: 'TestFileIndex'):
+        self.assertEqual(fileIndex.handler(self.index, 'web'),
+                         {'web.port': 8080, 'web.host': 'hé',
+                          'shared': [1, 2]})
+        self.assertEqual(fileIndex.handler(self.index, 'db'), {'db.url': 'x'})
+        self.assertEqual(fileIndex.handler(self.index, 'other'), {})
+        self.assertEqual(len(fileIndex.handler(self.index)), 4)
+        self.assertEqual(fileIndex.handler(self.path / 'none'), {})
+
+    def testReadableByAll(self: 'TestFileIndex'):
+        self.assertEqual(self.index.stat().st_mode & 0o777, 0o644)
+
+    def testStaleFile(self: 'TestFileIndex'):
+        self.site.write_text(json.dumps({'web.host': 'new', 'db.url': 'y'}))
+        self.assertEqual(fileIndex.handler(self.index, 'web'),
+                         {'web.port': 8080, 'web.host': 'new'})
+
+    def testStaleLaterFile(self: 'TestFileIndex'):
+        # A selected key added to a file that supplied none, and a key removed
+        # from the file it was indexed in last
+        self.local.write_text(json.dumps({'db.pool': 5}))
+        self.assertEqual(fileIndex.handler(self.index, 'db'),
+                         {'db.url': 'x', 'db.pool': 5})
+        self.assertEqual(fileIndex.handler(self.index, 'web'),
+                         {'web.port': 80, 'web.host': 'hé',
+                          'shared': [1, 2]})
+        self.assertEqual(fileIndex.files(self.index),
+                         [self.site.absolute(), self.local.absolute()])
+
+
+class TestFormats(unittest.TestCase):
+
+    data = {'int': 1, 'big': 2**40, 'neg': -2**40, 'small': -5,
+            'float': 1.5, 'bool': True, 'none': None, 'str': 'Text é',
+            'numeric': '123', 'spaced': ' x ', 'lines': 'a\nb',
+            'word': 'nothing', 'list': [1, 'two', [3]],
+            'map': {'a': {'b': None}}, 'long': 'x' * 70000,
+            'many': list(range(70000))}
+
+    def testMsgpack(self: 'TestFormats'):
+        raw = fileMsgpack.dumps(self.data)
+        self.assertEqual(fileMsgpack.loads(raw), self.data)
+        self.assertEqual(fileMsgpack.dumps(127), b'\x7f')
+        self.assertEqual(fileMsgpack.dumps(-1), b'\xff')
+        self.assertEqual(fileMsgpack.dumps({'a': 'b'}), b'\x81\xa1a\xa1b')
+        for bad in (raw[:-1], raw + b'\x00', b'\xc1'):
+            with self.assertRaises(ValueError):
+                fileMsgpack.loads(bad)
+
+    def testEnv(self: 'TestFormats'):
+        text = fileEnv.dumps(self.data)
+        self.assertIn('word="nothing"\n', text)
+        self.assertIn('str=Text é\n', text)
+        self.assertEqual(fileEnv.loads(text), self.data)
+        self.assertEqual(fileEnv.loads('# comment\n\n a = -x \nb=none\n'),
+                         {'a': '-x', 'b': 'none'})
+        with self.assertRaises(ValueError):
+            fileEnv.loads('no assignment')
+        with self.assertRaises(ValueError):
+            fileEnv.dumps({'a=b': 1})
+
+
+class TestHTTPJSON(unittest.TestCase):
+
+    def setUp(self: 'TestHTTPJSON') -> None:
+        self._dir = tempfile.TemporaryDirectory()
+        self.cache = Path(self._dir.name)
+        self.server = ConfigServer().start()
+        self.data = {f'group.k{i}': i for i in range(100)}
+        self.server.publish('site', self.data)
+        self.url = self.server.url('site')
+
+    def tearDown(self: 'TestHTTPJSON') -> None:
+        httpJSON.closeConnections()
+        self.server.stop()
+        self._dir.cleanup()
+
+    def load(self: 'TestHTTPJSON'):
+        return httpJSON.handler(self.url, timeout=5, cache=self.cache)
+
+    def testConditionalAndDelta(self: 'TestHTTPJSON'):
+        self.assertEqual(self.load(), self.data)
+        full = self.server.stats['bytes']
+        self.assertEqual(self.load(), self.data)
+        self.assertEqual(self.server.stats['bytes'], full)  # Not modified
+        self.server.update('site', {'group.k1': 'one', 'new': [1]},
+                           ['group.k2'])
+        self.server.update('site', {'group.k2': 2}, ['new'])
+        expected = dict(self.data, **{'group.k1': 'one'})
+        self.assertEqual(self.load(), expected)
+        self.assertLess(self.server.stats['bytes'] - full, 100)
+        self.server.publish('site', {'replaced': True})  # No delta known
+        self.assertEqual(self.load(), {'replaced': True})
+        self.assertEqual(self.server.stats['requests'], 4)
+        self.assertEqual(self.server.stats['connections'], 1)
+
+    def testCacheSurvivesRestart(self: 'TestHTTPJSON'):
+        self.load()
+        httpJSON._documents.clear()  # As in a new process
+        httpJSON.closeConnections()
+        bytesSent = self.server.stats['bytes']
+        self.assertEqual(self.load(), self.data)
+        self.assertEqual(self.server.stats['bytes'], bytesSent)
+        self.server.stop()
+        httpJSON.closeConnections()
+        with self.assertLogs(httpJSON.__name__, 'WARNING'):
+            self.assertEqual(self.load(), self.data)
+        with self.assertRaises(OSError):
+            httpJSON.handler(self.url, timeout=5, cache=self.cache,
+                             offline=False)
+
+    def testFallbackOnBrokenAnswer(self: 'TestHTTPJSON'):
+        self.load()
+        with mock.patch.object(httpJSON, '_request',
+                               side_effect=http.client.IncompleteRead(b'')), \
+             self.assertLogs(httpJSON.__name__, 'WARNING'):
+            self.assertEqual(self.load(), self.data)
+
+    def testFallbackWhenBusy(self: 'TestHTTPJSON'):
+        self.load()
+        self.server.busy = 503
+        with self.assertLogs(httpJSON.__name__, 'WARNING'):
+            self.assertEqual(self.load(), self.data)
+        with self.assertRaises(httpJSON.StoreUnavailable):
+            httpJSON.handler(self.url, timeout=5, cache=self.cache,
+                             offline=False)
+        self.server.busy = None
+        self.assertEqual(self.load(), self.data)
+
+    def testResultIsCopy(self: 'TestHTTPJSON'):
+        self.server.publish('site', {'list': [1], 'map': {'a': 1}})
+        for _ in range(2):  # Fetched, then not modified
+            data = self.load()
+            data['list'].append(2)
+            data['map']['a'] = 2
+            data['new'] = 3
+        self.assertEqual(self.load(), {'list': [1], 'map': {'a': 1}})
+
+    def testDocumentsBounded(self: 'TestHTTPJSON'):
+        self.server.publish('other', {'a': 1})
+        with mock.patch.object(httpJSON, 'MAX_DOCUMENTS', 1):
+            self.load()
+            self.assertEqual(httpJSON.handler(self.server.url('other'),
+                                              timeout=5, cache=self.cache),
+                             {'a': 1})
+            self.assertEqual(len(httpJSON._documents), 1)
+            # The forgotten document is read back from disk
+            bytesSent = self.server.stats['bytes']
+            self.assertEqual(self.load(), self.data)
+            self.assertEqual(self.server.stats['bytes'], bytesSent)
+            self.assertEqual(len(httpJSON._documents), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
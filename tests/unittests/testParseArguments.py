@@ -0,0 +1,243 @@
+"""
+Test the command line parsing in lib.parse_arguments
+
+.. only:: development_administrator
+
+    Module management
+
+    Created on Oct. 17, 2026
+
+    @author: Jonathan Gossage
+"""
+
+import io
+import json
+import os
+from pathlib import Path
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from lib import argCompletion
+import lib.configuration as _c
+import lib.parse_arguments as _pa
+
+
+def entries(**extra):
+    cfg = {_c.version: _c.CfgEntry(_c.version, '1.2'),
+           _c.dateup: _c.CfgEntry(_c.dateup, '2026-10-17'),
+           'workers': _c.CfgEntry(
+               'workers', 4, 'Number of workers',
+               _c.ArgDescriptor('workers', ('-w', '--workers'), None, int,
+                                None)),
+           'names': _c.CfgEntry(
+               'names', [], 'Names to process',
+               _c.ArgDescriptor('names', (), 'NAME', str, '*')),
+           'dry': _c.CfgEntry(
+               'dry', False, None,
+               _c.ArgDescriptor('dry_run', ('--dry-run',), None, None, None,
+                                action='store_true'))}
+    cfg.update(extra)
+    return cfg
+
+
+class TestArguments(unittest.TestCase):
+
+    def setUp(self: 'TestArguments') -> None:
+        _pa._parsers.clear()
+
+    def testDescriptors(self: 'TestArguments'):
+        args = _pa.Arguments(cfg=entries())
+        self.assertEqual(args.Parse(['-w', '8', '--dry-run', 'a', 'b']),
+                         {'workers': 8, 'dry': True, 'names': ['a', 'b']})
+        # Only the values given are returned, so they override nothing else
+        self.assertEqual(args.Parse([]), {})
+        self.assertIn('NAME', args.parser().format_usage())
+        with self.assertRaises(SystemExit), \
+             mock.patch('sys.stderr'):
+            args.Parse(['-w', 'many'])
+
+    def testParserCached(self: 'TestArguments'):
+        parser = _pa.Arguments(cfg=entries()).parser()
+        self.assertIs(_pa.Arguments(cfg=entries()).parser(), parser)
+        self.assertIsNot(_pa.Arguments('2.0', cfg=entries()).parser(), parser)
+        other = entries(extra=_c.CfgEntry(
+            'extra', 1, None, _c.ArgDescriptor('extra', ('-x',), None, int,
+                                               None)))
+        self.assertIsNot(_pa.Arguments(cfg=other).parser(), parser)
+
+    def testVerbosity(self: 'TestArguments'):
+        args = _pa.Arguments(cfg=entries())
+        self.assertEqual(args.Parse(['-vv'])[_c.verbose], 2)
+        with self.assertLogs(_pa.__name__, 'WARNING'):
+            self.assertEqual(args.Parse(['-vvvv'])[_c.verbose], 3)
+        self.assertEqual(args.Parse(['-v'])[_c.verbose], 1)
+
+    def testReservedFlags(self: 'TestArguments'):
+        cfg = entries(vault=_c.CfgEntry(
+            'vault', None, None,
+            _c.ArgDescriptor('vault', ('-v', '--vault'), None, str, None)),
+            help=_c.CfgEntry(
+            'help', False, None,
+            _c.ArgDescriptor('help', ('-h',), None, None, None,
+                             action='store_true')))
+        args = _pa.Arguments(cfg=cfg)
+        with self.assertLogs(_pa.__name__, 'WARNING') as logs:
+            args.parser()
+        self.assertEqual(sorted(logs.output), [
+            f'WARNING:{_pa.__name__}:Configuration entry help cannot use the'
+            ' reserved flags -h. It cannot be set on the command line.',
+            f'WARNING:{_pa.__name__}:Configuration entry vault cannot use the'
+            ' reserved flags -v. Using --vault only.'])
+        self.assertEqual(args.Parse(['--vault', 'x', '-v']),
+                         {'vault': 'x', _c.verbose: 1})
+
+    def testNoArgs(self: 'TestArguments'):
+        cfg = entries(noargs=_c.CfgEntry(_c.noargs, True))
+        self.assertEqual(_pa.Arguments(cfg=cfg).Parse(['-w', '1']), {})
+
+    def testFastPath(self: 'TestArguments'):
+        args = _pa.Arguments(cfg=entries())
+        for argv in ([], ['-v'], ['-vv', '--verbose']):
+            expected = vars(args.parser().parse_args(argv))
+            _pa._parsers.clear()
+            self.assertEqual(args.Parse(argv), expected)
+            self.assertEqual(_pa._parsers, {})  # No parser was built
+            # Nor was its key, which is costly for many options
+            with mock.patch.object(args, '_key') as key:
+                args.Parse(argv)
+            key.assert_not_called()
+        with self.assertRaises(SystemExit) as e, \
+             mock.patch('sys.stdout', new_callable=io.StringIO) as out:
+            args.Parse(['-v', '-V'])
+        self.assertEqual(e.exception.code, 0)
+        self.assertEqual(out.getvalue(),
+                         f'{_pa._prog()} 1.2 2026-10-17\n')
+        # Anything else is left to argparse
+        self.assertEqual(args.Parse(['--verb']), {_c.verbose: 1})
+        self.assertNotEqual(_pa._parsers, {})
+
+    def testLazyText(self: 'TestArguments'):
+        args = _pa.Arguments(cfg=entries(datecr=_c.CfgEntry(_c.datecr,
+                                                            '2020-04-19')))
+        with mock.patch.object(_pa, '_license',
+                               wraps=_pa._license) as license:
+            parser = args.parser()
+            args.Parse(['-w', '2'])
+            license.assert_not_called()
+            text = parser.format_help()
+            license.assert_called_once()
+        self.assertIn('Created by Jonathan Gossage on 2020-04-19.', text)
+        self.assertIn('Built on 2026-10-17.', text)
+        with self.assertRaises(SystemExit), \
+             mock.patch('sys.stdout', new_callable=io.StringIO) as out:
+            parser.parse_args(['-V'])
+        self.assertEqual(out.getvalue(), f'{parser.prog} 1.2 2026-10-17\n')
+
+    def testParseMany(self: 'TestArguments'):
+        args = _pa.Arguments(cfg=entries())
+        with mock.patch('sys.stdout') as out, mock.patch('sys.stderr') as err:
+            results, errors = args.parseMany([['-w', '2'], ['-w', 'x'], [],
+                                               ['--help'], ['-V'], ['-vv']])
+        out.write.assert_not_called()
+        err.write.assert_not_called()
+        self.assertEqual(results, [{'workers': 2}, None, {}, None, None,
+                                   {_c.verbose: 2}])
+        self.assertEqual(sorted(errors), [1, 3, 4])
+        self.assertEqual(errors[1].status, 2)
+        self.assertIn("invalid int value: 'x'", errors[1].message)
+        self.assertEqual(errors[3].status, 0)
+        self.assertIn('Number of workers', errors[3].message)
+        self.assertEqual(errors[4].message, f'{_pa._prog()} 1.2 2026-10-17\n')
+        self.assertEqual(len(_pa._parsers), 1)
+        # The entries are only examined once for many command lines
+        with mock.patch.object(args, '_canScan',
+                               wraps=args._canScan) as canScan, \
+             mock.patch.object(args, '_key', wraps=args._key) as key:
+            args.parseMany([['-v']] * 10 + [['-w', '1']] * 10)
+        canScan.assert_called_once()
+        key.assert_called_once()
+        # The shared parser still exits outside parseMany
+        with self.assertRaises(SystemExit), mock.patch('sys.stderr'):
+            args.Parse(['-w', 'x'])
+
+    def testArgparseNotImported(self: 'TestArguments'):
+        out = subprocess.run(
+            [sys.executable, '-c',
+             'import sys\n'
+             'from lib.parse_arguments import Arguments\n'
+             'print(Arguments().Parse(["-vv"]), "argparse" in sys.modules)'],
+            capture_output=True, text=True, check=True,
+            cwd=Path(__file__).parents[2])
+        self.assertEqual(out.stdout.strip(), "{'verbose': 2} False")
+
+
+class TestCompletion(unittest.TestCase):
+
+    def setUp(self: 'TestCompletion') -> None:
+        cfg = entries(mode=_c.CfgEntry(
+            'mode', 'fast', "Speed: 'fast' [or] 'slow'",
+            _c.ArgDescriptor('mode', ('--mode',), None, None, None)),
+            source=_c.CfgEntry(
+            'source', None, None,
+            _c.ArgDescriptor('source', ('-s',), None, Path, None)))
+        self.index = argCompletion.fromConfiguration(cfg, 'my-app')
+
+    def testIndex(self: 'TestCompletion'):
+        options = {n: o for o in self.index['options'] for n in o['names']}
+        self.assertEqual(self.index['prog'], 'my-app')
+        self.assertEqual(options['--workers']['metavar'], 'WORKERS')
+        self.assertEqual(options['--dry-run']['nargs'], 0)
+        self.assertTrue(options['-v']['repeat'])
+        self.assertTrue(options['-s']['files'])
+        self.assertEqual([p['metavar'] for p in self.index['positionals']],
+                         ['NAME'])
+
+    def testScripts(self: 'TestCompletion'):
+        with tempfile.TemporaryDirectory() as d:
+            files = argCompletion.write(self.index, d)
+            self.assertEqual([f.name for f in files],
+                             ['my-app.json', 'my-app.bash', '_my-app'])
+            self.assertEqual(json.loads(files[0].read_text()), self.index)
+            bash = files[1].read_text()
+            self.assertIn('complete -F _gv_my_app my-app', bash)
+            self.assertIn('-s)\n            COMPREPLY=($(compgen -f', bash)
+            zsh = files[2].read_text()
+            self.assertIn("'(-w --workers)'{-w,--workers}", zsh)
+            self.assertIn("'--mode[Speed: '\\''fast'\\'' \\[or\\]", zsh)
+            for shell, f in (('bash', files[1]), ('zsh', files[2])):
+                if shutil.which(shell):
+                    subprocess.run([shell, '-n', str(f)], check=True)
+
+    def testGenerateScript(self: 'TestCompletion'):
+        root = Path(__file__).parents[2]
+        with tempfile.TemporaryDirectory() as d:
+            (Path(d) / 'toycfg.py').write_text(
+                'import lib.configuration as _c\n'
+                'def configuration():\n'
+                '    cfg = _c.Configuration(())\n'
+                "    ad = _c.ArgDescriptor('workers', ('-w',), None, int,"
+                ' None)\n'
+                "    cfg.merge({'workers': _c.CfgEntry('workers', 4, None,"
+                ' ad)},\n'
+                '              layer=_c.site_layer)\n'
+                '    return cfg\n')
+            # As documented, so that the configuration sees this command line
+            out = subprocess.run(
+                [sys.executable, '-m', 'scripts.generateCompletion',
+                 'toycfg:configuration', '--prog', 'toy', '--output', d],
+                capture_output=True, text=True, cwd=root,
+                env=dict(os.environ,
+                         PYTHONPATH=os.pathsep.join((str(root), d))))
+            self.assertEqual(out.returncode, 0, out.stderr)
+            self.assertEqual(out.stdout.split(),
+                             [str(Path(d) / f)
+                              for f in ('toy.json', 'toy.bash', '_toy')])
+            index = json.loads((Path(d) / 'toy.json').read_text())
+            self.assertIn(['-w'], [o['names'] for o in index['options']])
+
+if __name__ == '__main__':
+    unittest.main()